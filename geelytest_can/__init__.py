@@ -3,6 +3,8 @@ from can import Message as RawMessage
 from .canapp import CanController
 from .canapp import CanLogManager
 from .canapp.tools import CanTools
+from .canapp import AsyncCanController
+from .canapp import Expectation
 from .cantools import load_file
 from .cantools import Database
 from .cantools import Message
@@ -1,3 +1,5 @@
 from .controller import CanController
 from .manager import CanLogManager
 from .tools import CanTools
+from .aio import AsyncCanController
+from .expectation import Expectation
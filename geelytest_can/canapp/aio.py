@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import collections
+import typing
+from can import CanOperationError
+from can import Message as RawMessage
+from geelytest_can.cantools import Message
+from geelytest_can.cantools.database.signal import NamedSignalValue
+from .controller import CanController
+
+
+logger = logging.getLogger(__name__)
+
+# 帧处理函数，返回True表示等待已完成，从等待列表中移除
+FrameHandler = typing.Callable[[RawMessage], bool]
+SignalPredicate = typing.Callable[[typing.Any], bool]
+
+
+def _decode(message: Message, data: bytes, names: typing.Sequence[str]) -> dict:
+    # 与CanController.receive_signals一致，带枚举值的信号返回数值
+    decoded = message.decode(data, signals=names)
+    for name, value in decoded.items():
+        if isinstance(value, NamedSignalValue):
+            decoded[name] = value.value
+    return decoded
+
+
+class AsyncCanController(object):
+    """
+    CanController的asyncio接口，每个总线只在分发器上注册一个接收回调，
+    接收线程把有人等待的帧放入队列并唤醒一次事件循环，所有等待都在事件循环中完成，不占用线程
+    """
+
+    def __init__(self, controller: CanController) -> None:
+        """
+        功能说明：初始化对象
+        参数说明：
+            :param controller: 已连接的CanController对象
+        异常说明：无
+        返回值：None
+        """
+        self.controller = controller
+        self.__loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        self.__handlers: typing.Dict[typing.Optional[int], typing.List[FrameHandler]] = dict()
+        # 接收线程中读取，只在事件循环中整体替换
+        self.__ids: typing.FrozenSet[int] = frozenset()
+        self.__catch_all = False
+        self.__pending: typing.Deque[RawMessage] = collections.deque()
+        self.__scheduled = False
+        # 同一帧的同一个信号只解析一次，供多个wait_signal共用
+        self.__signal_values: typing.Dict[str, typing.Tuple[RawMessage, typing.Any]] = dict()
+
+    async def __aenter__(self) -> "AsyncCanController":
+        self.start()
+        return self
+
+    async def __aexit__(self, *args: typing.Any) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """
+        功能说明：在当前事件循环中开始接收，必须在事件循环中调用
+        参数说明：无
+        异常说明：
+            :exception CanOperationError: 控制器没有连接
+        返回值：None
+        """
+        if not (self.controller.bus and self.controller.notifier):
+            raise CanOperationError(f"The BUS is not instantiated.Please call the 'connect' method "
+                                    f"to instantiate the BUS and try again")
+        if self.__loop is not None:
+            return
+        self.__loop = asyncio.get_running_loop()
+        self.controller.dispatcher.add_sink(self.__on_message)
+
+    def stop(self) -> None:
+        """
+        功能说明：停止接收，正在等待的recv_message和wait_signal返回None
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        if self.__loop is None:
+            return
+        self.controller.dispatcher.remove_sink(self.__on_message)
+        self.__loop = None
+        handlers, self.__handlers = self.__handlers, dict()
+        self.__update_ids()
+        self.__signal_values.clear()
+        for frame_handlers in handlers.values():
+            for handler in frame_handlers:
+                handler(None)
+
+    def __on_message(self, msg: RawMessage) -> None:
+        # 在Notifier的接收线程中执行
+        if not (self.__catch_all or msg.arbitration_id in self.__ids):
+            return
+        self.__pending.append(msg)
+        if not self.__scheduled:
+            self.__scheduled = True
+            loop = self.__loop
+            try:
+                loop.call_soon_threadsafe(self.__drain)
+            except (AttributeError, RuntimeError):
+                # 事件循环已停止
+                self.__pending.clear()
+
+    def __drain(self) -> None:
+        self.__scheduled = False
+        pending = self.__pending
+        while pending:
+            msg = pending.popleft()
+            for key in (msg.arbitration_id, None):
+                handlers = self.__handlers.get(key)
+                if not handlers:
+                    continue
+                finished = [handler for handler in tuple(handlers) if handler(msg)]
+                for handler in finished:
+                    self.__remove(key, handler)
+
+    def __add(self, key: typing.Optional[int], handler: FrameHandler) -> None:
+        if self.__loop is None:
+            self.start()
+        self.__handlers.setdefault(key, list()).append(handler)
+        self.__update_ids()
+
+    def __remove(self, key: typing.Optional[int], handler: FrameHandler) -> None:
+        handlers = self.__handlers.get(key)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self.__handlers[key]
+                self.__update_ids()
+
+    def __update_ids(self) -> None:
+        self.__ids = frozenset(key for key in self.__handlers if key is not None)
+        self.__catch_all = None in self.__handlers
+
+    def __message_of(self, signal_name: str) -> Message:
+        return self.controller.db.get_message_by_signal(signal_name)
+
+    async def __wait(self, key: typing.Optional[int], accept: typing.Callable[[RawMessage], typing.Any],
+                     timeout: typing.Optional[float]) -> typing.Any:
+        future = asyncio.get_running_loop().create_future()
+
+        def handler(msg: typing.Optional[RawMessage]) -> bool:
+            if future.done():
+                return True
+            if msg is None:
+                future.set_result(None)
+                return True
+            try:
+                result = accept(msg)
+            except Exception as ex:
+                future.set_exception(ex)
+                return True
+            if result is None:
+                return False
+            future.set_result(result)
+            return True
+
+        self.__add(key, handler)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.__remove(key, handler)
+
+    async def recv_message(self, can_id: typing.Optional[typing.Union[int, str]] = None,
+                           timeout: typing.Optional[float] = None,
+                           predicate: typing.Optional[typing.Callable[[RawMessage], bool]] = None
+                           ) -> typing.Optional[RawMessage]:
+        """
+        功能说明：等待接收一个报文
+        参数说明：
+            :param can_id: 报文id，None表示任意报文
+            :param timeout: 超时时间，单位为s，None表示一直等待
+            :param predicate: 报文满足时返回True，None表示不判断
+        异常说明：无
+        返回值：接收到的报文，超时或停止接收时返回None
+        """
+        if isinstance(can_id, str):
+            can_id = int(can_id, 16)
+        return await self.__wait(can_id, lambda msg: msg if predicate is None or predicate(msg) else None, timeout)
+
+    async def wait_signal(self, name: str, predicate: typing.Optional[SignalPredicate] = None,
+                          timeout: typing.Optional[float] = None) -> typing.Optional[typing.Any]:
+        """
+        功能说明：等待信号满足条件，只解析该信号
+        参数说明：
+            :param name: 信号名
+            :param predicate: 信号值满足时返回True，例如lambda value: value > 100，None表示收到该信号即可
+            :param timeout: 超时时间，单位为s，None表示一直等待
+        异常说明：
+            :exception KeyError: 数据库中没有该信号
+        返回值：满足条件的信号值，带枚举值的信号为数值，超时或停止接收时返回None
+        """
+        message = self.__message_of(name)
+
+        def accept(msg: RawMessage) -> typing.Any:
+            cached = self.__signal_values.get(name)
+            if cached is not None and cached[0] is msg:
+                value = cached[1]
+            else:
+                decoded = _decode(message, msg.data, (name,))
+                # 多路复用报文的复用值不同时，该帧不包含这个信号，继续等待
+                if name not in decoded:
+                    return None
+                value = decoded[name]
+                self.__signal_values[name] = (msg, value)
+            return value if predicate is None or predicate(value) else None
+
+        return await self.__wait(message.frame_id, accept, timeout)
+
+    async def recv_signals(self, *signals: str, timeout: typing.Optional[float] = None) -> typing.Optional[dict]:
+        """
+        功能说明：接收同一个报文中的一个/多个信号一次，与CanController.receive_signals_once对应，
+                  多路复用报文等待包含全部信号的一帧
+        参数说明：
+            :param signals: 同一个报文中的信号名
+            :param timeout: 超时时间，单位为s，None表示一直等待
+        异常说明：
+            :exception KeyError: 数据库中没有该信号
+            :exception ValueError: 信号不在同一个报文中
+        返回值：信号字典，格式为{sgn_name: sgn_value}，超时或停止接收时返回None
+        """
+        messages = {self.__message_of(name) for name in signals}
+        if len(messages) != 1:
+            raise ValueError("Signals should be in same message.")
+        message = messages.pop()
+
+        def accept(msg: RawMessage) -> typing.Optional[dict]:
+            decoded = _decode(message, msg.data, signals)
+            return decoded if len(decoded) == len(set(signals)) else None
+
+        return await self.__wait(message.frame_id, accept, timeout)
+
+    async def frames(self, *can_ids: typing.Union[int, str], maxsize: int = 0
+                     ) -> typing.AsyncIterator[RawMessage]:
+        """
+        功能说明：异步迭代接收到的报文，退出迭代时自动取消订阅
+        参数说明：
+            :param can_ids: 报文id，不传入则接收全部报文
+            :param maxsize: 缓存的最多帧数，缓存满时丢弃新收到的报文，0表示不限制
+        异常说明：无
+        返回值：报文的异步迭代器，停止接收时结束
+        """
+        keys = [int(can_id, 16) if isinstance(can_id, str) else can_id for can_id in can_ids] or [None]
+        frames: "asyncio.Queue[typing.Optional[RawMessage]]" = asyncio.Queue(maxsize)
+        closed = False
+
+        def handler(msg: typing.Optional[RawMessage]) -> bool:
+            nonlocal closed
+            if msg is None:
+                # 停止标记不受maxsize限制：缓存满时不入队，迭代器取完缓存的报文后按closed结束
+                closed = True
+            try:
+                frames.put_nowait(msg)
+            except asyncio.QueueFull:
+                if msg is not None:
+                    logger.debug(f"Async frame iterator is full, drop {msg}.")
+            return msg is None
+
+        for key in keys:
+            self.__add(key, handler)
+        try:
+            while True:
+                if closed and frames.empty():
+                    return
+                msg = await frames.get()
+                if msg is None:
+                    return
+                yield msg
+        finally:
+            for key in keys:
+                self.__remove(key, handler)
+
+    async def signals(self, *names: str, maxsize: int = 0) -> typing.AsyncIterator[dict]:
+        """
+        功能说明：异步迭代接收到的信号，每收到一帧包含这些信号的报文产生一次，退出迭代时自动取消订阅
+        参数说明：
+            :param names: 信号名，可以在不同的报文中
+            :param maxsize: 缓存的最多帧数，缓存满时丢弃新收到的报文，0表示不限制
+        异常说明：
+            :exception KeyError: 数据库中没有该信号
+        返回值：信号字典的异步迭代器，格式为{sgn_name: sgn_value}，只包含该帧中的信号
+        """
+        plans: typing.Dict[int, typing.Tuple[Message, typing.List[str]]] = dict()
+        for name in names:
+            message = self.__message_of(name)
+            plans.setdefault(message.frame_id, (message, list()))[1].append(name)
+        async for msg in self.frames(*plans, maxsize=maxsize):
+            message, signal_names = plans[msg.arbitration_id]
+            try:
+                decoded = _decode(message, msg.data, signal_names)
+            except Exception as ex:
+                logger.error(f"Unable to parse message:{msg}, because {ex}")
+                continue
+            yield decoded
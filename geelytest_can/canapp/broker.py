@@ -0,0 +1,502 @@
+import os
+import json
+import queue
+import socket
+import time
+import struct
+import logging
+import threading
+import collections
+import typing
+from can import Bus as CanBus
+from can import BusABC
+from can import CanInitializationError
+from can import CanOperationError
+from can import Message as RawMessage
+from .framepack import pack_flags
+from .framepack import unpack_flags
+
+
+logger = logging.getLogger(__name__)
+
+# CanController使用broker时的interface名称，channel为broker中的总线名称
+BROKER_INTERFACE = "broker"
+DEFAULT_BROKER_PATH = "/tmp/geelytest_can_broker.sock"
+# 数据包：包体长度、类型，包体为握手信息、报文批或错误信息
+_PACKET = struct.Struct("<IB")
+PACKET_HELLO = 1
+PACKET_FRAMES = 2
+PACKET_ERROR = 3
+# 报文：时间戳、帧id、标志位、数据长度，后面紧跟数据
+_FRAME = struct.Struct("<dIHB")
+# 总线接收线程每次最多打包的帧数
+FRAME_BATCH = 256
+
+BusConfigType = typing.Union[typing.Dict[str, typing.Any], BusABC]
+
+
+def pack_frames(messages: typing.Iterable[RawMessage]) -> bytes:
+    """
+    功能说明：把报文打包为FRAMES数据包
+    参数说明：
+        :param messages: 报文
+    异常说明：无
+    返回值：数据包
+    """
+    parts = list()
+    for msg in messages:
+        data = bytes(msg.data or b"")
+        parts.append(_FRAME.pack(msg.timestamp, msg.arbitration_id, pack_flags(msg),
+                                 msg.dlc if msg.is_remote_frame else len(data)))
+        parts.append(data)
+    body = b"".join(parts)
+    return _PACKET.pack(len(body), PACKET_FRAMES) + body
+
+
+def unpack_frames(body: bytes, channel: typing.Any = None) -> typing.List[RawMessage]:
+    """
+    功能说明：解包FRAMES数据包的包体
+    参数说明：
+        :param body: 包体
+        :param channel: 报文的通道
+    异常说明：无
+    返回值：报文列表
+    """
+    messages = list()
+    offset = 0
+    while offset < len(body):
+        timestamp, arbitration_id, flags, length = _FRAME.unpack_from(body, offset)
+        offset += _FRAME.size
+        flags = unpack_flags(flags)
+        remote = flags["is_remote_frame"]
+        messages.append(RawMessage(timestamp=timestamp, arbitration_id=arbitration_id, channel=channel, dlc=length,
+                                   data=None if remote else body[offset:offset + length], **flags))
+        if not remote:
+            offset += length
+    return messages
+
+
+def _packet(packet_type: int, body: bytes) -> bytes:
+    return _PACKET.pack(len(body), packet_type) + body
+
+
+def _recv_exact(sock: socket.socket, size: int) -> typing.Optional[bytes]:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            return None
+        received += count
+    return bytes(buffer)
+
+
+def _recv_packet(sock: socket.socket) -> typing.Optional[typing.Tuple[int, bytes]]:
+    header = _recv_exact(sock, _PACKET.size)
+    if header is None:
+        return None
+    size, packet_type = _PACKET.unpack(header)
+    body = _recv_exact(sock, size) if size else b""
+    if body is None:
+        return None
+    return packet_type, body
+
+
+def _is_fd(bus: BusABC) -> bool:
+    if getattr(bus, "fd", False):
+        return True
+    return str(getattr(bus, "protocol", "")).endswith("FD")
+
+
+class _BrokerClient(object):
+
+    def __init__(self, sock: socket.socket, channel: "_BrokerChannel", queue_size: int) -> None:
+        self.sock = sock
+        self.channel = channel
+        self.dropped = 0
+        self.packets: "queue.Queue[typing.Optional[bytes]]" = queue.Queue(queue_size)
+        self.sender = threading.Thread(target=self.__send_loop, name=f"broker-sender-{channel.name}", daemon=True)
+        self.sender.start()
+
+    def put(self, packet: bytes) -> None:
+        # 客户端读取过慢时丢弃，不阻塞总线接收线程
+        try:
+            self.packets.put_nowait(packet)
+        except queue.Full:
+            self.dropped += 1
+
+    def __send_loop(self) -> None:
+        while True:
+            packet = self.packets.get()
+            if packet is None:
+                break
+            # 合并队列中已有的数据包，一次写入
+            packets = [packet]
+            while len(packets) < 64:
+                try:
+                    packet = self.packets.get_nowait()
+                except queue.Empty:
+                    break
+                if packet is None:
+                    break
+                packets.append(packet)
+            try:
+                self.sock.sendall(b"".join(packets))
+            except OSError:
+                break
+            if packet is None:
+                break
+
+    def close(self) -> None:
+        try:
+            self.packets.put_nowait(None)
+        except queue.Full:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class _BrokerChannel(object):
+
+    def __init__(self, name: str, bus: BusABC, owned: bool) -> None:
+        self.name = name
+        self.bus = bus
+        self.owned = owned
+        self.clients: typing.List[_BrokerClient] = list()
+        self.send_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.thread: typing.Optional[threading.Thread] = None
+
+    def broadcast(self, packet: bytes, source: typing.Optional[_BrokerClient] = None) -> None:
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            if client is not source:
+                client.put(packet)
+
+
+class BusBroker(object):
+    """
+    总线代理，独占打开物理总线，通过Unix domain socket为多个进程提供同一路总线的收发
+    总线上收到的报文按批转发给该总线的所有客户端，客户端发送的报文由broker发送到总线，并转发给同一总线的其他客户端，
+    客户端使用BrokerBus或者interface为"broker"的CanController
+    """
+
+    def __init__(self,
+                 buses: typing.Mapping[str, BusConfigType],
+                 path: str = DEFAULT_BROKER_PATH,
+                 queue_size: int = 1024
+                 ) -> None:
+        """
+        功能说明：初始化对象
+        参数说明：
+            :param buses: {总线名称: can.Bus的参数或者已打开的总线}，
+                          例如{"BodyCAN": {"interface": "pcan", "channel": "PCAN_USBBUS1", "bitrate": 500000}}
+            :param path: Unix domain socket的路径
+            :param queue_size: 每个客户端的发送队列能缓存的数据包数量，队列满时丢弃
+        异常说明：无
+        返回值：None
+        """
+        self.buses = dict(buses)
+        self.path = path
+        self.queue_size = queue_size
+        self.__channels: typing.Dict[str, _BrokerChannel] = dict()
+        self.__server: typing.Optional[socket.socket] = None
+        self.__threads: typing.List[threading.Thread] = list()
+        self.__stop_event = threading.Event()
+
+    def __enter__(self) -> "BusBroker":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    @property
+    def clients(self) -> typing.Dict[str, int]:
+        """
+        功能说明：获取每路总线当前连接的客户端数量
+        参数说明：无
+        异常说明：无
+        返回值：{总线名称: 客户端数量}
+        """
+        return {name: len(channel.clients) for name, channel in self.__channels.items()}
+
+    def start(self) -> None:
+        """
+        功能说明：打开所有总线并开始监听客户端连接
+        参数说明：无
+        异常说明：
+            :exception CanInitializationError: 总线打开失败，例如被其他程序占用
+            :exception OSError: socket路径已被其他broker使用，此时不会打开任何总线
+        返回值：None
+        """
+        self.__stop_event.clear()
+        if os.path.exists(self.path):
+            # 上次异常退出遗留的socket文件，能连接上说明有broker正在运行，此时还没有打开任何总线
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise OSError(f"Another broker is serving on {self.path}.")
+            finally:
+                probe.close()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(self.path)
+            server.listen()
+        except OSError:
+            server.close()
+            raise
+        self.__server = server
+        try:
+            for name, bus in self.buses.items():
+                owned = not isinstance(bus, BusABC)
+                channel = _BrokerChannel(name, CanBus(**bus) if owned else bus, owned)
+                self.__channels[name] = channel
+                channel.thread = threading.Thread(target=self.__receive, args=(channel,), name=f"broker-bus-{name}",
+                                                  daemon=True)
+                channel.thread.start()
+        except BaseException:
+            # 关闭已经打开的总线和socket，避免总线一直被占用
+            self.stop()
+            raise
+        accept = threading.Thread(target=self.__accept, name="broker-accept", daemon=True)
+        accept.start()
+        self.__threads.append(accept)
+        logger.info(f"Broker serving {list(self.__channels)} on {self.path}.")
+
+    def serve_forever(self) -> None:
+        """
+        功能说明：启动broker并阻塞，直到调用stop或者键盘中断
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        self.start()
+        try:
+            while not self.__stop_event.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """
+        功能说明：断开所有客户端，关闭broker打开的总线并删除socket文件
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        self.__stop_event.set()
+        if self.__server is not None:
+            self.__server.close()
+            self.__server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        for channel in self.__channels.values():
+            with channel.lock:
+                clients, channel.clients = channel.clients, list()
+            for client in clients:
+                client.close()
+            if channel.thread is not None:
+                channel.thread.join()
+            if channel.owned:
+                channel.bus.shutdown()
+        for thread in self.__threads:
+            thread.join(1.0)
+        self.__threads.clear()
+        self.__channels.clear()
+        logger.info("Broker stopped.")
+
+    def __receive(self, channel: _BrokerChannel) -> None:
+        bus = channel.bus
+        while not self.__stop_event.is_set():
+            try:
+                msg = bus.recv(0.1)
+                if msg is None:
+                    continue
+                batch = [msg]
+                while len(batch) < FRAME_BATCH:
+                    msg = bus.recv(0)
+                    if msg is None:
+                        break
+                    batch.append(msg)
+            except Exception as ex:
+                logger.error(f"Because {ex}, receive from bus {channel.name} failed.")
+                self.__stop_event.wait(1.0)
+                continue
+            channel.broadcast(pack_frames(batch))
+
+    def __accept(self) -> None:
+        while not self.__stop_event.is_set():
+            try:
+                sock, _ = self.__server.accept()
+            except OSError:
+                break
+            thread = threading.Thread(target=self.__serve, args=(sock,), name="broker-client", daemon=True)
+            thread.start()
+
+    def __serve(self, sock: socket.socket) -> None:
+        packet = _recv_packet(sock)
+        if packet is None or packet[0] != PACKET_HELLO:
+            sock.close()
+            return
+        name = packet[1].decode("utf-8")
+        channel = self.__channels.get(name)
+        if channel is None:
+            sock.sendall(_packet(PACKET_ERROR, f"Bus {name} is not served by the broker, "
+                                               f"available buses: {list(self.__channels)}".encode("utf-8")))
+            sock.close()
+            return
+        info = {"channel_info": str(channel.bus.channel_info), "fd": _is_fd(channel.bus)}
+        sock.sendall(_packet(PACKET_HELLO, json.dumps(info).encode("utf-8")))
+        client = _BrokerClient(sock, channel, self.queue_size)
+        with channel.lock:
+            channel.clients.append(client)
+        logger.info(f"Client connected to bus {name}.")
+        try:
+            while not self.__stop_event.is_set():
+                try:
+                    packet = _recv_packet(sock)
+                except OSError:
+                    break
+                if packet is None:
+                    break
+                packet_type, body = packet
+                if packet_type != PACKET_FRAMES:
+                    continue
+                sent = list()
+                for msg in unpack_frames(body, channel.bus.channel_info):
+                    try:
+                        with channel.send_lock:
+                            channel.bus.send(msg)
+                    except Exception as ex:
+                        client.put(_packet(PACKET_ERROR, f"Send {msg} failed: {ex}".encode("utf-8")))
+                    else:
+                        # 转发时使用发送到总线的时间，而不是客户端报文自带的时间戳(通常为0)
+                        msg.timestamp = time.time()
+                        sent.append(msg)
+                # 同一路总线上的其他客户端也能收到该客户端发送的报文，发送失败的报文不转发
+                if sent:
+                    channel.broadcast(pack_frames(sent), client)
+        finally:
+            with channel.lock:
+                if client in channel.clients:
+                    channel.clients.remove(client)
+            client.close()
+            logger.info(f"Client disconnected from bus {name}, {client.dropped} packets dropped.")
+
+
+class BrokerBus(BusABC):
+    """
+    通过BusBroker收发报文的总线，多个进程可以同时使用broker中的同一路总线
+    """
+
+    def __init__(self, channel: str, path: str = DEFAULT_BROKER_PATH, timeout: float = 5.0, **kwargs) -> None:
+        """
+        功能说明：连接broker
+        参数说明：
+            :param channel: broker中的总线名称
+            :param path: broker的Unix domain socket路径
+            :param timeout: 连接和握手的超时时间，单位为s
+        异常说明：
+            :exception CanInitializationError: broker没有运行或者没有该总线
+        返回值：None
+        """
+        self.__sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__sock.settimeout(timeout)
+        try:
+            self.__sock.connect(path)
+            self.__sock.sendall(_packet(PACKET_HELLO, str(channel).encode("utf-8")))
+            packet = _recv_packet(self.__sock)
+        except OSError as ex:
+            self.__sock.close()
+            raise CanInitializationError(f"Unable to connect to broker on {path}, because {ex}")
+        if packet is None or packet[0] != PACKET_HELLO:
+            self.__sock.close()
+            reason = packet[1].decode("utf-8") if packet else "connection closed"
+            raise CanInitializationError(f"Broker on {path} refused bus {channel}: {reason}")
+        self.__sock.settimeout(None)
+        info = json.loads(packet[1])
+        self.channel = channel
+        self.channel_info = f"broker:{channel}"
+        self.fd = info["fd"]
+        self.__received: typing.Deque[RawMessage] = collections.deque()
+        self.__condition = threading.Condition()
+        self.__send_lock = threading.Lock()
+        self.__error: typing.Optional[str] = None
+        self.__closed = False
+        self.__reader = threading.Thread(target=self.__read_loop, name=f"broker-bus-{channel}", daemon=True)
+        self.__reader.start()
+        super().__init__(channel=channel, **kwargs)
+
+    def __read_loop(self) -> None:
+        try:
+            while True:
+                packet = _recv_packet(self.__sock)
+                if packet is None:
+                    break
+                packet_type, body = packet
+                if packet_type == PACKET_FRAMES:
+                    messages = unpack_frames(body, self.channel)
+                    with self.__condition:
+                        self.__received.extend(messages)
+                        self.__condition.notify()
+                elif packet_type == PACKET_ERROR:
+                    self.__error = body.decode("utf-8")
+                    logger.error(f"Broker error on bus {self.channel}: {self.__error}")
+        except OSError:
+            pass
+        finally:
+            with self.__condition:
+                self.__closed = True
+                self.__condition.notify_all()
+
+    def _recv_internal(self, timeout: typing.Optional[float]) -> typing.Tuple[typing.Optional[RawMessage], bool]:
+        with self.__condition:
+            if not self.__received and not self.__closed:
+                self.__condition.wait(timeout)
+            if self.__received:
+                return self.__received.popleft(), False
+        return None, False
+
+    def send(self, msg: RawMessage, timeout: typing.Optional[float] = None) -> None:
+        self.send_batch((msg,))
+
+    def send_batch(self, messages: typing.Iterable[RawMessage]) -> None:
+        """
+        功能说明：在一个数据包中发送多帧报文
+        参数说明：
+            :param messages: 报文
+        异常说明：
+            :exception CanOperationError: broker已断开，或者broker报告了之前发送的报文发送失败
+        返回值：None
+        """
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise CanOperationError(error)
+        if self.__closed:
+            raise CanOperationError(f"Broker connection of bus {self.channel} is closed.")
+        packet = pack_frames(messages)
+        try:
+            with self.__send_lock:
+                self.__sock.sendall(packet)
+        except OSError as ex:
+            raise CanOperationError(f"Send to broker failed, because {ex}")
+
+    def shutdown(self) -> None:
+        try:
+            self.__sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__sock.close()
+        self.__reader.join(1.0)
+        super().shutdown()
@@ -0,0 +1,320 @@
+import array
+import logging
+import typing
+from can import Message as RawMessage
+from .framepack import FLAG_REMOTE
+from .framepack import pack_flags
+from .framepack import unpack_flags
+
+
+logger = logging.getLogger(__name__)
+
+# 去重方式：不去重；同一报文id的负载/信号值与上一帧相同时不保存
+DEDUP_NONE = "none"
+DEDUP_CHANGE = "change"
+
+MAX_DATA_LENGTH = 64
+INITIAL_CAPACITY = 1024
+
+
+class CaptureBuffer(object):
+    """
+    按列保存接收报文的缓存，时间戳、id、负载和信号值分别保存在预分配的数组中，每帧追加的时间复杂度为O(1)，
+    指定maxlen时为环形缓存，空间按需增长到maxlen，写满后覆盖最早的报文
+    """
+
+    def __init__(self, frame_signals: typing.Dict[int, typing.Sequence[str]] = None, maxlen: int = None,
+                 dedup: str = DEDUP_NONE) -> None:
+        """
+        功能说明：初始化对象
+        参数说明：
+            :param frame_signals: 每个报文id需要保存的信号名，格式为{can_id: [sgn_name1, sgn_name2]}，None表示只保存报文
+            :param maxlen: 最多保存的报文数，None表示不限制
+            :param dedup: 去重方式，DEDUP_NONE或者DEDUP_CHANGE
+        异常说明：
+            :exception ValueError: maxlen小于1或者去重方式不支持
+        返回值：None
+        """
+        if maxlen is not None and maxlen < 1:
+            raise ValueError(f"maxlen should be greater than 0, not {maxlen}")
+        if dedup not in (DEDUP_NONE, DEDUP_CHANGE):
+            raise ValueError(f"Unsupported dedup: {dedup}, should be {DEDUP_NONE} or {DEDUP_CHANGE}")
+        self.maxlen = maxlen
+        self.dedup = dedup
+        self.frame_signals = {can_id: tuple(names) for can_id, names in (frame_signals or dict()).items()}
+        self.signal_names = list(dict.fromkeys(name for names in self.frame_signals.values() for name in names))
+        # 被环形缓存覆盖的报文数和去重跳过的报文数
+        self.dropped = 0
+        self.skipped = 0
+        self.__capacity = 0
+        self.__start = 0
+        self.__size = 0
+        self.__timestamps = array.array("d")
+        self.__ids = array.array("I")
+        self.__flags = array.array("B")
+        self.__dlcs = array.array("B")
+        self.__payloads = bytearray()
+        self.__channels: typing.List[typing.Any] = list()
+        self.__columns: typing.Dict[str, array.array] = dict()
+        # 每列中哪些行保存了该信号，解析失败或多路复用报文不包含该信号的行为0
+        self.__present: typing.Dict[str, bytearray] = dict()
+        self.__last: typing.Dict[int, typing.Any] = dict()
+        self.__reserve(min(maxlen, INITIAL_CAPACITY) if maxlen else INITIAL_CAPACITY)
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __rotate(self) -> None:
+        # 把环形缓存整理为从0开始连续存放，之后才能在末尾扩容
+        start = self.__start
+        if not start:
+            return
+        self.__timestamps = self.__timestamps[start:] + self.__timestamps[:start]
+        self.__ids = self.__ids[start:] + self.__ids[:start]
+        self.__flags = self.__flags[start:] + self.__flags[:start]
+        self.__dlcs = self.__dlcs[start:] + self.__dlcs[:start]
+        offset = start * MAX_DATA_LENGTH
+        self.__payloads = self.__payloads[offset:] + self.__payloads[:offset]
+        self.__channels = self.__channels[start:] + self.__channels[:start]
+        for name, column in self.__columns.items():
+            self.__columns[name] = column[start:] + column[:start]
+        for name, present in self.__present.items():
+            self.__present[name] = present[start:] + present[:start]
+        self.__start = 0
+
+    def __reserve(self, capacity: int) -> None:
+        extra = capacity - self.__capacity
+        self.__timestamps.extend(array.array("d", bytes(8 * extra)))
+        self.__ids.extend(array.array("I", bytes(4 * extra)))
+        self.__flags.extend(bytes(extra))
+        self.__dlcs.extend(bytes(extra))
+        self.__payloads.extend(bytes(MAX_DATA_LENGTH * extra))
+        self.__channels.extend([None] * extra)
+        for column in self.__columns.values():
+            column.extend(array.array(column.typecode, bytes(column.itemsize * extra)))
+        for present in self.__present.values():
+            present.extend(bytes(extra))
+        self.__capacity = capacity
+
+    def __column(self, name: str, value: typing.Union[int, float]) -> array.array:
+        integer = isinstance(value, int) and -(1 << 63) <= value < (1 << 63)
+        column = self.__columns.get(name)
+        if column is None:
+            column = self.__columns[name] = array.array("q" if integer else "d", bytes(8 * self.__capacity))
+            self.__present[name] = bytearray(self.__capacity)
+        elif column.typecode == "q" and not integer:
+            # 信号值中出现浮点数或超出int64范围的整数时整列改为浮点数
+            column = self.__columns[name] = array.array("d", column)
+        return column
+
+    def append(self, msg: RawMessage, values: dict = None) -> bool:
+        """
+        功能说明：追加一帧报文
+        参数说明：
+            :param msg: 接收到的报文
+            :param values: 解析后的信号字典，格式为{sgn_name: sgn_value}，带枚举值的信号需为数值
+        异常说明：无
+        返回值：按去重方式被跳过时返回False
+        """
+        if self.dedup == DEDUP_CHANGE:
+            key = tuple(values.values()) if values else bytes(msg.data)
+            if self.__last.get(msg.arbitration_id, self) == key:
+                self.skipped += 1
+                return False
+            self.__last[msg.arbitration_id] = key
+        if self.__size < self.__capacity:
+            index = self.__start + self.__size
+            self.__size += 1
+        elif self.maxlen is None or self.__capacity < self.maxlen:
+            self.__rotate()
+            self.__reserve(self.__capacity * 2 if self.maxlen is None else min(self.__capacity * 2, self.maxlen))
+            index = self.__size
+            self.__size += 1
+        else:
+            index = self.__start
+            self.__start = (self.__start + 1) % self.__capacity
+            self.dropped += 1
+        index %= self.__capacity
+        self.__timestamps[index] = msg.timestamp
+        self.__ids[index] = msg.arbitration_id
+        self.__flags[index] = pack_flags(msg)
+        if msg.is_remote_frame:
+            # 远程帧没有数据，保存请求的长度
+            self.__dlcs[index] = min(msg.dlc, MAX_DATA_LENGTH)
+        else:
+            length = min(len(msg.data), MAX_DATA_LENGTH)
+            self.__dlcs[index] = length
+            offset = index * MAX_DATA_LENGTH
+            self.__payloads[offset:offset + length] = msg.data[:length]
+        self.__channels[index] = msg.channel
+        if values:
+            for name, value in values.items():
+                self.__column(name, value)[index] = value
+                self.__present[name][index] = 1
+        names = self.frame_signals.get(msg.arbitration_id, ())
+        if len(values or ()) < len(names):
+            # 该行没有保存的信号需要清除标记，避免读到环形缓存中上一轮的旧值
+            for name in names:
+                present = self.__present.get(name)
+                if present is not None and not (values and name in values):
+                    present[index] = 0
+        return True
+
+    def clear(self) -> None:
+        """
+        功能说明：清空缓存，保留已分配的空间
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        self.__start = self.__size = 0
+        self.dropped = self.skipped = 0
+        self.__last.clear()
+
+    def discard_before(self, timestamp: float) -> int:
+        """
+        功能说明：从最早的报文开始丢弃时间戳小于timestamp的报文，用于按时间保留最近一段报文
+        参数说明：
+            :param timestamp: 时间戳
+        异常说明：无
+        返回值：丢弃的报文数
+        """
+        count = 0
+        while self.__size and self.__timestamps[self.__start] < timestamp:
+            self.__start = (self.__start + 1) % self.__capacity
+            self.__size -= 1
+            count += 1
+        if not self.__size:
+            self.__start = 0
+        return count
+
+    def __index(self, position: int) -> int:
+        if position < 0:
+            position += self.__size
+        if not 0 <= position < self.__size:
+            raise IndexError("capture buffer index out of range")
+        return (self.__start + position) % self.__capacity
+
+    def timestamp(self, position: int) -> float:
+        return self.__timestamps[self.__index(position)]
+
+    def arbitration_id(self, position: int) -> int:
+        return self.__ids[self.__index(position)]
+
+    def data(self, position: int) -> bytes:
+        index = self.__index(position)
+        if self.__flags[index] & FLAG_REMOTE:
+            return b""
+        offset = index * MAX_DATA_LENGTH
+        return bytes(self.__payloads[offset:offset + self.__dlcs[index]])
+
+    def message(self, position: int) -> RawMessage:
+        """
+        功能说明：获取一帧报文，每次调用都会重新构造报文对象
+        参数说明：
+            :param position: 报文序号，0为最早保存的报文，支持负数
+        异常说明：
+            :exception IndexError: 序号超出范围
+        返回值：报文
+        """
+        index = self.__index(position)
+        flags = self.__flags[index]
+        offset = index * MAX_DATA_LENGTH
+        data = None if flags & FLAG_REMOTE else self.__payloads[offset:offset + self.__dlcs[index]]
+        return RawMessage(timestamp=self.__timestamps[index], arbitration_id=self.__ids[index], data=data,
+                          dlc=self.__dlcs[index], channel=self.__channels[index], **unpack_flags(flags))
+
+    def values(self, position: int) -> dict:
+        """
+        功能说明：获取一帧报文中保存的信号值
+        参数说明：
+            :param position: 报文序号，0为最早保存的报文，支持负数
+        异常说明：
+            :exception IndexError: 序号超出范围
+        返回值：信号字典，格式为{sgn_name: sgn_value}，只包含该帧保存的信号，解析失败的报文返回空字典
+        """
+        index = self.__index(position)
+        values = dict()
+        for name in self.frame_signals.get(self.__ids[index], ()):
+            column = self.__columns.get(name)
+            if column is not None and self.__present[name][index]:
+                values[name] = column[index]
+        return values
+
+    def timestamps(self) -> typing.List[float]:
+        return [self.__timestamps[self.__index(position)] for position in range(self.__size)]
+
+    def column(self, name: str) -> typing.List[typing.Tuple[float, typing.Union[int, float]]]:
+        """
+        功能说明：获取一个信号的全部采样
+        参数说明：
+            :param name: 信号名
+        异常说明：
+            :exception KeyError: 没有保存该信号
+        返回值：[(timestamp, sgn_value), ...]
+        """
+        if name not in self.signal_names:
+            raise KeyError(name)
+        can_ids = {can_id for can_id, names in self.frame_signals.items() if name in names}
+        column = self.__columns.get(name)
+        if column is None:
+            return list()
+        present = self.__present[name]
+        samples = list()
+        for position in range(self.__size):
+            index = self.__index(position)
+            if self.__ids[index] in can_ids and present[index]:
+                samples.append((self.__timestamps[index], column[index]))
+        return samples
+
+    def messages(self) -> "MessageView":
+        return MessageView(self)
+
+    def signals(self) -> "SignalView":
+        return SignalView(self)
+
+
+class _CaptureView(typing.Sequence):
+
+    def __init__(self, buffer: CaptureBuffer) -> None:
+        self.buffer = buffer
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._item(i) for i in range(*position.indices(len(self.buffer)))]
+        return self._item(position)
+
+    def _item(self, position: int) -> typing.Any:
+        raise NotImplementedError
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if isinstance(other, (list, tuple, _CaptureView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class MessageView(_CaptureView):
+    """
+    CaptureBuffer中报文的只读序列，读取时才构造报文对象
+    """
+
+    def _item(self, position: int) -> RawMessage:
+        return self.buffer.message(position)
+
+
+class SignalView(_CaptureView):
+    """
+    CaptureBuffer中信号的只读序列，每个元素为一帧报文的信号字典{sgn_name: sgn_value}
+    """
+
+    def _item(self, position: int) -> dict:
+        return self.buffer.values(position)
+
+    def column(self, name: str) -> typing.List[typing.Tuple[float, typing.Union[int, float]]]:
+        return self.buffer.column(name)
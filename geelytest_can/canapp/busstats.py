@@ -0,0 +1,329 @@
+import math
+import logging
+import threading
+import typing
+from can import Listener
+from can import Message as RawMessage
+from can.util import dlc2len
+from can.util import len2dlc
+from geelytest_can.cantools import Database
+
+
+logger = logging.getLogger(__name__)
+
+# 帧间隔直方图的分辨率，直方图按桶稀疏保存，单位为s
+INTERVAL_RESOLUTION = 1e-4
+# CAN FD帧中仲裁段和帧尾按仲裁域波特率传输的位数
+FD_ARBITRATION_BITS = 17
+FD_EXTENDED_ARBITRATION_BITS = 36
+FD_TAIL_BITS = 13
+
+
+def frame_duration(msg: RawMessage, bitrate: int, data_bitrate: typing.Optional[int] = None) -> float:
+    """
+    功能说明：估算一帧报文在总线上占用的时间，按最坏情况的位填充计算，包括帧间隔
+              CAN FD报文的仲裁段和帧尾按仲裁域波特率计算，开启BRS时数据段按数据域波特率计算
+    参数说明：
+        :param msg: 报文
+        :param bitrate: 仲裁域波特率，单位为bit/s
+        :param data_bitrate: 数据域波特率，单位为bit/s，None表示与仲裁域波特率相同
+    异常说明：无
+    返回值：占用总线的时间，单位为s
+    """
+    length = 0 if msg.is_remote_frame else len(msg.data)
+    if not msg.is_fd:
+        if msg.is_extended_id:
+            bits = 67 + 8 * length + (53 + 8 * length) // 4
+        else:
+            bits = 47 + 8 * length + (33 + 8 * length) // 4
+        return bits / bitrate
+    length = dlc2len(len2dlc(length))
+    arbitration_bits = FD_EXTENDED_ARBITRATION_BITS if msg.is_extended_id else FD_ARBITRATION_BITS
+    nominal_bits = arbitration_bits + (arbitration_bits - 1) // 4 + FD_TAIL_BITS
+    # ESI、DLC、数据和填充位计数，CRC字段带有固定填充位
+    crc_bits = 17 if length <= 16 else 21
+    data_bits = 5 + 8 * length + (4 + 8 * length) // 4 + 4 + crc_bits + math.ceil((4 + crc_bits) / 4)
+    data_rate = data_bitrate if msg.bitrate_switch and data_bitrate else bitrate
+    return nominal_bits / bitrate + data_bits / data_rate
+
+
+class FrameStatistics(typing.NamedTuple):
+    channel: typing.Any
+    arbitration_id: int
+    name: typing.Optional[str]
+    count: int
+    rate: float
+    min_interval: float
+    mean_interval: float
+    max_interval: float
+    p99_interval: float
+    jitter: float
+    cycle_time: typing.Optional[float]
+    mean_deviation: float
+    max_deviation: float
+    violations: int
+
+
+class ChannelStatistics(typing.NamedTuple):
+    channel: typing.Any
+    frames: int
+    error_frames: int
+    duration: float
+    bus_load: float
+    peak_load: float
+
+
+class BusStatisticsReport(typing.NamedTuple):
+    frames: typing.List[FrameStatistics]
+    channels: typing.List[ChannelStatistics]
+    missing: typing.List[str]
+
+    def format(self) -> str:
+        """
+        功能说明：将统计结果格式化为表格，时间单位为ms，负载单位为%
+        参数说明：无
+        异常说明：无
+        返回值：表格文本
+        """
+        lines = [f"{'Channel':>7} {'ID':>10} {'Name':<32} {'Count':>8} {'Rate/s':>9} {'Min':>8} {'Mean':>8} "
+                 f"{'Max':>8} {'P99':>8} {'Jitter':>8} {'Cycle':>8} {'MaxDev':>8} {'Violations':>10}"]
+        for frame in self.frames:
+            cycle_time = f"{frame.cycle_time * 1000:.1f}" if frame.cycle_time else "-"
+            lines.append(f"{str(frame.channel):>7} {hex(frame.arbitration_id):>10} {frame.name or '-':<32} "
+                         f"{frame.count:>8} {frame.rate:>9.2f} {frame.min_interval * 1000:>8.2f} "
+                         f"{frame.mean_interval * 1000:>8.2f} {frame.max_interval * 1000:>8.2f} "
+                         f"{frame.p99_interval * 1000:>8.2f} {frame.jitter * 1000:>8.3f} {cycle_time:>8} "
+                         f"{frame.max_deviation * 1000:>8.2f} {frame.violations:>10}")
+        for channel in self.channels:
+            lines.append(f"Channel {channel.channel}: {channel.frames} frames, {channel.error_frames} error frames, "
+                         f"duration: {channel.duration:.3f} s, bus load: {channel.bus_load * 100:.1f} %, "
+                         f"peak load: {channel.peak_load * 100:.1f} %")
+        if self.missing:
+            lines.append(f"Cyclic messages never received: {', '.join(self.missing)}")
+        return "\n".join(lines)
+
+
+class _FrameCounter(object):
+    __slots__ = ("count", "last", "first", "min", "max", "mean", "m2", "histogram", "cycle_time", "name",
+                 "deviation_sum", "max_deviation", "violations")
+
+    def __init__(self, timestamp: float, name: typing.Optional[str], cycle_time: typing.Optional[float]) -> None:
+        self.count = 1
+        self.first = self.last = timestamp
+        self.min = math.inf
+        self.max = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.histogram: typing.Dict[int, int] = dict()
+        self.name = name
+        self.cycle_time = cycle_time
+        self.deviation_sum = 0.0
+        self.max_deviation = 0.0
+        self.violations = 0
+
+
+class _ChannelCounter(object):
+    __slots__ = ("frames", "error_frames", "first", "last", "busy", "window_start", "window_busy", "peak_load",
+                 "durations")
+
+    def __init__(self, timestamp: float) -> None:
+        self.frames = 0
+        self.error_frames = 0
+        self.first = self.last = self.window_start = timestamp
+        self.busy = 0.0
+        self.window_busy = 0.0
+        self.peak_load = None
+        self.durations: typing.Dict[tuple, float] = dict()
+
+
+class BusStatistics(Listener):
+    """
+    总线统计监听器，既可以作为Notifier的监听器统计实时总线，也可以通过consume统计log文件
+    按(通道, 帧id)统计帧数、频率、帧间隔的最小/平均/最大/p99值和抖动，以及与dbc中周期的偏差，
+    按通道统计总线负载，每帧的统计只有常数次的计算和字典查找
+    """
+
+    def __init__(self,
+                 db: typing.Optional[Database] = None,
+                 bitrate: int = 500000,
+                 data_bitrate: typing.Optional[int] = 2000000,
+                 tolerance: float = 0.1,
+                 window: float = 1.0
+                 ) -> None:
+        """
+        功能说明：初始化对象
+        参数说明：
+            :param db: 数据库对象，用于获取报文名和周期，None表示不统计周期偏差
+            :param bitrate: 仲裁域波特率，单位为bit/s
+            :param data_bitrate: CAN FD数据域波特率，单位为bit/s
+            :param tolerance: 帧间隔与周期的偏差超过周期的该比例时计为一次超差
+            :param window: 统计峰值负载的时间窗口，单位为s
+        异常说明：
+            :exception ValueError: 波特率或时间窗口小于等于0
+        返回值：None
+        """
+        if bitrate <= 0 or (data_bitrate is not None and data_bitrate <= 0):
+            raise ValueError(f"Bitrate must be greater than 0, but got {bitrate} and {data_bitrate}.")
+        if window <= 0:
+            raise ValueError(f"Window must be greater than 0, but got {window}.")
+        self.db = db
+        self.bitrate = bitrate
+        self.data_bitrate = data_bitrate
+        self.tolerance = tolerance
+        self.window = window
+        self.__frames: typing.Dict[typing.Tuple[typing.Any, int], _FrameCounter] = dict()
+        self.__channels: typing.Dict[typing.Any, _ChannelCounter] = dict()
+        self.__lock = threading.Lock()
+
+    def on_message_received(self, msg: RawMessage) -> None:
+        timestamp = msg.timestamp
+        with self.__lock:
+            channel = self.__channels.get(msg.channel)
+            if channel is None:
+                channel = self.__channels[msg.channel] = _ChannelCounter(timestamp)
+            if msg.is_error_frame:
+                channel.error_frames += 1
+                return
+            self.__count_load(channel, msg)
+            key = (msg.channel, msg.arbitration_id)
+            frame = self.__frames.get(key)
+            if frame is None:
+                self.__frames[key] = self.__new_frame(msg)
+                return
+            interval = timestamp - frame.last
+            frame.last = timestamp
+            count = frame.count
+            frame.count = count + 1
+            if interval < frame.min:
+                frame.min = interval
+            if interval > frame.max:
+                frame.max = interval
+            # Welford算法计算帧间隔的平均值和方差
+            delta = interval - frame.mean
+            frame.mean += delta / count
+            frame.m2 += delta * (interval - frame.mean)
+            bucket = int(interval / INTERVAL_RESOLUTION)
+            frame.histogram[bucket] = frame.histogram.get(bucket, 0) + 1
+            cycle_time = frame.cycle_time
+            if cycle_time:
+                deviation = abs(interval - cycle_time)
+                frame.deviation_sum += deviation
+                if deviation > frame.max_deviation:
+                    frame.max_deviation = deviation
+                if deviation > cycle_time * self.tolerance:
+                    frame.violations += 1
+
+    def __count_load(self, channel: _ChannelCounter, msg: RawMessage) -> None:
+        timestamp = msg.timestamp
+        channel.frames += 1
+        channel.last = timestamp
+        # 同一种帧格式和长度的占用时间只计算一次
+        key = (msg.is_fd, msg.bitrate_switch, msg.is_extended_id, msg.is_remote_frame, len(msg.data))
+        duration = channel.durations.get(key)
+        if duration is None:
+            duration = channel.durations[key] = frame_duration(msg, self.bitrate, self.data_bitrate)
+        channel.busy += duration
+        if timestamp - channel.window_start >= self.window:
+            load = channel.window_busy / self.window
+            if channel.peak_load is None or load > channel.peak_load:
+                channel.peak_load = load
+            channel.window_start += (timestamp - channel.window_start) // self.window * self.window
+            channel.window_busy = 0.0
+        channel.window_busy += duration
+
+    def __new_frame(self, msg: RawMessage) -> _FrameCounter:
+        name = cycle_time = None
+        if self.db is not None:
+            try:
+                message = self.db.get_message_by_frame_id(msg.arbitration_id)
+            except KeyError:
+                message = None
+            if message is not None:
+                name = message.name
+                cycle_time = message.cycle_time / 1000 if message.cycle_time else None
+        return _FrameCounter(msg.timestamp, name, cycle_time)
+
+    def consume(self, messages: typing.Iterable[RawMessage]) -> int:
+        """
+        功能说明：统计报文，例如LogReader读取的log文件
+        参数说明：
+            :param messages: 按时间顺序排列的报文
+        异常说明：无
+        返回值：统计的帧数
+        """
+        count = 0
+        for count, msg in enumerate(messages, 1):
+            self.on_message_received(msg)
+        return count
+
+    def reset(self) -> None:
+        """
+        功能说明：清空统计结果
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        with self.__lock:
+            self.__frames.clear()
+            self.__channels.clear()
+
+    def report(self) -> BusStatisticsReport:
+        """
+        功能说明：获取统计结果，统计过程中可以随时调用
+        参数说明：无
+        异常说明：无
+        返回值：BusStatisticsReport，帧间隔、抖动和偏差的单位为s，负载为0到1之间的比例，
+                missing为dbc中有周期但没有收到的报文名
+        """
+        with self.__lock:
+            frames = [self.__frame_statistics(channel, frame_id, frame)
+                      for (channel, frame_id), frame in self.__frames.items()]
+            channels = [self.__channel_statistics(channel, counter) for channel, counter in self.__channels.items()]
+        frames.sort(key=lambda frame: (str(frame.channel), frame.arbitration_id))
+        channels.sort(key=lambda channel: str(channel.channel))
+        missing = list()
+        if self.db is not None:
+            received = {frame.arbitration_id for frame in frames}
+            missing = [message.name for message in self.db.messages
+                       if message.cycle_time and message.frame_id not in received]
+        return BusStatisticsReport(frames, channels, missing)
+
+    @staticmethod
+    def __frame_statistics(channel: typing.Any, frame_id: int, frame: _FrameCounter) -> FrameStatistics:
+        intervals = frame.count - 1
+        span = frame.last - frame.first
+        p99 = 0.0
+        if intervals:
+            rank = math.ceil(intervals * 0.99)
+            count = 0
+            for bucket in sorted(frame.histogram):
+                count += frame.histogram[bucket]
+                if count >= rank:
+                    p99 = min((bucket + 1) * INTERVAL_RESOLUTION, frame.max)
+                    break
+        return FrameStatistics(channel=channel,
+                               arbitration_id=frame_id,
+                               name=frame.name,
+                               count=frame.count,
+                               rate=intervals / span if span > 0 else 0.0,
+                               min_interval=frame.min if intervals else 0.0,
+                               mean_interval=frame.mean,
+                               max_interval=frame.max,
+                               p99_interval=p99,
+                               jitter=math.sqrt(frame.m2 / intervals) if intervals else 0.0,
+                               cycle_time=frame.cycle_time,
+                               mean_deviation=frame.deviation_sum / intervals if intervals and frame.cycle_time
+                               else 0.0,
+                               max_deviation=frame.max_deviation,
+                               violations=frame.violations)
+
+    @staticmethod
+    def __channel_statistics(channel: typing.Any, counter: _ChannelCounter) -> ChannelStatistics:
+        duration = counter.last - counter.first
+        bus_load = counter.busy / duration if duration > 0 else 0.0
+        return ChannelStatistics(channel=channel,
+                                 frames=counter.frames,
+                                 error_frames=counter.error_frames,
+                                 duration=duration,
+                                 bus_load=bus_load,
+                                 peak_load=counter.peak_load if counter.peak_load is not None else bus_load)
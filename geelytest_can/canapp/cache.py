@@ -0,0 +1,124 @@
+import time
+import logging
+import typing
+import threading
+from can import Message as RawMessage
+from geelytest_can.cantools import Database
+from geelytest_can.cantools import Message
+from geelytest_can.canapp.dispatcher import FrameDispatcher
+
+
+logger = logging.getLogger(__name__)
+
+
+class CachedSignal(typing.NamedTuple):
+    value: typing.Union[int, float]
+    raw: typing.Union[int, float]
+    timestamp: float
+    counter: int
+
+
+class _MessageSnapshot(typing.NamedTuple):
+    data: bytes
+    raw_values: typing.Dict[str, typing.Union[int, float]]
+    timestamp: float
+    counter: int
+    received: float
+
+
+class SignalCache(object):
+    """
+    信号最新值缓存，在接收线程中只对负载发生变化的报文解析，读取信号值的时间复杂度为O(1)
+    """
+
+    def __init__(self, db: Database, dispatcher: FrameDispatcher) -> None:
+        """
+        功能说明：初始化对象
+        参数说明：
+            :param db: 用于解析报文的数据库
+            :param dispatcher: 总线的帧分发器
+        异常说明：无
+        返回值：None
+        """
+        self.__db = db
+        self.__dispatcher = dispatcher
+        self.__lock = threading.Lock()
+        self.__messages: typing.Dict[int, Message] = dict()
+        self.__snapshots: typing.Dict[int, _MessageSnapshot] = dict()
+
+    @property
+    def frame_ids(self) -> typing.Set[int]:
+        return set(self.__messages)
+
+    def subscribe(self, *messages: Message) -> None:
+        """
+        功能说明：开始缓存一个或多个报文的信号
+        参数说明：
+            :param messages: 需要缓存的报文对象
+        异常说明：无
+        返回值：None
+        """
+        with self.__lock:
+            new_frame_ids = set()
+            for message in messages:
+                if message.frame_id not in self.__messages:
+                    self.__messages[message.frame_id] = message
+                    new_frame_ids.add(message.frame_id)
+            if new_frame_ids:
+                self.__dispatcher.add_sink(self.on_message_received, new_frame_ids)
+
+    def clear(self) -> None:
+        """
+        功能说明：停止缓存所有报文并清空缓存
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        with self.__lock:
+            if self.__messages:
+                self.__dispatcher.remove_sink(self.on_message_received, set(self.__messages))
+            self.__messages.clear()
+            self.__snapshots.clear()
+
+    def on_message_received(self, msg: RawMessage) -> None:
+        frame_id = msg.arbitration_id
+        message = self.__messages.get(frame_id)
+        if message is None or msg.is_error_frame or msg.is_remote_frame:
+            return
+        data = bytes(msg.data)
+        snapshot = self.__snapshots.get(frame_id)
+        if snapshot is not None and snapshot.data == data:
+            raw_values = snapshot.raw_values
+            counter = snapshot.counter + 1
+        else:
+            try:
+                raw_values = message.decode(data, decode_choices=False, scaling=False)
+            except Exception as ex:
+                logger.debug(f"Unable to parse message:{msg}, because {ex}")
+                return
+            counter = snapshot.counter + 1 if snapshot is not None else 1
+        self.__snapshots[frame_id] = _MessageSnapshot(data, raw_values, msg.timestamp, counter, time.monotonic())
+
+    def get(self, name: str, max_age: float = None) -> typing.Optional[CachedSignal]:
+        """
+        功能说明：获取信号的最新缓存值
+        参数说明：
+            :param name: 信号名
+            :param max_age: 缓存值的最大有效时长，单位为s，None则不限制
+        异常说明：
+            :exception KeyError: 数据库中不存在该信号
+        返回值：CachedSignal对象，没有接收到该信号或者缓存值已过期时返回None
+        """
+        signal = self.__db.get_signal_by_name(name)
+        message = self.__db.get_message_by_signal(signal)
+        snapshot = self.__snapshots.get(message.frame_id)
+        if snapshot is None or name not in snapshot.raw_values:
+            return None
+        if max_age is not None and time.monotonic() - snapshot.received > max_age:
+            return None
+        raw = snapshot.raw_values[name]
+        if signal.choices and raw in signal.choices:
+            value = raw
+        else:
+            value = signal.scale * raw + signal.offset
+        return CachedSignal(value, raw, snapshot.timestamp, snapshot.counter)
@@ -1,4 +1,3 @@
-import copy
 import logging
 import queue
 import typing
@@ -15,14 +14,31 @@ from can import CanInitializationError
 from can import CanInterfaceNotImplementedError
 from can import CanFDBitTiming
 from can import Message as RawMessage
-from can import BufferedReader
 from can import Notifier
 from geelytest_can.e2e import e2e_crc_data
+from geelytest_can.e2e import e2e_crc_batch
 from geelytest_can.cantools import load_file
 from geelytest_can.cantools import BusConfig
 from geelytest_can.cantools import Database
 from geelytest_can.cantools import Message
 from geelytest_can.cantools.database.signal import NamedSignalValue
+from geelytest_can.canapp.dispatcher import FrameDispatcher
+from geelytest_can.canapp.dispatcher import FrameSubscription
+from geelytest_can.canapp.cache import CachedSignal
+from geelytest_can.canapp.cache import SignalCache
+from geelytest_can.canapp.buffer import CaptureBuffer
+from geelytest_can.canapp.buffer import MessageView
+from geelytest_can.canapp.buffer import SignalView
+from geelytest_can.canapp.buffer import DEDUP_NONE
+from geelytest_can.canapp.buffer import DEDUP_CHANGE
+from geelytest_can.canapp.expectation import ExpectationLike
+from geelytest_can.canapp.expectation import ExpectationReport
+from geelytest_can.canapp.expectation import ExpectationSet
+from geelytest_can.canapp.template import FrameTemplate
+from geelytest_can.canapp.scheduler import CyclicScheduler
+from geelytest_can.canapp.broker import BrokerBus
+from geelytest_can.canapp.broker import BROKER_INTERFACE
+from geelytest_can.canapp.broker import DEFAULT_BROKER_PATH
 
 
 logger = logging.getLogger(__name__)
@@ -31,28 +47,38 @@ logger = logging.getLogger(__name__)
 class CanController(object):
     
     # INTERFACES = ["pcan", "tosun", "smartvci"]
+    CYCLIC_BACKENDS = ("scheduler", "bus")
 
     def __init__(self,
                  name: str,
                  interface: str,
                  channel: int,
                  db_path: Union[pathlib.Path, str] = None,
-                 bus: Union[BusABC, CanBus] = None
+                 bus: Union[BusABC, CanBus] = None,
+                 cyclic_backend: str = "bus",
+                 broker_path: str = DEFAULT_BROKER_PATH
                  ) -> None:
         """
         功能说明：初始化对象
         参数说明：
             :param name: 控制器名字，用于从db中获取对应can bus,如果名字不符，默认获取第一个，并给出警告，不影响程序正常运行
-            :param interface: 控制器采用的硬件设备类型（如PEAK公司的pcan）,目前只支持PCAN
-            :param channel: 控制器使用的硬件设备通道号（1, 2, ... , max）
+            :param interface: 控制器采用的硬件设备类型（如PEAK公司的pcan）,目前只支持PCAN,
+                              "broker"表示通过BusBroker与其他进程共用总线
+            :param channel: 控制器使用的硬件设备通道号（1, 2, ... , max）,interface为"broker"时为broker中的总线名称
             :param db_path: dbc文件路径
             :param bus: bus对象，当db_path有值时，忽略此参数
             db_path和bus参数必传其一
+            :param cyclic_backend: 周期发送的实现方式，默认"bus"使用总线自带的send_periodic(通常每个报文一个线程)，
+                                   任务在bus.periodic_tasks中；"scheduler"使用进程内共享的单线程调度器CyclicScheduler，
+                                   任务只在controller.periodic_tasks中，断开连接时停止，重新连接后需重新发送
+            :param broker_path: interface为"broker"时broker的Unix domain socket路径，与BusBroker的path一致
         异常说明：无
         返回值：None
         """
         if not db_path and not bus:
             raise ValueError(f"Arguments 'db_path' or 'bus' can't' all be None.")
+        if cyclic_backend not in self.CYCLIC_BACKENDS:
+            raise ValueError(f"Argument 'cyclic_backend' choice can only in {self.CYCLIC_BACKENDS}.")
         self.__sent_signals = set()
         self.__modified_data = dict()
         self.sending_dict_datas = dict()
@@ -64,6 +90,7 @@ class CanController(object):
         self.__db_path = db_path
         if db_path:
             self.__db = load_file(self.__db_path)
+            self.__db.enable_compiled_codecs()
             # if self.__interface not in self.INTERFACES:
             #     raise AttributeError(f"Argument 'interface' choice can only in {self.INTERFACES} . "
             #                          f"Please check if the input parameters are incorrect.")
@@ -72,8 +99,14 @@ class CanController(object):
         self.__bus_config = None
         self.__bus = bus
         self.__notifier = None
+        self.__dispatcher = FrameDispatcher()
+        self.__signal_cache = SignalCache(self.__db, self.__dispatcher)
+        self.__templates: typing.Dict[int, typing.Optional[FrameTemplate]] = dict()
+        self.__cyclic_backend = cyclic_backend
+        self.__broker_path = broker_path
+        self.__periodic_tasks: typing.Dict[int, typing.Any] = dict()
         self.__connected = False
-        self.__listener: BufferedReader = None
+        self.__listener: FrameSubscription = None
         self.init_counter = True
 
     @property
@@ -108,6 +141,22 @@ class CanController(object):
     def notifier(self) -> Notifier:
         return self.__notifier
 
+    @property
+    def dispatcher(self) -> FrameDispatcher:
+        return self.__dispatcher
+
+    @property
+    def cyclic_backend(self) -> str:
+        return self.__cyclic_backend
+
+    @property
+    def broker_path(self) -> str:
+        return self.__broker_path
+
+    @property
+    def periodic_tasks(self) -> typing.Dict[int, typing.Any]:
+        return dict(self.__periodic_tasks)
+
     def connect(self) -> bool:
         """
         功能说明：连接控制器
@@ -128,9 +177,12 @@ class CanController(object):
         if not self.__bus_config:
             if self.__db.buses:
                 self.__bus_config = self.__db.buses[0]
-            elif not self.__bus:
+            elif not self.__bus and self.__interface != BROKER_INTERFACE:
                 raise AttributeError(f"Can't find the bus name {self.name} from {self.db_path}")
-        if self.__bus_config:
+        if self.__interface == BROKER_INTERFACE:
+            # 物理总线由BusBroker打开，波特率等参数在broker中配置，channel为broker中的总线名称
+            self.__bus = BrokerBus(self.__channel, path=self.__broker_path)
+        elif self.__bus_config:
             if self.__bus_config.name.lower() != self.name:
                 logger.warning(f"Found bus name {self.__bus_config.name.lower()} "
                                f"from {self.db_path}, not expected {self.name}")
@@ -176,6 +228,7 @@ class CanController(object):
             logger.debug(f"In time:{time.time()}, {self.bus.channel_info} Disconnecting ......")
             if self.__notifier:
                 self.stop_receiving()
+            self.__stop_periodic_tasks()
             self.__bus.shutdown()
             self.__connected = False
             logger.info(f"Successfully disconnected  {self.bus.channel_info} from device.")
@@ -200,15 +253,21 @@ class CanController(object):
         msg_sgn_dict = self._divide_signal_names_values_into_groups(signals)
         for msg_name, sgn_dict in msg_sgn_dict.items():
             message = self.__db.get_message_by_name(msg_name)
-            sgn_dict = self.__update_signals_without_e2e(message, sgn_dict)
-            sgn_dict = self.__update_signals_with_e2e(message, sgn_dict)
+            template = self.__get_frame_template(message)
+            if template:
+                payload, = self.__generate_payloads_with_e2e(template, template.encode(sgn_dict))
+                data = template.to_bytes(payload)
+            else:
+                sgn_dict = self.__update_signals_without_e2e(message, sgn_dict)
+                sgn_dict = self.__update_signals_with_e2e(message, sgn_dict)
+                data = message.encode(data=sgn_dict)
             raw_message = RawMessage(arbitration_id=message.frame_id,
                                      is_rx=False,
                                      channel=self.bus.channel_info,
                                      is_remote_frame=False,
                                      is_fd=message.is_fd,
                                      is_extended_id=message.is_extended_frame,
-                                     data=message.encode(data=sgn_dict))
+                                     data=data)
             logger.info(f"Sending raw message: {raw_message}")
             try:
                 self.bus.send(raw_message)
@@ -235,11 +294,20 @@ class CanController(object):
         for msg_name, sgn_dict in msg_sgn_dict.items():
             message = self.__db.get_message_by_name(msg_name)
             cycle_time = message.cycle_time / 1000 if message.send_type == "cyclic" else 0.1
-            sgn_dict = self.__update_signals_without_e2e(message, sgn_dict)
-            raw_messages = list()
+            template = self.__get_frame_template(message)
             self.init_counter = True
+            if template:
+                payloads = self.__generate_payloads_with_e2e(template, template.encode(sgn_dict), 15)
+                self.init_counter = False
+            else:
+                sgn_dict = self.__update_signals_without_e2e(message, sgn_dict)
+            raw_messages = list()
             for i in range(15):
-                sgn_dict = self.__update_signals_with_e2e(message, sgn_dict)
+                if template:
+                    data = template.to_bytes(payloads[i])
+                else:
+                    sgn_dict = self.__update_signals_with_e2e(message, sgn_dict)
+                    data = message.encode(data=sgn_dict)
                 self.init_counter = False
                 raw_message = RawMessage(arbitration_id=message.frame_id,
                                          is_rx=False,
@@ -247,11 +315,11 @@ class CanController(object):
                                          is_remote_frame=False,
                                          is_fd=message.is_fd,
                                          is_extended_id=message.is_extended_frame,
-                                         data=message.encode(data=sgn_dict))
+                                         data=data)
                 logger.info(f"Sending raw message: {raw_message}")
                 raw_messages.append(raw_message)
             try:
-                self.__bus.send_periodic(msgs=raw_messages, period=cycle_time)
+                self.__send_periodic(raw_messages, cycle_time)
             except Exception as ex:
                 logger.error(f"Because {ex}, send message failed,please try again.")
 
@@ -348,7 +416,7 @@ class CanController(object):
                 logger.info(f"Sending raw message: {raw_message}")
 
                 try:
-                    self.__bus.send_periodic(msgs=raw_message, period=cycle_time)
+                    self.__send_periodic([raw_message], cycle_time)
                 except CanOperationError:
                     logger.error(f"Send message failed, please try again")
                 cycle_time = old_cycle_time
@@ -364,6 +432,7 @@ class CanController(object):
             self.__sending_messages.clear()
             self.__sending_raw_datas.clear()
             self.sending_dict_datas.clear()
+            self.__stop_periodic_tasks()
             self.bus.stop_all_periodic_tasks()
             logger.info("Stop sending data")
         else:
@@ -385,8 +454,6 @@ class CanController(object):
         sgn_set = set(signals)
         new_sgn_list = []
         message_list = []
-        listener = BufferedReader()
-        self.__notifier.add_listener(listener)
         for sgn in sgn_set:
             try:
                 message = self.__db.get_message_by_signal(sgn)
@@ -394,70 +461,48 @@ class CanController(object):
             except:
                 logger.error(f"Can't find the message of sgn: "
                              f"{sgn} in database {self.__db_path}, stop receiving.")
-                listener.buffer.queue.clear()
                 return None
             else:
                 new_sgn_list.append(sgn)
         message_set = set(message_list)
         if len(message_set) != 1:
             logger.error("Signals should be in same message.")
-            listener.buffer.queue.clear()
             return None
         new_message_list = list(message_set)
         logger.info(f"Expected signals: {new_sgn_list}")
         logger.info("Start receiving signals...")
         received_sgn_dict = dict()
-        start_time = time.time()
-        while True:
-            raw_message = listener.get_message()
-            if not raw_message:
-                if timeout:
-                    if time.time() - start_time > timeout:
-                        break
-                continue
-            if new_message_list[0].frame_id == raw_message.arbitration_id:
-                sgn_dict = new_message_list[0].decode(raw_message.data)
-                logger.debug(f"Received message dict:{sgn_dict}")
-                for name, value in sgn_dict.items():
-                    for sgn in sgn_set:
-                        if sgn == name:
-                            sgn_object = self.__db.get_signal_by_name(name)
-                            if sgn_object.choices:
-                                value = sgn_object.choice_string_to_number(value)
-                            received_sgn_dict.update({name: value})
-                break
-            if timeout:
-                end_time = time.time()
-                if end_time - start_time > timeout:
-                    break
-        self.__notifier.remove_listener(listener)
+        deadline = self.__deadline(timeout)
+        with self.__dispatcher.subscribe(new_message_list[0].frame_id) as listener:
+            raw_message = listener.wait_message(deadline)
+            if raw_message:
+                received_sgn_dict = self.__decode_signals(new_message_list[0], raw_message.data, new_sgn_list)
+                logger.debug(f"Received message dict:{received_sgn_dict}")
         logger.info(f"Received signals: {received_sgn_dict}")
         return received_sgn_dict
 
-    def receive_signals(self, *signals: str, duration: float, **kwargs: Any) -> typing.Optional[List[dict]]:
+    def receive_signals(self, *signals: str, duration: float, **kwargs: Any) -> typing.Optional[SignalView]:
         """
-        功能说明：持续接收信号，可接收一个或多个信号
+        功能说明：持续接收信号，可接收一个或多个信号，接收到的信号按列保存在CaptureBuffer中
         参数说明：
             :param signals: 想要接收的信号名，格式为sgn1, sgn2, 注意必须传至少一个信号名
             :param duration: 接收信号的最长时长
-            :param kwargs: 目前是可以传一个num=xx，如num=1000, 表示接收到1000条messages就停止接收，也用于后续扩展
+            :param kwargs: num=xx，如num=1000, 表示接收到1000条messages就停止接收；
+                           maxlen=xx，最多保存的报文数，超出后覆盖最早的报文，默认不限制；
+                           dedup=xx，默认为DEDUP_CHANGE，同一报文的信号值与上一帧相同时不保存，DEDUP_NONE则全部保存
         异常说明：无
-        返回值：signal_list 接收到的信号列表，格式为[{sgn_name1: sgn_value1}, {sgn_name2: sgn_value2},...]
+        返回值：接收到的信号序列SignalView，格式为[{sgn_name1: sgn_value1}, {sgn_name2: sgn_value2},...]，
+                每个元素对应一帧报文，可通过column(sgn_name)获取单个信号的[(timestamp, sgn_value), ...]
         """
         if not (self.__bus and self.__notifier):
             raise CanOperationError(f"The BUS is not instantiated.Please call the 'connect' method "
                                     f"to instantiate the BUS and try again")
         sgn_set = set(signals)
-        listener = BufferedReader()
-        self.__notifier.add_listener(listener)
-        raw_message_list = []
-        signal_list = []
         message_list = []
         exp_sgn_list = []
         if not sgn_set:
             logger.error(
                 "No signal name has been received, please make sure you've passed in at least one siganl name.")
-            listener.buffer.queue.clear()
             return None
         for sgn in sgn_set:
             try:
@@ -470,61 +515,45 @@ class CanController(object):
                 exp_sgn_list.append(sgn)
         if not message_list:
             logger.error("None of your signal names is valid, stop receiving.")
-            listener.buffer.queue.clear()
             return None
         logger.info(f"Expected signals: {exp_sgn_list}")
         logger.info("Start receiving signals...")
-        start_time = time.time()
+        frame_sgn_dict = dict()
+        for message, sgn in zip(message_list, exp_sgn_list):
+            frame_sgn_dict.setdefault(message.frame_id, (message, list()))[1].append(sgn)
+        buffer = CaptureBuffer({frame_id: sgn_names for frame_id, (_, sgn_names) in frame_sgn_dict.items()},
+                               kwargs.get("maxlen"), kwargs.get("dedup", DEDUP_CHANGE))
+        listener = self.__dispatcher.subscribe(*frame_sgn_dict)
+        deadline = self.__deadline(duration)
         count = 0
         try:
             while True:
-                raw_message = listener.get_message()
+                raw_message = listener.wait_message(deadline)
                 if not raw_message:
-                    if duration:
-                        if time.time() - start_time > duration:
-                            break
-                    continue
+                    break
                 count += 1
-                for message in message_list:
-                    received_sgn_dict = {}
-                    if message.frame_id == raw_message.arbitration_id:
-                        logger.debug(f"Receive RawMessage: {raw_message}")
-                        if raw_message not in raw_message_list:
-                            raw_message_list.append(raw_message)
-                        try:
-                            sgn_dict = message.decode(raw_message.data)
-                        except Exception as ex:
-                            logger.error(f"Unable to parse message:{raw_message} \npossible mismatch between "
-                                         f"type of can channel {raw_message.channel} and dbc: {self.db_path}")
-                            continue
-                        logger.debug(f"Received message dict:{sgn_dict}")
-
-                        for name, value in sgn_dict.items():
-
-                            for sgn in exp_sgn_list:
-                                if sgn == name:
-                                    sgn_object = self.__db.get_signal_by_name(name)
-                                    if sgn_object.choices:
-                                        value = sgn_object.choice_string_to_number(value)
-                                    received_sgn_dict.update({name: value})
-                    if received_sgn_dict and received_sgn_dict not in signal_list:
-                        signal_list.append(received_sgn_dict)
-                end_time = time.time()
-                if duration:
-                    if end_time - start_time > duration:
-                        break
+                message, sgn_names = frame_sgn_dict[raw_message.arbitration_id]
+                logger.debug(f"Receive RawMessage: {raw_message}")
+                try:
+                    received_sgn_dict = self.__decode_signals(message, raw_message.data, sgn_names)
+                except Exception as ex:
+                    logger.error(f"Unable to parse message:{raw_message} \npossible mismatch between "
+                                 f"type of can channel {raw_message.channel} and dbc: {self.db_path}")
+                else:
+                    logger.debug(f"Received message dict:{received_sgn_dict}")
+                    if received_sgn_dict:
+                        buffer.append(raw_message, received_sgn_dict)
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
                 if kwargs.get("num"):
                     if count == kwargs.get("num"):
                         break
         except KeyboardInterrupt:
-            self.__notifier.remove_listener(listener)
-            logger.debug(f"Received raw messages: {raw_message_list}")
-            logger.info(f"Received signals: {signal_list}")
-            return signal_list
-        self.__notifier.remove_listener(listener)
-        logger.debug(f"Received raw messages: {raw_message_list}")
-        logger.info(f"Received signals: {signal_list}")
-        return signal_list
+            pass
+        listener.stop()
+        logger.info(f"Received {count} messages, saved signals of {len(buffer)} messages "
+                    f"(skipped {buffer.skipped} unchanged, dropped {buffer.dropped} oldest)")
+        return buffer.signals()
 
     def receive_message_once(self, can_id: Union[int, str] = None, timeout: float = None
                              ) -> typing.Optional[RawMessage]:
@@ -545,44 +574,23 @@ class CanController(object):
             except:
                 can_id = can_id
 
-        listener = BufferedReader()
-        self.__notifier.add_listener(listener)
-        received_raw_message = None
-        start_time = time.time()
-        while True:
-
-            raw_message = listener.get_message()
-            if not raw_message:
-                if timeout:
-                    if time.time() - start_time > timeout:
-                        break
-                continue
-            else:
-                if not can_id:
-                    received_raw_message = raw_message
-                    break
-
-                if raw_message.arbitration_id == can_id:
-                    received_raw_message = raw_message
-                    break
-
-            if timeout:
-                if time.time() - start_time > timeout:
-                    break
-        self.__notifier.remove_listener(listener)
+        with self.__dispatcher.subscribe(*([can_id] if can_id else [])) as listener:
+            received_raw_message = listener.wait_message(self.__deadline(timeout))
         logger.info(f"Received raw message: {received_raw_message}")
         return received_raw_message
 
     def receive_messages(self, *can_ids: Union[int, str], duration: float = None, **kwargs: Any
-                         ) -> typing.Set[RawMessage]:
+                         ) -> MessageView:
         """
-        功能说明：持续接收报文，可接收一个或多个报文
+        功能说明：持续接收报文，可接收一个或多个报文，接收到的报文按列保存在CaptureBuffer中
         参数说明：
             :param can_ids: 想要接收报文id，格式为can_id1, can_id2, 不传入该参数则接收全部报文
             :param duration: 接收裸数据的最长时长
-            :param kwargs: 目前是可以传一个num=xx，如num=1000, 表示接收到1000条messages就停止接收，也用于后续扩展
+            :param kwargs: num=xx，如num=1000, 表示接收到1000条messages就停止接收；
+                           maxlen=xx，最多保存的报文数，超出后覆盖最早的报文，默认不限制；
+                           dedup=xx，默认为DEDUP_NONE，DEDUP_CHANGE则同一报文的负载与上一帧相同时不保存
         异常说明：无
-        返回值：raw_message_list 接收到的裸数据列表
+        返回值：接收到的裸数据序列MessageView，按接收顺序排列，读取时才构造报文对象
         """
         if not (self.__bus and self.__notifier):
             raise CanOperationError(f"The BUS is not instantiated.Please call the 'connect' method "
@@ -593,43 +601,76 @@ class CanController(object):
                 can_id_list.append(int(can_id, 16))
             else:
                 can_id_list.append(int(can_id))
-        listener = BufferedReader()
-        self.__notifier.add_listener(listener)
         count = 0
-        raw_message_list = set()
-        start_time = time.time()
-        while True:
-            raw_message = listener.get_message()
-            if not raw_message:
-                if duration:
-                    if time.time() - start_time > duration:
-                        break
-                continue
-            count += 1
-            if can_id_list:
-                for can_id in can_id_list:
-                    if raw_message.arbitration_id == can_id:
-                        logger.info(f"Received raw message: {raw_message}")
-                        raw_message_list.add(raw_message)
-            else:
+        buffer = CaptureBuffer(maxlen=kwargs.get("maxlen"), dedup=kwargs.get("dedup", DEDUP_NONE))
+        deadline = self.__deadline(duration)
+        with self.__dispatcher.subscribe(*can_id_list) as listener:
+            while True:
+                raw_message = listener.wait_message(deadline)
+                if not raw_message:
+                    break
+                count += 1
                 logger.info(f"Received raw message: {raw_message}")
-                raw_message_list.add(raw_message)
+                buffer.append(raw_message)
 
-            end_time = time.time()
-            if duration:
-                if end_time - start_time > duration:
-                    break
-            if kwargs.get("num"):
-                if count == kwargs.get("num"):
+                if deadline is not None and time.monotonic() >= deadline:
                     break
-        self.__notifier.remove_listener(listener)
-        return raw_message_list
+                if kwargs.get("num"):
+                    if count == kwargs.get("num"):
+                        break
+        return buffer.messages()
+
+    def expect_all(self, expectations: typing.Iterable[ExpectationLike], timeout: float = None
+                   ) -> ExpectationReport:
+        """
+        功能说明：等待一组期望全部满足，所有期望共用一个接收回调，每帧只检查该报文id上的期望，全部满足后立即返回
+        参数说明：
+            :param expectations: 期望列表，可以是报文id(期望报文出现)、Expectation对象或者信号字典，
+                                 如[0x123, {"sgn1": 1, "sgn2": (0, 100)}]，信号值为元组时表示范围(minimum, maximum)
+            :param timeout: 超时时间，单位为s，None表示一直等待
+        异常说明：
+            :exception CanOperationError: 总线没有连接
+            :exception KeyError: 数据库中没有该信号
+            :exception TypeError: 不支持的期望写法
+        返回值：ExpectationReport对象，包含是否全部满足、每个期望第一次满足的报文时间戳和值以及等待时长
+        """
+        return self.__expect(expectations, timeout, False)
+
+    def expect_any(self, expectations: typing.Iterable[ExpectationLike], timeout: float = None
+                   ) -> ExpectationReport:
+        """
+        功能说明：等待一组期望中任意一个满足，满足后立即返回
+        参数说明：
+            :param expectations: 期望列表，写法与expect_all一致
+            :param timeout: 超时时间，单位为s，None表示一直等待
+        异常说明：
+            :exception CanOperationError: 总线没有连接
+            :exception KeyError: 数据库中没有该信号
+            :exception TypeError: 不支持的期望写法
+        返回值：ExpectationReport对象，satisfied表示是否有期望满足
+        """
+        return self.__expect(expectations, timeout, True)
+
+    def __expect(self, expectations: typing.Iterable[ExpectationLike], timeout: typing.Optional[float],
+                 any_of: bool) -> ExpectationReport:
+        if not (self.__bus and self.__notifier):
+            raise CanOperationError(f"The BUS is not instantiated.Please call the 'connect' method "
+                                    f"to instantiate the BUS and try again")
+        expectation_set = ExpectationSet(self.__db, self.__dispatcher, expectations, any_of)
+        logger.info(f"Expected {'any of' if any_of else 'all of'}: {expectation_set.expectations}")
+        report = expectation_set.wait(timeout)
+        if report.satisfied:
+            logger.info(f"Expectations satisfied in {report.elapsed:.3f}s")
+        else:
+            logger.warning(f"Expectations not satisfied in {report.elapsed:.3f}s, missing: {report.missing}")
+        return report
 
     def modify_sending_signals(self, *signals: dict, **kwargs: Any) -> None:
         """
         功能说明：修改周期性信号
         参数说明：
-            :param signals: 需要修改的信号和对应值组成的字典， 例如： {signal_name: signal_value}，注意要修改的信号必然是先前发送的
+            :param signals: 需要修改的信号和对应值组成的字典， 例如： {signal_name: signal_value}，注意要修改的信号必然是先前发送的，
+                            信号值为物理值(经过精度和偏移量换算)或者枚举名
             :param kwargs: 关键字参数，例如signal_name=signal_value
         异常说明：无
         返回值：None
@@ -638,18 +679,28 @@ class CanController(object):
             raise ValueError("At least one msg can_id-data pair should be passed in.")
         signals = signals + (kwargs,)
         msg_sgn_dict = self._divide_signal_names_values_into_groups(signals)
-        for task in self.bus.periodic_tasks:
-            raw_messages = list()
-            for raw_message in copy.deepcopy(task.messages):
-                for msg_name, sgn_dict in msg_sgn_dict.items():
-                    message = self.__db.get_message_by_name(msg_name)
-                    if message.frame_id == task.arbitration_id:
-                        full_signal_dict = message.decode(raw_message.data)
-                        full_signal_dict.update(sgn_dict)
-                        raw_message.data = message.encode(data=full_signal_dict)
-                        raw_messages.append(raw_message)
-                        logger.info(f"Modify sending raw message: {raw_message}")
-            task.modify_data(raw_messages)
+        for msg_name, sgn_dict in msg_sgn_dict.items():
+            message = self.__db.get_message_by_name(msg_name)
+            task = self.__periodic_tasks.get(message.frame_id)
+            if task is None:
+                logger.warning(f"Message {msg_name} is not being sent periodically, "
+                               f"signals {list(sgn_dict)} are not modified.")
+                continue
+            template = self.__get_frame_template(message)
+            if template:
+                payloads = [template.encode(sgn_dict, template.from_bytes(raw_message.data), physical=True)
+                            for raw_message in task.messages]
+                datas = [template.to_bytes(payload) for payload in self.__update_e2e_checksums(template, payloads)]
+            else:
+                datas = list()
+                for raw_message in task.messages:
+                    full_signal_dict = message.decode(raw_message.data)
+                    full_signal_dict.update(sgn_dict)
+                    datas.append(message.encode(data=full_signal_dict))
+            for raw_message, data in zip(task.messages, datas):
+                raw_message.data[:len(data)] = data
+            task.modify_data(task.messages)
+            logger.info(f"Modify sending raw message: {task.messages[0]}")
 
     def modify_sending_signals_callback(self, *signals: dict, **kwargs: Any) -> None:
         """
@@ -673,22 +724,18 @@ class CanController(object):
     def _divide_signal_names_values_into_groups(self, signals: typing.Tuple[dict]) -> dict:
         msg_sgn_dict = dict()
         for signal in signals:
-            msg_name_set = set()
+            msg_name_sgn_dict = dict()
             self.__sent_signals.update(signal)
-            for sgn_name in signal.keys():
+            for sgn_name, sgn_value in signal.items():
                 try:
                     message = self.__db.get_message_by_signal(sgn_name)
-                    msg_name_set.add(message.name)
-                except:
+                except KeyError:
                     logger.error(f"Can't find the message with Signal: "
                                  f"{sgn_name} in database {self.__db_path}")
+                    continue
+                msg_name_sgn_dict.setdefault(message.name, dict()).update({sgn_name: sgn_value})
 
-            for msg_name in msg_name_set:
-                new_sgn_dict = dict()
-                for sgn_name, sgn_value in signal.items():
-                    message = self.__db.get_message_by_signal(sgn_name)
-                    if msg_name == message.name:
-                        new_sgn_dict.update({sgn_name: sgn_value})
+            for msg_name, new_sgn_dict in msg_name_sgn_dict.items():
                 logger.info(f"Send message: {msg_name}, signals: {new_sgn_dict}")
                 msg_sgn_dict.update({msg_name: new_sgn_dict})
 
@@ -705,7 +752,7 @@ class CanController(object):
         if not (self.__bus and self.__notifier):
             raise CanOperationError(f"The BUS is not instantiated.Please call the 'connect' method "
                                     f"to instantiate the BUS and try again")
-        filters = list()
+        can_ids = set()
         for arg in set(args):
             if str(arg).startswith('0x'):
                 can_id = int(arg, 16)
@@ -720,14 +767,75 @@ class CanController(object):
                         continue
                     else:
                         can_id = message.frame_id
+            can_ids.add(can_id)
+        if self.__listener:
+            self.__listener.stop()
+        self.__listener = self.__dispatcher.subscribe(*can_ids)
 
-            can_filter = {"can_id": can_id,
-                          "can_mask": 0x1fffffff,
-                          "extended": False if can_id <= 0x7ff else True}
-            filters.append(can_filter)
-        self.bus.filters = filters
-        self.__listener = BufferedReader()
-        self.__notifier.add_listener(self.__listener)
+    def start_signal_cache(self, *args: typing.Union[int, str]) -> None:
+        """
+        功能说明：开始在后台缓存报文中信号的最新值，之后可通过get_signal_value立即获取信号值
+        参数说明：
+            :param args: 需要缓存的报文id，格式为can_id1, can_id2，或者信号名, 不传入该参数则缓存数据库中的全部报文
+        异常说明：无
+        返回值：None
+        """
+        messages = list() if args else list(self.__db.messages)
+        for arg in set(args):
+            try:
+                if str(arg).startswith('0x'):
+                    message = self.__db.get_message_by_frame_id(int(arg, 16))
+                elif isinstance(arg, int) or str(arg).isdigit():
+                    message = self.__db.get_message_by_frame_id(int(arg))
+                else:
+                    message = self.__db.get_message_by_signal(arg)
+            except KeyError:
+                logger.warning(f"Can't find the message of {arg} in database {self.__db_path}")
+                continue
+            messages.append(message)
+        self.__signal_cache.subscribe(*messages)
+        logger.info(f"Start caching signals of messages: {[message.name for message in messages]}")
+
+    def stop_signal_cache(self) -> None:
+        """
+        功能说明：停止缓存信号值并清空缓存
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        self.__signal_cache.clear()
+        logger.info("Stop caching signals")
+
+    def get_cached_signal(self, name: str, max_age: float = None) -> typing.Optional[CachedSignal]:
+        """
+        功能说明：获取缓存的信号，包含信号值、原始值、报文时间戳和报文接收计数，不等待总线上的报文
+        参数说明：
+            :param name: 信号名，信号所在报文需先通过start_signal_cache开始缓存
+            :param max_age: 缓存值的最大有效时长，单位为s，None则不限制
+        异常说明：无
+        返回值：CachedSignal对象，没有缓存值或者缓存值已过期时返回None
+        """
+        try:
+            cached_signal = self.__signal_cache.get(name, max_age)
+        except KeyError:
+            logger.error(f"Can't find the signal {name} in database {self.__db_path}")
+            return None
+        if cached_signal is None:
+            logger.warning(f"No cached value of signal {name}"
+                           f"{f' received in the last {max_age}s' if max_age is not None else ''}")
+        return cached_signal
+
+    def get_signal_value(self, name: str, max_age: float = None) -> typing.Optional[typing.Union[int, float]]:
+        """
+        功能说明：获取缓存的信号值，不等待总线上的报文，带枚举值的信号返回枚举对应的数值
+        参数说明：
+            :param name: 信号名，信号所在报文需先通过start_signal_cache开始缓存
+            :param max_age: 缓存值的最大有效时长，单位为s，None则不限制
+        异常说明：无
+        返回值：信号值，没有缓存值或者缓存值已过期时返回None
+        """
+        cached_signal = self.get_cached_signal(name, max_age)
+        return cached_signal.value if cached_signal else None
 
     def get_received_raw_messages(self, num: int = 0) -> queue.SimpleQueue:
         new_received_raw_message_queue = queue.SimpleQueue()
@@ -777,6 +885,116 @@ class CanController(object):
                 new_received_signal_queue.put(parsed_dict)
         return new_received_signal_queue
 
+    @staticmethod
+    def __deadline(timeout: typing.Optional[float]) -> typing.Optional[float]:
+        # 超时时间为None或0时一直等待，与原有接口一致
+        return time.monotonic() + timeout if timeout else None
+
+    @staticmethod
+    def __decode_signals(message: Message, data: bytes, sgn_names: typing.Sequence[str]) -> dict:
+        """
+        功能说明：只解析报文中指定的信号，带枚举值的信号返回枚举对应的数值
+        参数说明：
+            :param message: Message类型，从CAN数据库中解析到的CAN Frame对象
+            :param data: 报文数据
+            :param sgn_names: 需要解析的信号名
+        异常说明：无
+        返回值：信号字典，格式为{sgn_name, sgn_value}
+        """
+        sgn_dict = message.decode(data, signals=sgn_names)
+        for name, value in sgn_dict.items():
+            if isinstance(value, NamedSignalValue):
+                sgn_dict[name] = value.value
+        return sgn_dict
+
+    def __send_periodic(self, raw_messages: List[RawMessage], period: float) -> None:
+        """
+        功能说明：按cyclic_backend开始周期发送报文，同一个报文id已有的周期任务会先停止
+        参数说明：
+            :param raw_messages: 同一个报文id的报文，每个周期依次发送其中一帧
+            :param period: 发送周期，单位为s
+        异常说明：无
+        返回值：None
+        """
+        arbitration_id = raw_messages[0].arbitration_id
+        old_task = self.__periodic_tasks.pop(arbitration_id, None)
+        if old_task:
+            old_task.stop()
+        if self.__cyclic_backend == "scheduler":
+            task = CyclicScheduler.default().send_periodic(self.__bus, raw_messages, period)
+        else:
+            task = self.__bus.send_periodic(msgs=raw_messages, period=period)
+        self.__periodic_tasks[arbitration_id] = task
+
+    def __stop_periodic_tasks(self) -> None:
+        for task in self.__periodic_tasks.values():
+            task.stop()
+        self.__periodic_tasks.clear()
+
+    def __get_frame_template(self, message: Message) -> typing.Optional[FrameTemplate]:
+        """
+        功能说明：获取报文的预编译模板，模板在首次使用时创建并缓存
+        参数说明：
+            :param message: Message类型，从CAN数据库中解析到的CAN Frame对象
+        异常说明：无
+        返回值：FrameTemplate对象，报文不支持模板编码(复用报文、容器报文)时返回None
+        """
+        if message.frame_id not in self.__templates:
+            try:
+                self.__templates[message.frame_id] = FrameTemplate(message)
+            except ValueError as ex:
+                logger.debug(f"{ex} Fall back to full encoding.")
+                self.__templates[message.frame_id] = None
+        return self.__templates[message.frame_id]
+
+    def __generate_payloads_with_e2e(self, template: FrameTemplate, payload: int, count: int = 1) -> List[int]:
+        """
+        功能说明：生成连续count帧的负载，更新E2E计数器和校验和，计算规则与__update_signals_with_e2e一致
+        参数说明：
+            :param template: 报文的预编译模板
+            :param payload: 已写入信号值的负载
+            :param count: 生成的帧数
+        异常说明：无
+        返回值：负载列表
+        """
+        payloads = [payload] * count
+        for e2e_group in template.e2e_groups:
+            if e2e_group.checksum in self.__sent_signals:
+                continue
+            counter = template.get_raw(payload, e2e_group.counter)
+            if counter == 0 and self.init_counter:
+                counter = -1
+            payloads = [template.set_raw(payload, e2e_group.counter, (counter + 1 + i) % 15)
+                        for i, payload in enumerate(payloads)]
+        return self.__update_e2e_checksums(template, payloads)
+
+    def __update_e2e_checksums(self, template: FrameTemplate, payloads: List[int]) -> List[int]:
+        """
+        功能说明：按各负载当前的计数器值重新计算E2E校验和，所有负载除计数器和校验和外的信号值相同，校验和一次批量计算
+        参数说明：
+            :param template: 报文的预编译模板
+            :param payloads: 负载列表
+        异常说明：无
+        返回值：更新后的负载列表
+        """
+        for e2e_group in template.e2e_groups:
+            if e2e_group.checksum in self.__sent_signals:
+                continue
+            try:
+                data_id = int(e2e_group.data_id, 16)
+            except (TypeError, ValueError):
+                if set(e2e_group.signal_names) & self.__sent_signals:
+                    logger.warning(f"The data id of this signal {e2e_group.checksum} is {e2e_group.data_id},"
+                                   f"Please check whether the sdb file is correct and try again,"
+                                   f"The value of this {e2e_group.checksum} signal remains unchanged here")
+                continue
+            counters = [template.get_raw(payload, e2e_group.counter) for payload in payloads]
+            sig_value_length = [(template.get_raw(payloads[0], name), length) for name, length in e2e_group.values]
+            checksums = e2e_crc_batch(data_id=data_id, sig_value_length=sig_value_length, counters=counters)
+            payloads = [template.set_raw(payload, e2e_group.checksum, checksum)
+                        for payload, checksum in zip(payloads, checksums)]
+        return payloads
+
     def __update_signals_without_e2e(self, message: Message, sgn_dict: dict) -> typing.Dict:
         """
         功能说明：首次更新CAN信号字典值，不带E2E
@@ -798,16 +1016,13 @@ class CanController(object):
                 if sgn.name.endswith("_UB"):
                     ub_sgn_dict.update({sgn.name: 1})
                 else:
-                    import decimal
                     if sgn.name in sgn_dict.keys():
                         sgn_value = sgn_dict[sgn.name]
                         if isinstance(sgn_value, (int, float)):
                             sgn_dict[sgn.name] = (sgn_dict[sgn.name] * sgn.scale + sgn.offset)
                     else:
-                        if isinstance(sgn.initial, decimal.Decimal):
-                            sgn_default_value = (sgn.scale * float(sgn.initial) + sgn.offset)
-                        else:
-                            sgn_default_value = 0
+                        # 与报文模板的默认负载一致，初始值为原始值，这里换算为物理值
+                        sgn_default_value = sgn.scale * FrameTemplate.default_raw(sgn) + sgn.offset
                         unused_sgn_dict.update({sgn.name: sgn_default_value})
         updated_sgn_dict.update(ub_sgn_dict)
         updated_sgn_dict.update(unused_sgn_dict)
@@ -881,7 +1096,8 @@ class CanController(object):
         功能说明：接收某ecu发送的信号，并针对指定的信号值做修改，然后再发送修改后的和未修改的全部信号
         参数说明：
             :param signals: 需要修改的信号和对应值组成的字典， 例如： {signal_name: signal_value}，
-                            注意要修改的信号必须是ecu正在发送的
+                            注意要修改的信号必须是ecu正在发送的，信号值为物理值(经过精度和偏移量换算)或者枚举名，
+                            不需要修改的报文不解析，直接转发
             :param send_bus: 修改后的信号发送总线, 若为None或者不是BusABC(子类)实例，默认使用接收总线作为发送总线
             :param kwargs: 关键字参数，例如signal_name=signal_value
         异常说明：无
@@ -892,22 +1108,24 @@ class CanController(object):
             raise ValueError("At least one msg 'can_id:data' pair should be passed in.")
         signals = signals + (kwargs,)
         msg_sgn_dict = self._divide_signal_names_values_into_groups(signals)
-        listener = BufferedReader()
-        self.__notifier.add_listener(listener)
+        frame_sgn_dict = dict()
+        for msg_name, sgn_dict in msg_sgn_dict.items():
+            frame = self.__db.get_message_by_name(msg_name)
+            frame_sgn_dict[frame.frame_id] = (frame, sgn_dict)
+        listener = self.__dispatcher.subscribe()
         bus = send_bus if send_bus and isinstance(send_bus, BusABC) else self.bus
 
         def send_handler():
             while True:
 
-                raw_message = listener.get_message()
+                raw_message = listener.wait_message()
                 if not raw_message or raw_message.arbitration_id == 1:
                     continue
 
                 try:
                     raw_message.channel = bus.channel_info
-                    frame = self.db.get_message_by_frame_id(raw_message.arbitration_id)
-                    sgn_dict = msg_sgn_dict.get(frame.name)
-                    if sgn_dict:
+                    if raw_message.arbitration_id in frame_sgn_dict:
+                        frame, sgn_dict = frame_sgn_dict[raw_message.arbitration_id]
                         full_signal_dict = frame.decode(raw_message.data)
                         full_signal_dict.update(sgn_dict)
                         raw_message.data = frame.encode(data=full_signal_dict)
@@ -923,7 +1141,7 @@ class CanController(object):
         threading.Thread(name=f"canapp.controller.modify_ecu_sending for bus '{bus.channel_info}'", target=send_handler, daemon=True).start()
 
     def start_receiving(self) -> bool:
-        self.__notifier = Notifier(self.__bus, [])
+        self.__notifier = Notifier(self.__bus, [self.__dispatcher])
         return True
 
     def stop_receiving(self) -> bool:
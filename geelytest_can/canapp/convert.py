@@ -0,0 +1,228 @@
+import os
+import glob
+import time
+import queue
+import logging
+import pathlib
+import threading
+import multiprocessing
+import typing
+from can import Logger
+from can import LogReader
+from can import SizedRotatingLogger
+from can import Message as RawMessage
+from .merge import LOG_SUFFIXES
+
+
+logger = logging.getLogger(__name__)
+
+# 读线程每次交给写线程的报文数和队列中最多缓存的批次数
+CONVERT_BATCH = 1024
+CONVERT_QUEUE = 16
+# 转换过程中输出进度的间隔，单位为s
+PROGRESS_INTERVAL = 5.0
+
+PathType = typing.Union[pathlib.Path, str]
+
+
+class ConversionStatistics(typing.NamedTuple):
+    source: pathlib.Path
+    dest: pathlib.Path
+    frames: int
+    source_bytes: int
+    duration: float
+    frame_rate: float
+    byte_rate: float
+
+
+def _read_position(reader: typing.Any) -> typing.Optional[int]:
+    # 文本文件在迭代过程中不能调用tell，此时不统计读取的字节数
+    try:
+        return reader.file.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _read_batches(reader: typing.Any, batches: queue.Queue, stop_event: threading.Event,
+                  position: typing.List[typing.Optional[int]]) -> None:
+    def put(item) -> bool:
+        while not stop_event.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    batch: typing.List[RawMessage] = list()
+    try:
+        for message in reader:
+            batch.append(message)
+            if len(batch) >= CONVERT_BATCH:
+                position[0] = _read_position(reader)
+                if not put(batch):
+                    return
+                batch = list()
+        if batch:
+            put(batch)
+    except Exception as ex:
+        logger.exception(ex)
+        put(ex)
+    finally:
+        put(None)
+
+
+def convert_log(input_file: PathType, output_file: PathType, file_size: int = 0,
+                progress_interval: typing.Optional[float] = PROGRESS_INTERVAL) -> ConversionStatistics:
+    """
+    功能说明：转换log文件格式，读取和写入分别在两个线程中进行，通过有界队列按批传递报文，
+              blf的解压和压缩分别在两个线程中进行，可以互相重叠
+    参数说明：
+        :param input_file: 源文件，文件格式为*.blf, *.asc等格式
+        :param output_file: 目标文件，按后缀确定文件格式
+        :param file_size: 目标文件的切分大小，单位为byte，0表示不切分
+        :param progress_interval: 输出进度的间隔，单位为s，None表示不输出进度
+    异常说明：
+        :exception ValueError: 不支持的文件格式或者目标文件就是源文件
+    返回值：ConversionStatistics，frame_rate为每秒转换的帧数，byte_rate为每秒读取的源文件字节数
+    """
+    input_file, output_file = pathlib.Path(input_file), pathlib.Path(output_file)
+    if output_file.resolve() == input_file.resolve():
+        raise ValueError(f"Output file {output_file} is the same as input file {input_file}")
+    source_bytes = input_file.stat().st_size
+    batches: queue.Queue = queue.Queue(CONVERT_QUEUE)
+    stop_event = threading.Event()
+    position: typing.List[typing.Optional[int]] = [None]
+    frames = 0
+    start_time = progress_time = time.perf_counter()
+    with LogReader(input_file) as reader:
+        if file_size:
+            writer = SizedRotatingLogger(base_filename=output_file, max_bytes=file_size)
+        else:
+            writer = Logger(filename=output_file)
+        thread = threading.Thread(target=_read_batches, args=(reader, batches, stop_event, position),
+                                  name=f"convert-reader-{input_file.name}", daemon=True)
+        thread.start()
+        try:
+            with writer:
+                while True:
+                    batch = batches.get()
+                    if batch is None:
+                        break
+                    if isinstance(batch, Exception):
+                        raise batch
+                    for message in batch:
+                        writer.on_message_received(message)
+                    frames += len(batch)
+                    now = time.perf_counter()
+                    if progress_interval is not None and now - progress_time >= progress_interval:
+                        progress_time = now
+                        elapsed = now - start_time
+                        read_bytes = position[0]
+                        progress = f", {read_bytes / source_bytes:.0%}" if read_bytes and source_bytes else ""
+                        logger.info(f"Converting {input_file.name}: {frames} frames{progress}, "
+                                    f"{frames / elapsed:.0f} frames/s")
+        finally:
+            stop_event.set()
+            thread.join()
+    duration = time.perf_counter() - start_time
+    statistics = ConversionStatistics(source=input_file,
+                                      dest=output_file,
+                                      frames=frames,
+                                      source_bytes=source_bytes,
+                                      duration=duration,
+                                      frame_rate=frames / duration if duration > 0 else 0.0,
+                                      byte_rate=source_bytes / duration if duration > 0 else 0.0)
+    logger.info(f"Converted {input_file} to {output_file}: {frames} frames in {duration:.2f} s, "
+                f"{statistics.frame_rate:.0f} frames/s, {statistics.byte_rate / (1 << 20):.2f} MB/s")
+    return statistics
+
+
+def expand_log_files(sources: typing.Union[PathType, typing.Iterable[PathType]]
+                     ) -> typing.Tuple[pathlib.Path, typing.List[pathlib.Path]]:
+    """
+    功能说明：展开需要转换的log文件
+    参数说明：
+        :param sources: 目录(递归查找其中的log文件)、通配符(例如/can_bus_log/*/BodyCAN/*.blf)、文件或它们的列表
+    异常说明：
+        :exception FileNotFoundError: 没有找到log文件
+    返回值：(所有文件的公共目录, 排序后的log文件列表)
+    """
+    sources = [sources] if isinstance(sources, (str, pathlib.PurePath)) else list(sources)
+    files: typing.List[pathlib.Path] = list()
+    for source in map(str, sources):
+        if os.path.isdir(source):
+            files.extend(file for file in pathlib.Path(source).rglob("*")
+                         if file.is_file() and file.suffix.lower() in LOG_SUFFIXES)
+        elif glob.has_magic(source):
+            files.extend(pathlib.Path(file) for file in glob.glob(source, recursive=True) if os.path.isfile(file))
+        elif os.path.isfile(source):
+            files.append(pathlib.Path(source))
+    if not files:
+        raise FileNotFoundError(f"No log file found in {sources}")
+    files = sorted(set(files))
+    return pathlib.Path(os.path.commonpath([file.resolve().parent for file in files])), files
+
+
+def _convert_job(args: tuple) -> ConversionStatistics:
+    input_file, output_file, file_size = args
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    return convert_log(input_file, output_file, file_size, progress_interval=None)
+
+
+def convert_logs(sources: typing.Union[PathType, typing.Iterable[PathType]],
+                 dest_dir: PathType,
+                 suffix: str = ".asc",
+                 file_size: int = 0,
+                 jobs: int = 1
+                 ) -> typing.List[ConversionStatistics]:
+    """
+    功能说明：批量转换log文件格式，多个文件在多个进程中同时转换，目标文件保持源文件的相对目录结构
+    参数说明：
+        :param sources: 目录、通配符、文件或它们的列表，格式见expand_log_files
+        :param dest_dir: 目标目录
+        :param suffix: 目标文件的后缀，例如.asc
+        :param file_size: 每个目标文件的切分大小，单位为byte，0表示不切分
+        :param jobs: 进程数，0表示使用全部cpu，1表示在当前进程中逐个转换
+    异常说明：
+        :exception FileNotFoundError: 没有找到log文件
+        :exception ValueError: 目标文件会覆盖某个源文件，或者多个源文件对应同一个目标文件(例如x.blf和x.asc)
+    返回值：每个文件的ConversionStatistics，按源文件排序
+    """
+    base_dir, files = expand_log_files(sources)
+    dest_dir = pathlib.Path(dest_dir)
+    tasks = [(file, dest_dir / file.resolve().relative_to(base_dir).with_suffix(suffix), file_size)
+             for file in files]
+    # 开始转换前检查，避免写入时截断正在读取的源文件或者多个进程同时写同一个文件
+    inputs = {file.resolve(): file for file in files}
+    outputs: typing.Dict[pathlib.Path, pathlib.Path] = dict()
+    for file, output_file, _ in tasks:
+        resolved = output_file.resolve()
+        if resolved in inputs:
+            raise ValueError(f"Output file {output_file} of {file} would overwrite input file {inputs[resolved]}")
+        if resolved in outputs:
+            raise ValueError(f"{outputs[resolved]} and {file} would both be converted to {output_file}")
+        outputs[resolved] = file
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    logger.info(f"Converting {len(tasks)} log files with {jobs} processes.")
+    results: typing.Dict[pathlib.Path, ConversionStatistics] = dict()
+    start_time = time.perf_counter()
+    frames = source_bytes = 0
+
+    def progress(statistics: ConversionStatistics) -> None:
+        nonlocal frames, source_bytes
+        results[statistics.source] = statistics
+        frames += statistics.frames
+        source_bytes += statistics.source_bytes
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"[{len(results)}/{len(tasks)}] {statistics.source} -> {statistics.dest}, "
+                    f"total {frames / elapsed:.0f} frames/s, {source_bytes / elapsed / (1 << 20):.2f} MB/s")
+
+    if jobs <= 1:
+        for task in tasks:
+            progress(_convert_job(task))
+    else:
+        with multiprocessing.Pool(jobs) as pool:
+            for statistics in pool.imap_unordered(_convert_job, tasks):
+                progress(statistics)
+    return [results[file] for file, _, _ in tasks]
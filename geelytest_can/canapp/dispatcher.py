@@ -0,0 +1,175 @@
+import queue
+import time
+import logging
+import threading
+import typing
+from can import Listener
+from can import Message as RawMessage
+
+
+logger = logging.getLogger(__name__)
+
+FrameSink = typing.Callable[[RawMessage], None]
+
+
+class FrameSubscription(object):
+    """
+    按报文id订阅的接收缓存，接口与BufferedReader保持一致
+    """
+
+    def __init__(self, dispatcher: "FrameDispatcher", can_ids: typing.Iterable[int] = ()) -> None:
+        """
+        功能说明：初始化对象并注册到分发器
+        参数说明：
+            :param dispatcher: 帧分发器
+            :param can_ids: 订阅的报文id，为空则订阅全部报文
+        异常说明：无
+        返回值：None
+        """
+        self.buffer = queue.Queue()
+        self.can_ids = frozenset(can_ids)
+        self.is_stopped = False
+        self.__dispatcher = dispatcher
+        self.__dispatcher.add_sink(self.on_message_received, self.can_ids)
+
+    def on_message_received(self, msg: RawMessage) -> None:
+        if not self.is_stopped:
+            self.buffer.put_nowait(msg)
+
+    def get_message(self, timeout: float = 0.5) -> typing.Optional[RawMessage]:
+        """
+        功能说明：获取一帧订阅的报文
+        参数说明：
+            :param timeout: 等待报文的最长时间，None则一直等待
+        异常说明：无
+        返回值：接收到的报文，超时则返回None
+        """
+        try:
+            return self.buffer.get(block=not self.is_stopped, timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def wait_message(self, deadline: float = None) -> typing.Optional[RawMessage]:
+        """
+        功能说明：等待一帧订阅的报文，收到报文、到达截止时间或取消订阅时立即返回，等待期间不占用CPU
+        参数说明：
+            :param deadline: time.monotonic()表示的截止时间，None则一直等待
+        异常说明：无
+        返回值：接收到的报文，超时或已取消订阅且缓存为空时返回None
+        """
+        buffer = self.buffer
+        with buffer.not_empty:
+            while not buffer.queue:
+                if self.is_stopped:
+                    return None
+                if deadline is None:
+                    buffer.not_empty.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    buffer.not_empty.wait(remaining)
+            return buffer.queue.popleft()
+
+    def stop(self) -> None:
+        """
+        功能说明：取消订阅，已缓存的报文仍可读取
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        if not self.is_stopped:
+            self.is_stopped = True
+            self.__dispatcher.remove_sink(self.on_message_received, self.can_ids)
+            # 唤醒正在wait_message中等待的线程
+            with self.buffer.not_empty:
+                self.buffer.not_empty.notify_all()
+
+    def __enter__(self) -> "FrameSubscription":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.stop()
+
+
+class FrameDispatcher(Listener):
+    """
+    每个总线共享的帧分发器，按报文id把接收到的帧转发给订阅者
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__id_sinks: typing.Dict[int, typing.Tuple[FrameSink, ...]] = dict()
+        self.__catch_all_sinks: typing.Tuple[FrameSink, ...] = tuple()
+
+    def add_sink(self, sink: FrameSink, can_ids: typing.Iterable[int] = ()) -> None:
+        """
+        功能说明：注册一个接收回调
+        参数说明：
+            :param sink: 接收回调，参数为接收到的报文，在Notifier的接收线程中执行
+            :param can_ids: 订阅的报文id，为空则订阅全部报文
+        异常说明：无
+        返回值：None
+        """
+        can_ids = set(can_ids)
+        with self.__lock:
+            if not can_ids:
+                self.__catch_all_sinks += (sink,)
+            for can_id in can_ids:
+                self.__id_sinks[can_id] = self.__id_sinks.get(can_id, tuple()) + (sink,)
+
+    def remove_sink(self, sink: FrameSink, can_ids: typing.Iterable[int] = ()) -> None:
+        """
+        功能说明：注销一个接收回调，参数需与注册时一致
+        参数说明：
+            :param sink: 接收回调
+            :param can_ids: 注册时的报文id
+        异常说明：无
+        返回值：None
+        """
+        can_ids = set(can_ids)
+        with self.__lock:
+            if not can_ids:
+                self.__catch_all_sinks = self.__without(self.__catch_all_sinks, sink)
+            for can_id in can_ids:
+                sinks = self.__without(self.__id_sinks.get(can_id, tuple()), sink)
+                if sinks:
+                    self.__id_sinks[can_id] = sinks
+                else:
+                    self.__id_sinks.pop(can_id, None)
+
+    def subscribe(self, *can_ids: int) -> FrameSubscription:
+        """
+        功能说明：订阅一个或多个报文id，返回带缓存的订阅对象，用完后需调用stop或者使用with语句
+        参数说明：
+            :param can_ids: 订阅的报文id，不传入则订阅全部报文
+        异常说明：无
+        返回值：FrameSubscription对象
+        """
+        return FrameSubscription(self, can_ids)
+
+    @property
+    def subscribed_ids(self) -> typing.Set[int]:
+        return set(self.__id_sinks)
+
+    def on_message_received(self, msg: RawMessage) -> None:
+        # 所有接收回调共用Notifier的接收线程，一个回调出错不能影响其他回调和后续报文
+        sinks = self.__id_sinks.get(msg.arbitration_id)
+        if sinks:
+            for sink in sinks:
+                try:
+                    sink(msg)
+                except Exception as ex:
+                    logger.exception(f"Frame sink {sink} failed on message:{msg}, because {ex}")
+        for sink in self.__catch_all_sinks:
+            try:
+                sink(msg)
+            except Exception as ex:
+                logger.exception(f"Frame sink {sink} failed on message:{msg}, because {ex}")
+
+    @staticmethod
+    def __without(sinks: typing.Tuple[FrameSink, ...], sink: FrameSink) -> typing.Tuple[FrameSink, ...]:
+        sinks = list(sinks)
+        if sink in sinks:
+            sinks.remove(sink)
+        return tuple(sinks)
@@ -0,0 +1,255 @@
+import time
+import logging
+import typing
+import threading
+from can import Message as RawMessage
+from geelytest_can.cantools import Database
+from geelytest_can.cantools import Message
+from geelytest_can.cantools.database.signal import NamedSignalValue
+from geelytest_can.canapp.dispatcher import FrameDispatcher
+
+
+logger = logging.getLogger(__name__)
+
+SignalPredicate = typing.Callable[[typing.Any], bool]
+# expect_all/expect_any支持的写法：报文id、Expectation对象或者{sgn_name: value/(minimum, maximum)}
+ExpectationLike = typing.Union[int, str, "Expectation", dict]
+
+
+class Expectation(object):
+    """
+    对总线的一个期望：报文出现、信号等于某值、信号在某范围内或者信号满足自定义条件
+    """
+
+    def __init__(self, can_id: typing.Union[int, str] = None, signal: str = None, value: typing.Any = None,
+                 minimum: typing.Union[int, float] = None, maximum: typing.Union[int, float] = None,
+                 predicate: SignalPredicate = None) -> None:
+        """
+        功能说明：初始化对象，只传入can_id表示期望报文出现，传入signal时其余参数都为None表示期望收到该信号
+        参数说明：
+            :param can_id: 报文id，传入signal时可以不传
+            :param signal: 信号名
+            :param value: 期望的信号值，带枚举值的信号可以是数值或枚举名
+            :param minimum: 信号值下限(包含)，None表示不限制
+            :param maximum: 信号值上限(包含)，None表示不限制
+            :param predicate: 信号值满足时返回True
+        异常说明：
+            :exception ValueError: can_id和signal都为None
+        返回值：None
+        """
+        if can_id is None and signal is None:
+            raise ValueError("Expectation needs a can id or a signal name.")
+        self.can_id = int(can_id, 16) if isinstance(can_id, str) else can_id
+        self.signal = signal
+        self.value = value
+        self.minimum = minimum
+        self.maximum = maximum
+        self.predicate = predicate
+
+    @classmethod
+    def frame(cls, can_id: typing.Union[int, str]) -> "Expectation":
+        return cls(can_id=can_id)
+
+    @classmethod
+    def equals(cls, signal: str, value: typing.Any) -> "Expectation":
+        return cls(signal=signal, value=value)
+
+    @classmethod
+    def in_range(cls, signal: str, minimum: typing.Union[int, float] = None,
+                 maximum: typing.Union[int, float] = None) -> "Expectation":
+        return cls(signal=signal, minimum=minimum, maximum=maximum)
+
+    def match(self, value: typing.Any) -> bool:
+        """
+        功能说明：判断解析后的信号值是否满足期望
+        参数说明：
+            :param value: 解析后的信号值，带枚举值的信号为NamedSignalValue
+        异常说明：无
+        返回值：满足返回True
+        """
+        if isinstance(value, NamedSignalValue):
+            if isinstance(self.value, str):
+                return value.name == self.value
+            value = value.value
+        if self.value is not None and value != self.value:
+            return False
+        if self.minimum is not None and value < self.minimum:
+            return False
+        if self.maximum is not None and value > self.maximum:
+            return False
+        return self.predicate is None or bool(self.predicate(value))
+
+    def __repr__(self) -> str:
+        if self.signal is None:
+            return f"Expectation(can_id={hex(self.can_id)})"
+        if self.value is not None:
+            condition = f" == {self.value!r}"
+        elif self.minimum is not None or self.maximum is not None:
+            condition = f" in [{self.minimum}, {self.maximum}]"
+        elif self.predicate is not None:
+            condition = " matches predicate"
+        else:
+            condition = " received"
+        return f"Expectation({self.signal}{condition})"
+
+    @classmethod
+    def parse(cls, expectations: typing.Iterable[ExpectationLike]) -> typing.List["Expectation"]:
+        """
+        功能说明：把expect_all/expect_any的参数转换成Expectation列表
+        参数说明：
+            :param expectations: 报文id(int或16进制字符串)、Expectation对象或者信号字典，
+                                 信号字典的值为元组(minimum, maximum)时表示范围，否则表示等于该值
+        异常说明：
+            :exception TypeError: 不支持的写法
+        返回值：Expectation列表
+        """
+        parsed = list()
+        for expectation in expectations:
+            if isinstance(expectation, Expectation):
+                parsed.append(expectation)
+            elif isinstance(expectation, (int, str)):
+                parsed.append(cls.frame(expectation))
+            elif isinstance(expectation, dict):
+                for name, value in expectation.items():
+                    if isinstance(value, tuple):
+                        parsed.append(cls.in_range(name, *value))
+                    else:
+                        parsed.append(cls.equals(name, value))
+            else:
+                raise TypeError(f"Unsupported expectation: {expectation!r}")
+        return parsed
+
+
+class ExpectationResult(typing.NamedTuple):
+    expectation: Expectation
+    satisfied: bool
+    # 第一次满足期望的报文时间戳和信号值(报文期望为报文本身)，没有满足时为None
+    timestamp: typing.Optional[float]
+    value: typing.Any
+
+
+class ExpectationReport(typing.NamedTuple):
+    satisfied: bool
+    results: typing.List[ExpectationResult]
+    elapsed: float
+
+    @property
+    def missing(self) -> typing.List[Expectation]:
+        return [result.expectation for result in self.results if not result.satisfied]
+
+
+class ExpectationSet(object):
+    """
+    一组期望共用一个接收回调，每帧只检查该报文id上尚未满足的期望，并且只解析这些期望用到的信号
+    """
+
+    def __init__(self, db: Database, dispatcher: FrameDispatcher, expectations: typing.Iterable[ExpectationLike],
+                 any_of: bool = False) -> None:
+        """
+        功能说明：初始化对象
+        参数说明：
+            :param db: 用于查找信号所在报文和解析报文的数据库
+            :param dispatcher: 总线的帧分发器
+            :param expectations: 期望列表，写法见Expectation.parse
+            :param any_of: True表示任意一个期望满足即完成，False表示全部期望满足才完成
+        异常说明：
+            :exception KeyError: 数据库中没有该信号或者信号不在指定的报文中
+            :exception TypeError: 不支持的写法
+        返回值：None
+        """
+        self.expectations = Expectation.parse(expectations)
+        self.any_of = any_of
+        self.__dispatcher = dispatcher
+        self.__condition = threading.Condition()
+        self.__messages: typing.Dict[int, Message] = dict()
+        self.__pending: typing.Dict[int, typing.List[int]] = dict()
+        self.__results: typing.List[typing.Optional[typing.Tuple[float, typing.Any]]] = [None] * len(
+            self.expectations)
+        self.__remaining = min(1, len(self.expectations)) if any_of else len(self.expectations)
+        for index, expectation in enumerate(self.expectations):
+            can_id = expectation.can_id
+            if expectation.signal is not None:
+                message = db.get_message_by_signal(expectation.signal) if can_id is None else \
+                    db.get_message_by_frame_id(can_id)
+                message.get_signal_by_name(expectation.signal)
+                can_id = message.frame_id
+                self.__messages[can_id] = message
+            self.__pending.setdefault(can_id, list()).append(index)
+        self.__frame_ids = frozenset(self.__pending)
+
+    @property
+    def done(self) -> bool:
+        return self.__remaining <= 0
+
+    def on_message_received(self, msg: RawMessage) -> None:
+        # 在Notifier的接收线程中执行
+        indexes = self.__pending.get(msg.arbitration_id)
+        if not indexes or self.done:
+            return
+        decoded = dict()
+        names = [self.expectations[index].signal for index in indexes if self.expectations[index].signal]
+        if names:
+            message = self.__messages[msg.arbitration_id]
+            try:
+                decoded = message.decode(msg.data, signals=names)
+            except Exception as ex:
+                logger.error(f"Unable to parse message:{msg}, because {ex}")
+                return
+        satisfied = list()
+        for index in indexes:
+            expectation = self.expectations[index]
+            if expectation.signal is None:
+                satisfied.append((index, msg))
+                continue
+            # 多路复用报文的复用值不同时，该帧不包含这个信号
+            if expectation.signal not in decoded:
+                continue
+            value = decoded[expectation.signal]
+            try:
+                matched = expectation.match(value)
+            except Exception as ex:
+                logger.error(f"{expectation} failed on message:{msg}, because {ex}")
+                continue
+            if matched:
+                satisfied.append((index, value.value if isinstance(value, NamedSignalValue) else value))
+        if not satisfied:
+            return
+        with self.__condition:
+            for index, value in satisfied:
+                indexes.remove(index)
+                self.__results[index] = (msg.timestamp, value)
+                self.__remaining -= 1
+                logger.debug(f"{self.expectations[index]} satisfied at {msg.timestamp}")
+            if self.done:
+                self.__condition.notify_all()
+
+    def wait(self, timeout: float = None) -> ExpectationReport:
+        """
+        功能说明：注册接收回调并等待期望满足，满足或超时后注销
+        参数说明：
+            :param timeout: 超时时间，单位为s，None表示一直等待
+        异常说明：无
+        返回值：ExpectationReport对象
+        """
+        start_time = time.monotonic()
+        deadline = start_time + timeout if timeout is not None else None
+        self.__dispatcher.add_sink(self.on_message_received, self.__frame_ids)
+        try:
+            with self.__condition:
+                while not self.done:
+                    if deadline is None:
+                        self.__condition.wait()
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__condition.wait(remaining)
+        finally:
+            self.__dispatcher.remove_sink(self.on_message_received, self.__frame_ids)
+        return self.report(time.monotonic() - start_time)
+
+    def report(self, elapsed: float = 0.0) -> ExpectationReport:
+        with self.__condition:
+            results = [ExpectationResult(expectation, result is not None, *(result or (None, None)))
+                       for expectation, result in zip(self.expectations, self.__results)]
+            return ExpectationReport(self.done, results, elapsed)
@@ -0,0 +1,294 @@
+import sys
+import json
+import mmap
+import array
+import typing
+import logging
+import pathlib
+from can import LogReader
+from geelytest_can.cantools import load_file
+from geelytest_can.cantools.database import Message
+from geelytest_can.cantools.database import Signal
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+logger = logging.getLogger(__name__)
+
+SERIES_INDEX = "index.json"
+SERIES_VERSION = 1
+# 缓冲的数据点总数超过该值后追加写入文件，用于限制内存占用
+FLUSH_ITEMS = 1 << 20
+
+
+def series_typecode(signal: Signal) -> str:
+    """
+    功能说明：确定信号物理值的存储类型，整数的scale和offset保留整数值，避免64位信号丢失精度
+    参数说明：
+        :param signal: 信号对象
+    异常说明：无
+    返回值：array模块的类型码，"q"、"Q"或"d"
+    """
+    if signal.is_float or not isinstance(signal.scale, int) or not isinstance(signal.offset, int):
+        return "d"
+    if signal.is_signed:
+        raw_values = (-(1 << (signal.length - 1)), (1 << (signal.length - 1)) - 1)
+    else:
+        raw_values = (0, (1 << signal.length) - 1)
+    low, high = sorted(signal.scale * value + signal.offset for value in raw_values)
+    if -(1 << 63) <= low and high < (1 << 63):
+        return "q"
+    if low >= 0 and high < (1 << 64):
+        return "Q"
+    return "d"
+
+
+class SignalSeriesWriter(object):
+    """
+    将log按信号导出为列式存储的时间序列，每个信号一列时间戳和一列物理值
+    输出为一个目录，index.json描述每个信号的文件、类型、单位和枚举值，
+    数据文件为本机字节序的原始数组，可以直接内存映射
+    非multiplex报文的所有信号共用一列时间戳
+    """
+
+    def __init__(self, dest_dir: typing.Union[pathlib.Path, str]) -> None:
+        self.dest_dir = pathlib.Path(dest_dir)
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        self.columns: typing.Dict[str, array.array] = dict()
+        self.series: typing.Dict[str, dict] = dict()
+        self.buffered = 0
+
+    def __column(self, typecode: str) -> typing.Tuple[str, array.array]:
+        file_name = f"{len(self.columns)}.bin"
+        self.columns[file_name] = array.array(typecode)
+        (self.dest_dir / file_name).write_bytes(b"")
+        return file_name, self.columns[file_name]
+
+    def add_message(self, message: Message, signal_names: typing.Optional[typing.Iterable[str]] = None
+                    ) -> typing.List[typing.Tuple[str, array.array, array.array]]:
+        """
+        功能说明：为报文的信号创建数据列
+        参数说明：
+            :param message: 报文对象
+            :param signal_names: 需要导出的信号名，None表示全部信号
+        异常说明：无
+        返回值：[(信号名, 时间戳列, 值列)]，同一个报文的非multiplex信号的时间戳列是同一个对象
+        """
+        columns = list()
+        timestamps = None
+        for signal in message.signals:
+            if signal_names is not None and signal.name not in signal_names:
+                continue
+            if signal.multiplexer_ids is None:
+                if timestamps is None:
+                    timestamps = self.__column("d")
+                signal_timestamps = timestamps
+            else:
+                signal_timestamps = self.__column("d")
+            values = self.__column(series_typecode(signal))
+            self.series[f"{message.name}.{signal.name}"] = {
+                "message": message.name,
+                "signal": signal.name,
+                "frame_id": message.frame_id,
+                "timestamps": signal_timestamps[0],
+                "values": values[0],
+                "typecode": values[1].typecode,
+                "unit": signal.unit,
+                "choices": {str(value): str(name) for value, name in (signal.choices or {}).items()},
+            }
+            columns.append((signal.name, signal_timestamps[1], values[1]))
+        return columns
+
+    def flush(self) -> None:
+        """
+        功能说明：将缓冲的数据追加写入文件并清空缓冲
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        for file_name, column in self.columns.items():
+            if column:
+                with open(self.dest_dir / file_name, "ab") as file:
+                    column.tofile(file)
+                del column[:]
+        self.buffered = 0
+
+    def close(self, **metadata: typing.Any) -> None:
+        """
+        功能说明：写入剩余数据和索引文件
+        参数说明：
+            :param metadata: 额外写入索引文件的信息
+        异常说明：无
+        返回值：None
+        """
+        self.flush()
+        for series in self.series.values():
+            series["count"] = (self.dest_dir / series["values"]).stat().st_size // \
+                              array.array(series["typecode"]).itemsize
+        index = {"version": SERIES_VERSION, "byteorder": sys.byteorder, **metadata, "series": self.series}
+        with open(self.dest_dir / SERIES_INDEX, mode="w", encoding="utf-8") as file:
+            json.dump(index, file, indent=4, ensure_ascii=False)
+
+
+def export_signal_series(log_file, db_path, dest_dir,
+                         signal_names: typing.Optional[typing.Iterable[str]] = None) -> int:
+    """
+    功能说明：逐帧解析log并按信号导出列式时间序列，缓冲的数据点达到FLUSH_ITEMS后追加写入，内存占用有上限
+    参数说明：
+        :param log_file: log文件，文件格式为*.blf, *.asc等格式
+        :param db_path: dbc文件路径
+        :param dest_dir: 输出目录
+        :param signal_names: 需要导出的信号名，None表示全部信号
+    异常说明：无
+    返回值：导出的帧数
+    """
+    db = load_file(db_path)
+    db.enable_compiled_codecs()
+    signal_names = None if signal_names is None else set(signal_names)
+    writer = SignalSeriesWriter(dest_dir)
+    plans: typing.Dict[int, typing.Optional[tuple]] = dict()
+    frames = 0
+    with LogReader(log_file) as reader:
+        for m in reader:
+            if m.is_error_frame:
+                continue
+            plan = plans.get(m.arbitration_id, ())
+            if plan == ():
+                plan = None
+                try:
+                    message = db.get_message_by_frame_id(m.arbitration_id)
+                except KeyError:
+                    message = None
+                if message is not None and not message.is_container:
+                    columns = writer.add_message(message, signal_names)
+                    if columns:
+                        names = [name for name, _, _ in columns]
+                        shared_names = {signal.name for signal in message.signals if signal.multiplexer_ids is None}
+                        plan = (message, names, columns, message.is_multiplexed(), shared_names)
+                plans[m.arbitration_id] = plan
+            if plan is None:
+                continue
+            message, names, columns, multiplexed, shared_names = plan
+            try:
+                decoded = message.decode(m.data, decode_choices=False, signals=names)
+            except Exception as ex:
+                logger.debug(f"Unable to decode message:{m}: {ex}")
+                continue
+            if multiplexed:
+                shared_timestamps = None
+                for name, timestamps, values in columns:
+                    if name in decoded:
+                        # 非multiplex信号共用的时间戳列每帧只追加一次
+                        if timestamps is not shared_timestamps:
+                            timestamps.append(m.timestamp)
+                        if name in shared_names:
+                            shared_timestamps = timestamps
+                        values.append(decoded[name])
+            else:
+                columns[0][1].append(m.timestamp)
+                for name, _, values in columns:
+                    values.append(decoded[name])
+            frames += 1
+            writer.buffered += len(columns)
+            if writer.buffered >= FLUSH_ITEMS:
+                writer.flush()
+    writer.close(log_file=str(log_file), db_path=str(db_path), frames=frames)
+    return frames
+
+
+class SignalSeries(typing.NamedTuple):
+    """
+    一个信号的时间序列，timestamps和values为只读的内存映射数组
+    """
+    name: str
+    timestamps: typing.Any
+    values: typing.Any
+    unit: typing.Optional[str]
+    choices: typing.Dict[int, str]
+
+
+class SignalSeriesStore(object):
+    """
+    读取export_signal_series导出的目录，数据文件按需内存映射，
+    安装了numpy时返回numpy数组，否则返回memoryview
+    """
+
+    def __init__(self, path: typing.Union[pathlib.Path, str]) -> None:
+        self.path = pathlib.Path(path)
+        with open(self.path / SERIES_INDEX, encoding="utf-8") as file:
+            self.index = json.load(file)
+        if self.index.get("version") != SERIES_VERSION:
+            raise ValueError(f"Unsupported signal series version: {self.index.get('version')}")
+        self.series: typing.Dict[str, dict] = self.index["series"]
+        self.__aliases: typing.Dict[str, typing.Optional[str]] = dict()
+        for key, series in self.series.items():
+            # 信号名在所有报文中唯一时可以直接用信号名访问
+            self.__aliases[series["signal"]] = None if series["signal"] in self.__aliases else key
+        self.__maps: typing.Dict[str, typing.Any] = dict()
+
+    @property
+    def names(self) -> typing.List[str]:
+        return list(self.series)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.series or self.__aliases.get(name) is not None
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.series)
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def __map(self, file_name: str, typecode: str) -> typing.Any:
+        column = self.__maps.get(file_name)
+        if column is None:
+            path = self.path / file_name
+            if numpy is not None:
+                dtype = numpy.dtype(typecode).newbyteorder("<" if self.index["byteorder"] == "little" else ">")
+                if path.stat().st_size:
+                    column = numpy.memmap(path, dtype=dtype, mode="r")
+                else:
+                    column = numpy.empty(0, dtype=dtype)
+            else:
+                if self.index["byteorder"] != sys.byteorder:
+                    raise ValueError(f"Loading {self.index['byteorder']} endian series requires numpy.")
+                if path.stat().st_size:
+                    with open(path, "rb") as file:
+                        column = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+                else:
+                    column = memoryview(b"").cast(typecode)
+            self.__maps[file_name] = column
+        return column
+
+    def __getitem__(self, name: str) -> SignalSeries:
+        """
+        功能说明：获取一个信号的时间序列
+        参数说明：
+            :param name: "报文名.信号名"，或者在所有报文中唯一的信号名
+        异常说明：
+            :exception KeyError: 信号不存在
+        返回值：SignalSeries
+        """
+        key = name if name in self.series else self.__aliases.get(name)
+        if key is None:
+            raise KeyError(name)
+        series = self.series[key]
+        return SignalSeries(key,
+                            self.__map(series["timestamps"], "d"),
+                            self.__map(series["values"], series["typecode"]),
+                            series["unit"],
+                            {int(value): choice for value, choice in series["choices"].items()})
+
+
+def load_signal_series(path: typing.Union[pathlib.Path, str]) -> SignalSeriesStore:
+    """
+    功能说明：加载export_signal_series导出的列式时间序列
+    参数说明：
+        :param path: 导出目录
+    异常说明：
+        :exception ValueError: 不支持的格式版本
+    返回值：SignalSeriesStore
+    """
+    return SignalSeriesStore(path)
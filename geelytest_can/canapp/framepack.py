@@ -0,0 +1,41 @@
+import typing
+from can import Message as RawMessage
+
+# 报文帧类型的标志位，共享内存环形缓冲区、broker的数据包和接收缓存中使用
+FLAG_EXTENDED = 0x01
+FLAG_REMOTE = 0x02
+FLAG_ERROR = 0x04
+FLAG_FD = 0x08
+FLAG_BRS = 0x10
+FLAG_ESI = 0x20
+FLAG_RX = 0x40
+
+
+def pack_flags(msg: RawMessage) -> int:
+    """
+    功能说明：把报文的帧类型属性打包为标志位
+    参数说明：
+        :param msg: 报文
+    异常说明：无
+    返回值：标志位
+    """
+    return (msg.is_extended_id and FLAG_EXTENDED) | (msg.is_remote_frame and FLAG_REMOTE) | \
+        (msg.is_error_frame and FLAG_ERROR) | (msg.is_fd and FLAG_FD) | (msg.bitrate_switch and FLAG_BRS) | \
+        (msg.error_state_indicator and FLAG_ESI) | (msg.is_rx and FLAG_RX)
+
+
+def unpack_flags(flags: int) -> typing.Dict[str, bool]:
+    """
+    功能说明：把标志位解包为构造报文的参数
+    参数说明：
+        :param flags: pack_flags打包的标志位
+    异常说明：无
+    返回值：{参数名: 值}
+    """
+    return {"is_extended_id": bool(flags & FLAG_EXTENDED),
+            "is_remote_frame": bool(flags & FLAG_REMOTE),
+            "is_error_frame": bool(flags & FLAG_ERROR),
+            "is_fd": bool(flags & FLAG_FD),
+            "bitrate_switch": bool(flags & FLAG_BRS),
+            "error_state_indicator": bool(flags & FLAG_ESI),
+            "is_rx": bool(flags & FLAG_RX)}
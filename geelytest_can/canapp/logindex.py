@@ -0,0 +1,334 @@
+import io
+import json
+import typing
+import logging
+import pathlib
+from can import LogReader
+from can import Message as RawMessage
+from can.io.asc import ASCReader
+from can.io.blf import BLFReader
+from .logparse import LogChunk
+from .logparse import PRIME_CONTAINERS
+from .logparse import blf_container_offsets
+from .logparse import blf_split_supported
+from .logparse import read_blf_chunk
+from .logparse import read_blf_container
+
+
+logger = logging.getLogger(__name__)
+
+LOG_INDEX_SUFFIX = ".idx"
+LOG_INDEX_VERSION = 1
+# asc文件两个检查点之间的最小字节数
+ASC_CHECKPOINT_BYTES = 1 << 18
+
+
+def _is_asc_event(line: str) -> bool:
+    # 触发块或以时间戳开头的事件行，用于确定文件头的结束位置
+    words = line.split(None, 1)
+    if not words:
+        return False
+    if words[0].lower() == "begin":
+        return True
+    try:
+        float(words[0])
+    except ValueError:
+        return False
+    return True
+
+
+class _AscLines(io.TextIOBase):
+    """
+    从asc文件的指定位置逐行读取，先返回prefix中的行(文件头和触发块)，
+    记录最近返回的行的偏移量，供ASCReader从文件中间开始读取
+    """
+
+    def __init__(self, log_file: typing.Union[pathlib.Path, str], prefix: typing.Sequence[str] = (),
+                 start: int = 0, stop: typing.Optional[int] = None) -> None:
+        super().__init__()
+        self.__file = open(log_file, "rb")
+        self.__file.seek(start)
+        self.__prefix = list(reversed(prefix))
+        self.__next_offset = start
+        self.__stop = stop
+        self.offset = start
+        self.trigger: typing.Optional[str] = None
+        self.header_end: typing.Optional[int] = None
+
+    def readable(self) -> bool:
+        return True
+
+    def readline(self, size: int = -1) -> str:
+        if self.__prefix:
+            return self.__prefix.pop()
+        if self.__stop is not None and self.__next_offset >= self.__stop:
+            return ""
+        data = self.__file.readline()
+        line = data.decode("utf-8", "replace")
+        self.offset = self.__next_offset
+        self.__next_offset += len(data)
+        if self.header_end is None and _is_asc_event(line):
+            self.header_end = self.offset
+        elif line[:5].lower() == "begin":
+            # 文件头之后的第一行由ASCReader读取文件头时跳过，不作为触发块
+            self.trigger = line
+        return line
+
+    def close(self) -> None:
+        self.__file.close()
+        super().close()
+
+
+class FrameIdStatistics(typing.NamedTuple):
+    """
+    一个帧id在log中的帧数、第一帧和最后一帧的时间戳
+    """
+    count: int
+    first: float
+    last: float
+
+
+class LogIndex(object):
+    """
+    log文件的索引，保存在log文件旁边的*.idx文件中
+    检查点记录[偏移量, 最小时间戳, 最大时间戳, 帧数]，blf文件每个容器对象一个检查点，
+    asc文件每ASC_CHECKPOINT_BYTES字节一个检查点，按时间窗口读取时只解析与窗口重叠的检查点
+    """
+
+    def __init__(self, log_file: typing.Union[pathlib.Path, str], index: dict) -> None:
+        self.log_file = pathlib.Path(log_file)
+        self.index = index
+
+    @property
+    def path(self) -> pathlib.Path:
+        return log_index_path(self.log_file)
+
+    @property
+    def checkpoints(self) -> typing.List[list]:
+        return self.index["checkpoints"]
+
+    @property
+    def frame_ids(self) -> typing.Dict[int, FrameIdStatistics]:
+        return {int(frame_id, 16): FrameIdStatistics(*value) for frame_id, value in self.index["frame_ids"].items()}
+
+    @property
+    def start_time(self) -> typing.Optional[float]:
+        return min((first for first in (cp[1] for cp in self.checkpoints) if first is not None), default=None)
+
+    @property
+    def stop_time(self) -> typing.Optional[float]:
+        return max((last for last in (cp[2] for cp in self.checkpoints) if last is not None), default=None)
+
+    def is_valid(self) -> bool:
+        """
+        功能说明：检查索引是否与log文件一致，log文件被修改后需要重新建立索引
+        参数说明：无
+        异常说明：无
+        返回值：True表示有效
+        """
+        try:
+            stat = self.log_file.stat()
+        except OSError:
+            return False
+        return (self.index.get("version") == LOG_INDEX_VERSION and self.index.get("size") == stat.st_size
+                and self.index.get("mtime_ns") == stat.st_mtime_ns)
+
+    def save(self) -> None:
+        with open(self.path, mode="w", encoding="utf-8") as file:
+            json.dump(self.index, file)
+
+    def read_window(self, start: typing.Optional[float] = None, stop: typing.Optional[float] = None,
+                    frame_ids: typing.Optional[typing.Iterable[int]] = None) -> typing.Iterator[RawMessage]:
+        """
+        功能说明：读取时间窗口内的报文，只解析与窗口重叠的检查点，耗时与窗口大小成正比
+        参数说明：
+            :param start: 窗口起始时间戳(包含)，None表示从头开始
+            :param stop: 窗口结束时间戳(包含)，None表示到文件结束
+            :param frame_ids: 需要读取的帧id，None表示全部帧
+        异常说明：无
+        返回值：按文件中的顺序返回的报文
+        """
+        start = float("-inf") if start is None else start
+        stop = float("inf") if stop is None else stop
+        if frame_ids is not None:
+            # 根据帧id的第一帧和最后一帧进一步缩小窗口
+            frame_ids = set(frame_ids)
+            statistics = [value for frame_id, value in self.frame_ids.items() if frame_id in frame_ids]
+            if not statistics:
+                return
+            start = max(start, min(value.first for value in statistics))
+            stop = min(stop, max(value.last for value in statistics))
+        if start > stop:
+            return
+        for first, last in self.__runs(start, stop):
+            for m in self.__read_run(first, last):
+                if start <= m.timestamp <= stop and (frame_ids is None or m.arbitration_id in frame_ids):
+                    yield m
+
+    def __runs(self, start: float, stop: float) -> typing.Iterator[typing.Tuple[int, int]]:
+        # 与窗口重叠的连续检查点区间，时间戳不单调时可能有多个区间
+        run = None
+        for i, (_, first, last, _) in enumerate(self.checkpoints):
+            if first is not None and first <= stop and last >= start:
+                if run is not None and run[1] == i - 1:
+                    run[1] = i
+                    continue
+                if run is not None:
+                    yield tuple(run)
+                run = [i, i]
+        if run is not None:
+            yield tuple(run)
+
+    def __read_run(self, first: int, last: int) -> typing.Iterator[RawMessage]:
+        offsets = [cp[0] for cp in self.checkpoints]
+        if self.index["format"] == "blf":
+            chunk = LogChunk(str(self.log_file), tuple(offsets[first:last + 1]),
+                             tuple(offsets[max(0, first - PRIME_CONTAINERS):first]))
+            yield from read_blf_chunk(chunk)
+            return
+        with open(self.log_file, "rb") as file:
+            header = file.read(self.index["header_end"]).decode("utf-8", "replace").splitlines(keepends=True)
+        trigger = self.index["triggers"][first]
+        prefix = header + ["\n"] + ([trigger] if trigger else [])
+        stop = offsets[last + 1] if last + 1 < len(offsets) else None
+        with ASCReader(_AscLines(self.log_file, prefix, offsets[first], stop)) as reader:
+            yield from reader
+
+
+def log_index_path(log_file: typing.Union[pathlib.Path, str]) -> pathlib.Path:
+    return pathlib.Path(f"{log_file}{LOG_INDEX_SUFFIX}")
+
+
+def _add_message(index: dict, checkpoint: list, m: RawMessage) -> None:
+    timestamp = m.timestamp
+    if checkpoint[3]:
+        checkpoint[1] = min(checkpoint[1], timestamp)
+        checkpoint[2] = max(checkpoint[2], timestamp)
+    else:
+        checkpoint[1] = checkpoint[2] = timestamp
+    checkpoint[3] += 1
+    statistics = index.get(m.arbitration_id)
+    if statistics is None:
+        index[m.arbitration_id] = [1, timestamp, timestamp]
+    else:
+        statistics[0] += 1
+        statistics[1] = min(statistics[1], timestamp)
+        statistics[2] = max(statistics[2], timestamp)
+
+
+def log_index_supported(log_file: typing.Union[pathlib.Path, str]) -> bool:
+    """
+    功能说明：判断log文件是否支持建立索引，blf文件还需要当前python-can提供分片解析用到的内部接口
+    参数说明：
+        :param log_file: log文件
+    异常说明：无
+    返回值：支持返回True
+    """
+    suffix = pathlib.Path(log_file).suffix.lower()
+    return suffix == ".asc" or (suffix == ".blf" and blf_split_supported())
+
+
+def build_log_index(log_file: typing.Union[pathlib.Path, str], save: bool = True) -> LogIndex:
+    """
+    功能说明：扫描一遍log文件建立索引，记录时间戳到文件偏移量的检查点和每个帧id的帧数、第一帧和最后一帧的时间戳
+    参数说明：
+        :param log_file: log文件，支持*.blf和*.asc格式
+        :param save: 是否保存为log文件旁边的*.idx文件
+    异常说明：
+        :exception ValueError: 不支持的log文件格式，或者当前python-can不支持按容器读取blf文件
+    返回值：LogIndex
+    """
+    log_file = pathlib.Path(log_file)
+    if not log_index_supported(log_file):
+        raise ValueError(f"Unsupported log file format for indexing with the installed python-can: {log_file}")
+    stat = log_file.stat()
+    suffix = log_file.suffix.lower()
+    checkpoints = list()
+    frame_ids: typing.Dict[int, list] = dict()
+    index = {"version": LOG_INDEX_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if suffix == ".blf":
+        index["format"] = "blf"
+        with BLFReader(log_file) as reader:
+            for offset in blf_container_offsets(log_file):
+                # 跨越容器的对象属于结束它的容器，与按容器分片读取的规则一致
+                checkpoint = [offset, None, None, 0]
+                for m in reader._parse_container(read_blf_container(reader.file, offset)):
+                    _add_message(frame_ids, checkpoint, m)
+                checkpoints.append(checkpoint)
+    elif suffix == ".asc":
+        index["format"] = "asc"
+        triggers = list()
+        lines = _AscLines(log_file)
+        with ASCReader(lines) as reader:
+            checkpoint = None
+            for m in reader:
+                if checkpoint is None or lines.offset - checkpoint[0] >= ASC_CHECKPOINT_BYTES:
+                    checkpoint = [lines.offset, None, None, 0]
+                    checkpoints.append(checkpoint)
+                    triggers.append(lines.trigger)
+                _add_message(frame_ids, checkpoint, m)
+        index["header_end"] = lines.header_end or 0
+        index["triggers"] = triggers
+    else:
+        raise ValueError(f"Unsupported log file format for indexing: {log_file}")
+    index["checkpoints"] = checkpoints
+    index["frame_ids"] = {hex(frame_id): value for frame_id, value in sorted(frame_ids.items())}
+    log_index = LogIndex(log_file, index)
+    if save:
+        try:
+            log_index.save()
+        except OSError as ex:
+            logger.warning(f"Unable to save log index {log_index.path}: {ex}")
+    return log_index
+
+
+def load_log_index(log_file: typing.Union[pathlib.Path, str], build: bool = True) -> typing.Optional[LogIndex]:
+    """
+    功能说明：加载log文件的索引，索引不存在或已失效时重新建立
+    参数说明：
+        :param log_file: log文件
+        :param build: 索引不存在或已失效时是否重新建立
+    异常说明：无
+    返回值：LogIndex，不支持建立索引的格式或build为False且索引无效时返回None
+    """
+    if not log_index_supported(log_file):
+        return None
+    path = log_index_path(log_file)
+    if path.exists():
+        try:
+            with open(path, encoding="utf-8") as file:
+                log_index = LogIndex(log_file, json.load(file))
+            if log_index.is_valid():
+                return log_index
+        except (OSError, ValueError) as ex:
+            logger.warning(f"Unable to load log index {path}: {ex}")
+    if not build:
+        return None
+    logger.info(f"Building log index {path}.")
+    return build_log_index(log_file)
+
+
+def read_log_window(log_file: typing.Union[pathlib.Path, str], start: typing.Optional[float] = None,
+                    stop: typing.Optional[float] = None, frame_ids: typing.Optional[typing.Iterable[int]] = None
+                    ) -> typing.Iterator[RawMessage]:
+    """
+    功能说明：读取log文件时间窗口内的报文，有索引时直接定位到窗口，不支持索引的格式顺序扫描整个文件
+    参数说明：
+        :param log_file: log文件
+        :param start: 窗口起始时间戳(包含)，None表示从头开始
+        :param stop: 窗口结束时间戳(包含)，None表示到文件结束
+        :param frame_ids: 需要读取的帧id，None表示全部帧
+    异常说明：无
+    返回值：报文迭代器
+    """
+    log_index = load_log_index(log_file)
+    if log_index is not None:
+        yield from log_index.read_window(start, stop, frame_ids)
+        return
+    frame_ids = None if frame_ids is None else set(frame_ids)
+    start = float("-inf") if start is None else start
+    stop = float("inf") if stop is None else stop
+    with LogReader(log_file) as reader:
+        for m in reader:
+            if start <= m.timestamp <= stop and (frame_ids is None or m.arbitration_id in frame_ids):
+                yield m
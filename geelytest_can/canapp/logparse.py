@@ -0,0 +1,383 @@
+import os
+import json
+import heapq
+import pickle
+import typing
+import logging
+import pathlib
+import zlib
+import tempfile
+import itertools
+import multiprocessing
+import bitstruct
+from operator import itemgetter
+from can import LogReader
+from can import Message as RawMessage
+from can.io.blf import BLFReader
+try:
+    from can.io.blf import FILE_HEADER_STRUCT
+    from can.io.blf import OBJ_HEADER_BASE_STRUCT
+    from can.io.blf import LOG_CONTAINER
+    from can.io.blf import LOG_CONTAINER_STRUCT
+    from can.io.blf import NO_COMPRESSION
+    from can.io.blf import ZLIB_DEFLATE
+except ImportError:
+    FILE_HEADER_STRUCT = None
+from geelytest_can.cantools import load_file
+from geelytest_can.cantools import Database
+from geelytest_can.cantools.database import NamedSignalValue
+
+
+logger = logging.getLogger(__name__)
+
+# 每个分片最多包含的blf容器数，python-can写入的容器解压后约128KB
+CHUNK_CONTAINERS = 64
+# 分片起始位置查找对象边界时，最多向前回溯的容器数
+PRIME_CONTAINERS = 4
+# 子进程每次写入临时文件的记录数
+SPOOL_BATCH = 10000
+
+
+def parse_message(m: RawMessage, db: Database, log_file=None, db_path=None) -> dict:
+    """
+    功能说明：解析一帧log数据
+    参数说明：
+        :param m: log中的一帧报文
+        :param db: 用于解析的数据库
+        :param log_file: log文件名，仅用于日志
+        :param db_path: dbc文件路径，仅用于日志
+    异常说明：无
+    返回值：解析结果，格式为{can_id: 报文字符串, message_name: {sgn_name: sgn_value}}
+    """
+    message_dict = dict()
+    try:
+        frame = db.get_message_by_frame_id(m.arbitration_id)
+        signal_dict = frame.decode(m.data)
+        for name, value in signal_dict.items():
+            if isinstance(value, NamedSignalValue):
+                signal_dict[name] = str(value)
+        message_dict[hex(m.arbitration_id)] = str(m)
+        message_dict[frame.name] = signal_dict
+    except Exception as ex:
+        message_dict[hex(m.arbitration_id)] = str(m)
+        if m.is_error_frame:
+            message_dict["Error Frame"] = f"{m.timestamp} | can error | Error Frame"
+        elif m.arbitration_id == 1:
+            logger.warning(f"Unable to parse message:{m}")
+        elif isinstance(ex, (KeyError, bitstruct.Error)):
+            logger.error(f"Unable to parse message:{m} \npossible mismatch between "
+                         f"type of can channel {m.channel} in the log: {log_file} and dbc: {db_path}")
+        else:
+            logger.exception(ex)
+    return message_dict
+
+
+class JsonRecordWriter(object):
+    """
+    流式写入json格式的解析结果，单条记录的格式与json.dumps(parsed_dict, indent=4, sort_keys=True)一致，不需要在内存中保存全部结果。
+    相邻的相同时间戳只保留最后一条记录，与原来按时间戳覆盖一致，因此时间戳不递减的log与原有输出完全相同；
+    记录按写入顺序排列不会重新排序，时间戳乱序时不相邻的相同时间戳会重复出现，
+    多通道等需要保留每一帧的场景请使用NdjsonRecordWriter
+    """
+
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, file: typing.Union[pathlib.Path, str]) -> None:
+        self.file = open(file, mode="w", encoding="utf-8", buffering=self.BUFFER_SIZE)
+        self.count = 0
+        self.__pending: typing.Optional[typing.Tuple[float, str]] = None
+
+    @staticmethod
+    def dumps(timestamp: float, record: dict) -> str:
+        # 去掉单条记录外层的"{\n"和"\n}"，保留与整体序列化相同的缩进
+        return json.dumps({timestamp: record}, indent=4, sort_keys=True, ensure_ascii=False)[2:-2]
+
+    def write_entry(self, timestamp: float, entry: str) -> None:
+        # 相同时间戳的下一条记录到达时覆盖当前记录，时间戳变化时才写入
+        if self.__pending is not None and self.__pending[0] != timestamp:
+            self.__flush()
+        self.__pending = (timestamp, entry)
+
+    def __flush(self) -> None:
+        self.file.write(("{\n" if not self.count else ",\n") + self.__pending[1])
+        self.count += 1
+        self.__pending = None
+
+    def write(self, timestamp: float, record: dict) -> None:
+        self.write_entry(timestamp, self.dumps(timestamp, record))
+
+    def close(self) -> None:
+        if self.__pending is not None:
+            self.__flush()
+        self.file.write("\n}" if self.count else "{}")
+        self.file.close()
+
+    def __enter__(self) -> "JsonRecordWriter":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+
+class NdjsonRecordWriter(JsonRecordWriter):
+    """
+    流式写入NDJSON格式的解析结果，每行一帧
+    """
+
+    @staticmethod
+    def dumps(timestamp: float, record: dict) -> str:
+        return json.dumps({"timestamp": timestamp, **record}, ensure_ascii=False)
+
+    def write_entry(self, timestamp: float, entry: str) -> None:
+        self.file.write(entry + "\n")
+        self.count += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+
+LOG_PARSE_FORMATS = {
+    "json": JsonRecordWriter,
+    "ndjson": NdjsonRecordWriter,
+}
+
+
+class LogChunk(typing.NamedTuple):
+    """
+    log文件的一个分片，containers为None时表示整个文件
+    """
+    log_file: str
+    containers: typing.Optional[typing.Tuple[int, ...]]
+    prime_containers: typing.Tuple[int, ...] = ()
+
+
+def blf_split_supported() -> bool:
+    """
+    功能说明：判断当前python-can是否提供blf分片解析需要的对象头定义和BLFReader._parse_container，
+              这些不是python-can的公开接口，升级后可能不存在
+    参数说明：无
+    异常说明：无
+    返回值：支持返回True
+    """
+    return FILE_HEADER_STRUCT is not None and callable(getattr(BLFReader, "_parse_container", None))
+
+
+def blf_container_offsets(log_file: typing.Union[pathlib.Path, str]) -> typing.List[int]:
+    """
+    功能说明：扫描blf文件顶层的容器对象，只读取对象头，不解压数据
+    参数说明：
+        :param log_file: blf文件路径
+    异常说明：
+        :exception ValueError: 不是blf文件或对象头损坏
+    返回值：每个容器对象在文件中的偏移量
+    """
+    offsets = list()
+    with open(log_file, "rb") as file:
+        header = FILE_HEADER_STRUCT.unpack(file.read(FILE_HEADER_STRUCT.size))
+        if header[0] != b"LOGG":
+            raise ValueError(f"{log_file} is not a blf file.")
+        offset = header[1]
+        file.seek(offset)
+        while True:
+            data = file.read(OBJ_HEADER_BASE_STRUCT.size)
+            if len(data) < OBJ_HEADER_BASE_STRUCT.size:
+                break
+            signature, _, _, obj_size, obj_type = OBJ_HEADER_BASE_STRUCT.unpack(data)
+            if signature != b"LOBJ":
+                raise ValueError(f"Unexpected object header at offset {offset} in {log_file}.")
+            if obj_type == LOG_CONTAINER:
+                offsets.append(offset)
+            offset += obj_size + obj_size % 4
+            file.seek(offset)
+    return offsets
+
+
+def split_log_file(log_file: typing.Union[pathlib.Path, str], jobs: int) -> typing.List[LogChunk]:
+    """
+    功能说明：将log文件切分为可以独立解析的分片，blf文件按容器对象切分，其他格式整个文件为一个分片
+    参数说明：
+        :param log_file: log文件路径
+        :param jobs: 并行解析的进程数，用于决定分片大小
+    异常说明：无
+    返回值：按文件中的顺序排列的分片列表
+    """
+    log_file = str(log_file)
+    if not log_file.lower().endswith(".blf"):
+        return [LogChunk(log_file, None)]
+    if not blf_split_supported():
+        logger.warning(f"The installed python-can does not provide the BLF internals used to split {log_file}, "
+                       f"parse it as a whole.")
+        return [LogChunk(log_file, None)]
+    try:
+        offsets = blf_container_offsets(log_file)
+    except (ValueError, OSError) as ex:
+        logger.warning(f"Unable to split {log_file}, parse it as a whole: {ex}")
+        return [LogChunk(log_file, None)]
+    size = max(1, min(CHUNK_CONTAINERS, -(-len(offsets) // jobs)))
+    return [LogChunk(log_file, tuple(offsets[i:i + size]), tuple(offsets[max(0, i - PRIME_CONTAINERS):i]))
+            for i in range(0, len(offsets), size)] or [LogChunk(log_file, None)]
+
+
+def read_blf_container(file: typing.BinaryIO, offset: int) -> bytes:
+    """
+    功能说明：读取并解压blf文件中的一个容器对象
+    参数说明：
+        :param file: 以二进制方式打开的blf文件
+        :param offset: blf_container_offsets返回的容器偏移量
+    异常说明：无
+    返回值：解压后的数据，不支持的压缩方式返回空数据
+    """
+    file.seek(offset)
+    obj_size = OBJ_HEADER_BASE_STRUCT.unpack(file.read(OBJ_HEADER_BASE_STRUCT.size))[3]
+    obj_data = file.read(obj_size - OBJ_HEADER_BASE_STRUCT.size)
+    method, _ = LOG_CONTAINER_STRUCT.unpack_from(obj_data)
+    container_data = obj_data[LOG_CONTAINER_STRUCT.size:]
+    if method == NO_COMPRESSION:
+        return container_data
+    if method == ZLIB_DEFLATE:
+        return zlib.decompressobj().decompress(container_data)
+    logger.warning(f"Unknown compression method ({method})")
+    return b""
+
+
+def _is_object_chain(data: bytes, pos: int) -> bool:
+    # 从pos开始按对象大小逐个跳转，必须能够一直跳到数据末尾
+    size = len(data)
+    while pos + OBJ_HEADER_BASE_STRUCT.size <= size:
+        signature, header_size, header_version, obj_size, _ = OBJ_HEADER_BASE_STRUCT.unpack_from(data, pos)
+        if signature != b"LOBJ" or header_version not in (1, 2) or obj_size < header_size:
+            return False
+        pos += obj_size
+        if pos >= size:
+            return True
+        next_pos = data.find(b"LOBJ", pos, pos + 8)
+        if next_pos < 0:
+            return pos + 8 > size
+        pos = next_pos
+    return True
+
+
+def _find_object_chain(data: bytes) -> int:
+    pos = data.find(b"LOBJ")
+    while pos >= 0 and not _is_object_chain(data, pos):
+        pos = data.find(b"LOBJ", pos + 1)
+    return pos
+
+
+def read_blf_chunk(chunk: LogChunk) -> typing.Iterator[RawMessage]:
+    """
+    功能说明：读取blf文件的一个分片
+              跨越容器的对象属于结束它的容器所在的分片，分片开始前通过前面的容器找到对象边界，
+              分片末尾未结束的对象由下一个分片读取，所有分片依次拼接的结果与顺序读取整个文件一致
+    参数说明：
+        :param chunk: split_log_file返回的blf分片
+    异常说明：无
+    返回值：分片中的报文
+    """
+    with BLFReader(chunk.log_file) as reader:
+        file = reader.file
+        if chunk.prime_containers:
+            data = b""
+            for offset in reversed(chunk.prime_containers):
+                data = read_blf_container(file, offset) + data
+                pos = _find_object_chain(data)
+                if pos >= 0:
+                    # 只为了得到跨越到本分片的对象的前半部分，解析结果属于上一个分片
+                    for _ in reader._parse_container(data[pos:]):
+                        pass
+                    break
+            else:
+                data = read_blf_container(file, chunk.containers[0])
+                pos = max(_find_object_chain(data), 0)
+                logger.warning(f"Unable to find object boundary before offset {chunk.containers[0]} "
+                               f"in {chunk.log_file}, skip {pos} bytes")
+                yield from reader._parse_container(data[pos:])
+                chunk = chunk._replace(containers=chunk.containers[1:])
+        for offset in chunk.containers:
+            yield from reader._parse_container(read_blf_container(file, offset))
+
+
+def read_log_chunk(chunk: LogChunk) -> typing.Iterator[RawMessage]:
+    """
+    功能说明：读取log文件的一个分片
+    参数说明：
+        :param chunk: split_log_file返回的分片
+    异常说明：无
+    返回值：分片中的报文
+    """
+    if chunk.containers is None:
+        with LogReader(chunk.log_file) as reader:
+            yield from reader
+    else:
+        yield from read_blf_chunk(chunk)
+
+
+_worker_db: typing.Optional[Database] = None
+_worker_db_path = None
+_worker_dumps = None
+_worker_spool_dir = None
+
+
+def _init_worker(db_path, output_format: str, spool_dir: str) -> None:
+    # 每个子进程只加载一次数据库
+    global _worker_db, _worker_db_path, _worker_dumps, _worker_spool_dir
+    _worker_db = load_file(db_path)
+    _worker_db.enable_compiled_codecs()
+    _worker_db_path = db_path
+    _worker_dumps = LOG_PARSE_FORMATS[output_format].dumps
+    _worker_spool_dir = spool_dir
+
+
+def _parse_chunk(chunk: LogChunk) -> str:
+    # 子进程解析一个分片，序列化后的记录分批写入临时文件，返回临时文件路径
+    fd, spool_file = tempfile.mkstemp(suffix=".spool", dir=_worker_spool_dir)
+    with open(fd, "wb") as file:
+        entries = list()
+        for m in read_log_chunk(chunk):
+            entries.append((m.timestamp, _worker_dumps(m.timestamp,
+                                                       parse_message(m, _worker_db, chunk.log_file, _worker_db_path))))
+            if len(entries) >= SPOOL_BATCH:
+                pickle.dump(entries, file, pickle.HIGHEST_PROTOCOL)
+                entries = list()
+        if entries:
+            pickle.dump(entries, file, pickle.HIGHEST_PROTOCOL)
+    return spool_file
+
+
+def _read_spool(spool_file: str) -> typing.Iterator[typing.Tuple[float, str]]:
+    with open(spool_file, "rb") as file:
+        while True:
+            try:
+                entries = pickle.load(file)
+            except EOFError:
+                break
+            yield from entries
+    os.remove(spool_file)
+
+
+def parse_logs_parallel(log_files: typing.Sequence[typing.Union[pathlib.Path, str]], db_path,
+                        writer: JsonRecordWriter, output_format: str, jobs: int) -> None:
+    """
+    功能说明：多进程解析log文件，每个子进程只加载一次数据库，
+              单个文件的分片按文件中的顺序拼接，多个文件之间按时间戳归并
+    参数说明：
+        :param log_files: log文件列表
+        :param db_path: dbc文件路径
+        :param writer: 解析结果的写入对象
+        :param output_format: 解析结果的格式，与writer对应
+        :param jobs: 进程数
+    异常说明：无
+    返回值：None
+    """
+    chunks = [split_log_file(log_file, jobs) for log_file in log_files]
+    logger.info(f"Parsing {len(log_files)} log files in {sum(map(len, chunks))} chunks with {jobs} processes.")
+    spool_dir = pathlib.Path(writer.file.name).resolve().parent
+    with tempfile.TemporaryDirectory(prefix="log_parse_", dir=spool_dir) as tmp_dir, \
+            multiprocessing.Pool(jobs, _init_worker, (db_path, output_format, tmp_dir)) as pool:
+        spool_files = pool.map(_parse_chunk, list(itertools.chain.from_iterable(chunks)), chunksize=1)
+        streams = list()
+        for file_chunks in chunks:
+            streams.append(itertools.chain.from_iterable(map(_read_spool, spool_files[:len(file_chunks)])))
+            spool_files = spool_files[len(file_chunks):]
+        for timestamp, entry in heapq.merge(*streams, key=itemgetter(0)):
+            writer.write_entry(timestamp, entry)
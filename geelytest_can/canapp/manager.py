@@ -1,19 +1,44 @@
+import os
 import sys
-import json
+import heapq
 import logging
+import threading
 import pathlib
 import typing
-import bitstruct
+from operator import attrgetter
 from can import BusABC
 from can import Logger
 from can import Notifier
 from can import Printer
 from can import LogReader
-from can import MessageSync
 from can import SizedRotatingLogger
-from can.util import channel2int
+from can import Message as RawMessage
 from geelytest_can.cantools import load_file
-from geelytest_can.cantools.database import NamedSignalValue
+from .logparse import parse_message
+from .logparse import parse_logs_parallel
+from .logparse import LOG_PARSE_FORMATS
+from .export import export_signal_series
+from .export import load_signal_series
+from .export import SignalSeriesStore
+from .recorder import BufferedRecorder
+from .recorder import RecorderStatistics
+from .trigger import TriggerCapture
+from .busstats import BusStatistics
+from .busstats import BusStatisticsReport
+from .replay import ReplayEngine
+from .replay import ReplayStatistics
+from .replay import DEFAULT_SKIP
+from .convert import convert_log
+from .convert import convert_logs
+from .convert import ConversionStatistics
+from .merge import SourcesType
+from .merge import merge_logs
+from .merge import write_merged_log
+from .logindex import LogIndex
+from .logindex import build_log_index
+from .logindex import load_log_index
+from .logindex import log_index_supported
+from .logindex import read_log_window
 
 
 logger = logging.getLogger(__name__)
@@ -37,20 +62,51 @@ class CanLogManager(object):
         self.notifier = Notifier(bus, [])
         self.logger_listener: SizedRotatingLogger = None
         self.printer_listener: Printer = None
+        self.index_logging = False
+        self.recorder: BufferedRecorder = None
+        self.capture_listener: TriggerCapture = None
+        self.replay_engine: ReplayEngine = None
+        self.statistics_listener: BusStatistics = None
 
-    def start_logging(self, file: typing.Union[pathlib.Path, str], max_bytes: int = 0) -> None:
+    def start_logging(self, file: typing.Union[pathlib.Path, str], max_bytes: int = 0, index: bool = False,
+                      buffer_size: int = 1 << 16) -> None:
         """
-        功能说明：开始录制数据
+        功能说明：开始录制数据，接收线程只把报文放入缓冲区，由独立的写线程写入文件和切分文件
         参数说明：
             :param file: 需要保存录制的数据的文件名, 文件格式为*.blf, *.asc, *.csv等格式
             :param max_bytes: 保存的一个文件的最大size，超过后会新建一个文件继续保存，
                               单位为byte，默认值0则表示无穷大，保存在一个文件中
+            :param index: 是否为录制的*.blf, *.asc文件建立索引，切分出的文件在后台线程中建立索引，
+                          最后一个文件在停止录制时建立索引
+            :param buffer_size: 缓冲区能保存的报文数，写入速度跟不上时缓冲区满后丢弃新收到的报文
         异常说明：无
         返回值：None
         """
         logger.info("Start logging data.")
         self.logger_listener = SizedRotatingLogger(file, max_bytes)
-        self.notifier.add_listener(self.logger_listener)
+        self.index_logging = index and log_index_supported(file)
+        if index and not self.index_logging:
+            logger.warning(f"Log index is not supported for {file} with the installed python-can, skip indexing.")
+        if self.index_logging:
+            self.logger_listener.rotator = self.__rotate_and_index
+        self.recorder = BufferedRecorder(self.logger_listener, buffer_size)
+        self.notifier.add_listener(self.recorder)
+
+    @staticmethod
+    def __rotate_and_index(source: str, dest: str) -> None:
+        if os.path.exists(source):
+            os.rename(source, dest)
+            threading.Thread(target=build_log_index, args=(dest,), name=f"log-index-{dest}", daemon=True).start()
+
+    @property
+    def recording_statistics(self) -> typing.Optional[RecorderStatistics]:
+        """
+        功能说明：获取录制统计，包括收到、写入和丢弃的帧数，缓冲区的最高水位和写入速率
+        参数说明：无
+        异常说明：无
+        返回值：RecorderStatistics，没有录制时返回None
+        """
+        return self.recorder.statistics if self.recorder else None
 
     def stop_logging(self) -> None:
         """
@@ -60,44 +116,151 @@ class CanLogManager(object):
         返回值：None
         """
         logger.info("Stop logging data.")
-        if self.logger_listener:
-            self.notifier.remove_listener(self.logger_listener)
-            self.logger_listener.stop()
+        if self.recorder:
+            self.notifier.remove_listener(self.recorder)
+            self.recorder.stop()
+            statistics = self.recorder.statistics
+            logger.info(f"Logging statistics, received: {statistics.received}, written: {statistics.written}, "
+                        f"dropped: {statistics.dropped}, high water mark: {statistics.high_water_mark}"
+                        f"/{statistics.capacity}, write rate: {statistics.write_rate:.0f} frames/s")
+            if self.index_logging:
+                build_log_index(self.logger_listener.base_filename)
         self.notifier.stop()
 
-    def replay_data(self, file: typing.Union[pathlib.Path, str]) -> None:
+    def start_capture(self,
+                      file: typing.Union[pathlib.Path, str],
+                      pre_time: typing.Optional[float] = 10.0,
+                      post_time: typing.Optional[float] = 5.0,
+                      pre_frames: typing.Optional[int] = None,
+                      post_frames: typing.Optional[int] = None,
+                      trigger_ids: typing.Optional[typing.Iterable[int]] = None
+                      ) -> TriggerCapture:
         """
-        功能说明：回放数据
+        功能说明：开始触发录制，内存中保留所有总线最近一段时间(或帧数)的报文，触发后把触发前后的报文写入文件
         参数说明：
-            :param file: 需要回访数据的文件名，文件格式为*.blf, *.asc, *.csv等格式
+            :param file: 录制文件名，文件格式为*.blf, *.asc等格式，每次触发生成一个加序号的文件
+            :param pre_time: 保留的触发前的时间，单位为s，None表示不按时间限制
+            :param post_time: 触发后继续收集的时间，单位为s，None表示不按时间限制
+            :param pre_frames: 保留的触发前的帧数，None表示不按帧数限制
+            :param post_frames: 触发后继续收集的帧数，None表示不按帧数限制
+            :param trigger_ids: 收到这些帧id时触发
         异常说明：
-            :KeyboardInterrupt: 键盘中断时继续回放
+            :exception ValueError: 触发前后的窗口都没有限制
+        返回值：TriggerCapture，可以通过add_signal_trigger添加信号条件触发
+        """
+        logger.info("Start capturing data.")
+        self.capture_listener = TriggerCapture(file, pre_time, post_time, pre_frames, post_frames, trigger_ids)
+        self.notifier.add_listener(self.capture_listener)
+        return self.capture_listener
+
+    def trigger_capture(self, reason: str = "manual") -> None:
+        """
+        功能说明：从测试代码中触发录制
+        参数说明：
+            :param reason: 触发原因
+        异常说明：无
         返回值：None
         """
-        reader = LogReader(file)
-        in_sync = MessageSync(reader)
+        if self.capture_listener:
+            self.capture_listener.trigger(reason)
+        else:
+            logger.warning("Capture is not started, ignore trigger.")
+
+    def stop_capture(self) -> None:
+        """
+        功能说明：停止触发录制，正在收集触发后报文的录制立即写入文件
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        logger.info("Stop capturing data.")
+        if self.capture_listener:
+            self.notifier.remove_listener(self.capture_listener)
+            self.capture_listener.stop()
+
+    def start_statistics(self, db_path: typing.Optional[str] = None, bitrate: int = 500000,
+                         data_bitrate: typing.Optional[int] = 2000000, tolerance: float = 0.1) -> BusStatistics:
+        """
+        功能说明：开始统计总线，包括每个帧id的频率、帧间隔和与dbc中周期的偏差，以及每个通道的总线负载
+        参数说明：
+            :param db_path: dbc文件路径，None表示不统计周期偏差
+            :param bitrate: 仲裁域波特率，单位为bit/s
+            :param data_bitrate: CAN FD数据域波特率，单位为bit/s
+            :param tolerance: 帧间隔与周期的偏差超过周期的该比例时计为一次超差
+        异常说明：
+            :exception ValueError: 波特率小于等于0
+        返回值：BusStatistics，统计过程中可以通过report获取统计结果
+        """
+        logger.info("Start bus statistics.")
+        db = load_file(db_path) if db_path else None
+        self.statistics_listener = BusStatistics(db, bitrate, data_bitrate, tolerance)
+        self.notifier.add_listener(self.statistics_listener)
+        return self.statistics_listener
+
+    def stop_statistics(self) -> typing.Optional[BusStatisticsReport]:
+        """
+        功能说明：停止统计总线
+        参数说明：无
+        异常说明：无
+        返回值：BusStatisticsReport，没有开始统计时返回None
+        """
+        logger.info("Stop bus statistics.")
+        if not self.statistics_listener:
+            return None
+        self.notifier.remove_listener(self.statistics_listener)
+        return self.statistics_listener.report()
+
+    def replay_data(self, file: typing.Union[pathlib.Path, str], speed: typing.Optional[float] = 1.0,
+                    skip: typing.Optional[float] = DEFAULT_SKIP) -> typing.Optional[ReplayStatistics]:
+        """
+        功能说明：回放数据，log中的通道通过预先计算的路由表对应到总线，按log中的时间间隔发送
+        参数说明：
+            :param file: 需要回访数据的文件名，文件格式为*.blf, *.asc, *.csv等格式
+            :param speed: 回放速度倍数，例如0.5为慢放一倍，2为快放一倍，None或0表示不等待，尽快发送
+            :param skip: 等待超过该时长(单位为s)的空闲时段缩短为该时长，默认60s与原有的MessageSync一致，None或0表示不跳过
+        异常说明：
+            :KeyboardInterrupt: 键盘中断时停止回放
+        返回值：ReplayStatistics，包括发送帧数和发送时刻的平均延迟、p99延迟，键盘中断时返回None
+        """
+        self.replay_engine = ReplayEngine(self.notifier.buses, speed, skip=skip)
         logger.info("Start replaying data.")
         try:
-            for message in in_sync:
-                if message.is_error_frame:
-                    continue
-                for bus in self.notifier.buses:
-                    if channel2int(bus.channel_info) == channel2int(message.channel):
-                        message.channel = bus.channel_info
-                        bus.send(message)
+            statistics = self.replay_engine.replay_file(file)
         except KeyboardInterrupt:
-            pass
+            return None
+        logger.info(f"Replay completion, sent: {statistics.sent}, skipped: {statistics.skipped}, "
+                    f"errors: {statistics.errors}, duration: {statistics.duration:.3f} s, "
+                    f"mean lateness: {statistics.mean_lateness * 1e6:.1f} us, "
+                    f"p99 lateness: {statistics.p99_lateness * 1e6:.1f} us")
+        return statistics
+
+    def stop_replaying(self) -> None:
+        """
+        功能说明：停止正在进行的回放
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        if self.replay_engine:
+            self.replay_engine.stop()
 
     @staticmethod
-    def read_log(file: typing.Union[pathlib.Path, str]) -> None:
+    def read_log(file: typing.Union[pathlib.Path, str], start: typing.Optional[float] = None,
+                 stop: typing.Optional[float] = None, frame_ids: typing.Optional[typing.Iterable[int]] = None) -> None:
         """
         功能说明：读文件数据
         参数说明：
             :param file: 需要读取数据的文件名，文件格式为*.blf, *.asc, *.csv等格式
+            :param start: 只读取该时间戳之后的数据，通过索引直接定位，None表示从头开始
+            :param stop: 只读取该时间戳之前的数据，None表示到文件结束
+            :param frame_ids: 只读取这些帧id的数据，None表示全部帧
         异常说明：无
         返回值：None
         """
-        reader = LogReader(file, encoding="utf-8")
+        if start is None and stop is None and frame_ids is None:
+            reader = LogReader(file, encoding="utf-8")
+        else:
+            reader = read_log_window(file, start, stop, frame_ids)
         logger.info("Start reading data.")
         for message in reader:
             if message.is_error_frame:
@@ -130,70 +293,215 @@ class CanLogManager(object):
         self.notifier.stop()
 
     @staticmethod
-    def log_convert(input_file, output_file, file_size) -> None:
+    def build_index(file: typing.Union[pathlib.Path, str]) -> LogIndex:
         """
-        功能说明：转换log文件格式
-        参数说明：无
+        功能说明：为log文件建立索引，保存为log文件旁边的*.idx文件，
+                  索引记录时间戳到文件偏移量的检查点和每个帧id的帧数、第一帧和最后一帧的时间戳
+        参数说明：
+            :param file: log文件，支持*.blf和*.asc格式
+        异常说明：
+            :exception ValueError: 不支持的log文件格式
+        返回值：LogIndex
+        """
+        logger.info("Start indexing log file.")
+        return build_log_index(file)
+
+    @staticmethod
+    def load_index(file: typing.Union[pathlib.Path, str]) -> typing.Optional[LogIndex]:
+        """
+        功能说明：加载log文件的索引，索引不存在或log文件已被修改时重新建立
+        参数说明：
+            :param file: log文件
         异常说明：无
-        返回值：None
+        返回值：LogIndex，不支持建立索引的格式返回None
         """
-        logger.info("Start converting log file.")
-        with LogReader(input_file) as reader:
-
-            if file_size:
-                _logger = SizedRotatingLogger(
-                    base_filename=output_file, max_bytes=file_size
-                )
-            else:
-                _logger = Logger(filename=output_file)
-
-            with _logger:
-                try:
-                    for m in reader:
-                        _logger(m)
-                except KeyboardInterrupt:
-                    sys.exit(1)
+        return load_log_index(file)
 
     @staticmethod
-    def log_parse(log_file, db_path, dest_file) -> None:
+    def read_window(file: typing.Union[pathlib.Path, str], start: typing.Optional[float] = None,
+                    stop: typing.Optional[float] = None, frame_ids: typing.Optional[typing.Iterable[int]] = None
+                    ) -> typing.Iterator[RawMessage]:
         """
-        功能说明：解析log数据
-        参数说明：无
+        功能说明：读取log文件时间窗口内的报文，通过索引直接定位到窗口，耗时与窗口大小成正比，
+                  不支持索引的格式顺序扫描整个文件
+        参数说明：
+            :param file: log文件
+            :param start: 窗口起始时间戳(包含)，None表示从头开始
+            :param stop: 窗口结束时间戳(包含)，None表示到文件结束
+            :param frame_ids: 需要读取的帧id，None表示全部帧
+        异常说明：无
+        返回值：报文迭代器
+        """
+        return read_log_window(file, start, stop, frame_ids)
+
+    @staticmethod
+    def merge_logs(sources: SourcesType,
+                   start: typing.Optional[float] = None,
+                   stop: typing.Optional[float] = None,
+                   frame_ids: typing.Optional[typing.Iterable[int]] = None
+                   ) -> typing.Iterator[typing.Tuple[str, RawMessage]]:
+        """
+        功能说明：按时间戳合并多路总线的log文件，逐帧读取，内存占用只与文件数量有关
+        参数说明：
+            :param sources: {总线名称: log文件或log文件列表}，或者CanTools.recording_message录制的某一天的目录，
+                            或者log文件/总线目录的列表，log文件以所在目录名作为总线名称
+            :param start: 只合并该时间戳之后的报文，有索引时直接定位，None表示从头开始
+            :param stop: 只合并该时间戳之前的报文，None表示到文件结束
+            :param frame_ids: 只合并这些帧id的报文，None表示全部帧
+        异常说明：
+            :exception FileNotFoundError: 文件或目录不存在
+        返回值：按时间戳排列的(总线名称, 报文)迭代器
+        """
+        return merge_logs(sources, start, stop, frame_ids)
+
+    @staticmethod
+    def log_merge(sources: SourcesType,
+                  dest_file: typing.Union[pathlib.Path, str],
+                  start: typing.Optional[float] = None,
+                  stop: typing.Optional[float] = None,
+                  frame_ids: typing.Optional[typing.Iterable[int]] = None
+                  ) -> typing.Dict[str, int]:
+        """
+        功能说明：按时间戳合并多路总线的log文件并写入一个文件，每路总线的报文写入不同的通道
+        参数说明：
+            :param sources: 需要合并的log文件，格式同merge_logs
+            :param dest_file: 合并后的文件名，文件格式为*.blf, *.asc等格式
+            :param start: 只合并该时间戳之后的报文，None表示从头开始
+            :param stop: 只合并该时间戳之前的报文，None表示到文件结束
+            :param frame_ids: 只合并这些帧id的报文，None表示全部帧
+        异常说明：
+            :exception FileNotFoundError: 文件或目录不存在
+        返回值：{总线名称: 合并后的文件中的通道号}
+        """
+        logger.info("Start merging log files.")
+        return write_merged_log(sources, dest_file, start, stop, frame_ids)
+
+    @staticmethod
+    def log_stats(log_file: typing.Union[pathlib.Path, str], db_path: typing.Optional[str] = None,
+                  bitrate: int = 500000, data_bitrate: typing.Optional[int] = 2000000, tolerance: float = 0.1
+                  ) -> BusStatisticsReport:
+        """
+        功能说明：统计log文件，包括每个帧id的频率、帧间隔和与dbc中周期的偏差，以及每个通道的总线负载，
+                  流式读取，内存占用只与帧id的数量有关
+        参数说明：
+            :param log_file: 需要统计的log文件，文件格式为*.blf, *.asc等格式
+            :param db_path: dbc文件路径，None表示不统计周期偏差
+            :param bitrate: 仲裁域波特率，单位为bit/s
+            :param data_bitrate: CAN FD数据域波特率，单位为bit/s
+            :param tolerance: 帧间隔与周期的偏差超过周期的该比例时计为一次超差
+        异常说明：
+            :exception ValueError: 波特率小于等于0
+        返回值：BusStatisticsReport
+        """
+        db = load_file(db_path) if db_path else None
+        statistics = BusStatistics(db, bitrate, data_bitrate, tolerance)
+        logger.info("Start statistics of log file.")
+        with LogReader(log_file) as reader:
+            statistics.consume(reader)
+        return statistics.report()
+
+    @staticmethod
+    def log_convert(input_file, output_file, file_size) -> ConversionStatistics:
+        """
+        功能说明：转换log文件格式，读取和写入在两个线程中流水线进行
+        参数说明：
+            :param input_file: 源文件，文件格式为*.blf, *.asc等格式
+            :param output_file: 目标文件，按后缀确定文件格式
+            :param file_size: 目标文件的切分大小，单位为byte，0表示不切分
         异常说明：无
+        返回值：ConversionStatistics，包括转换的帧数和每秒转换的帧数、字节数
+        """
+        logger.info("Start converting log file.")
+        try:
+            return convert_log(input_file, output_file, file_size)
+        except KeyboardInterrupt:
+            sys.exit(1)
+
+    @staticmethod
+    def log_convert_files(sources, dest_dir, suffix: str = ".asc", file_size: int = 0, jobs: int = 1
+                          ) -> typing.List[ConversionStatistics]:
+        """
+        功能说明：批量转换log文件格式，多个文件在多个进程中同时转换，目标文件保持源文件的相对目录结构
+        参数说明：
+            :param sources: 目录、通配符(例如/can_bus_log/*/BodyCAN/*.blf)、文件或它们的列表
+            :param dest_dir: 目标目录
+            :param suffix: 目标文件的后缀，例如.asc
+            :param file_size: 每个目标文件的切分大小，单位为byte，0表示不切分
+            :param jobs: 进程数，0表示使用全部cpu
+        异常说明：
+            :exception FileNotFoundError: 没有找到log文件
+        返回值：每个文件的ConversionStatistics
+        """
+        logger.info("Start converting log files.")
+        return convert_logs(sources, dest_dir, suffix, file_size, jobs)
+
+    @staticmethod
+    def log_parse(log_file, db_path, dest_file, output_format: str = "json", jobs: int = 1) -> None:
+        """
+        功能说明：解析log数据，逐帧解析并写入文件，内存占用与log文件大小无关
+        参数说明：
+            :param log_file: 需要解析的log文件，文件格式为*.blf, *.asc等格式，
+                             也可以是多个log文件的列表，多个文件的解析结果按时间戳归并到一个文件中
+            :param db_path: dbc文件路径
+            :param dest_file: 解析结果的文件名
+            :param output_format: 解析结果的格式，"json"与原有格式一致，以时间戳为键，按log中的顺序写入，
+                                  相邻的相同时间戳只保留最后一帧，时间戳乱序时不会重新排序；
+                                  "ndjson"每行一帧，包含timestamp字段，相同时间戳的帧不会互相覆盖
+            :param jobs: 并行解析的进程数，默认值1表示在当前进程中解析，0表示使用全部cpu，
+                         blf文件按容器切分后分配给各个进程，其他格式按文件分配，结果与单进程解析一致
+        异常说明：
+            :exception ValueError: 不支持的解析结果格式
         返回值：None
         """
+        if output_format not in LOG_PARSE_FORMATS:
+            raise ValueError(f"Argument 'output_format' choice can only in {list(LOG_PARSE_FORMATS)}.")
+        log_files = [log_file] if isinstance(log_file, (str, pathlib.PurePath)) else list(log_file)
+        jobs = jobs or os.cpu_count() or 1
         logger.info("Start parsing log file.")
-        db = load_file(db_path)
-        parsed_dict = dict()
-        with LogReader(log_file) as reader, open(dest_file, mode="w", encoding="utf-8") as output:
+        with LOG_PARSE_FORMATS[output_format](dest_file) as writer:
             try:
-                for m in reader:
-                    message_dict = dict()
-                    try:
-                        frame = db.get_message_by_frame_id(m.arbitration_id)
-                        signal_dict = frame.decode(m.data)
-                        for name, value in signal_dict.items():
-                            if isinstance(value, NamedSignalValue):
-                                signal_dict[name] = str(value)
-                        message_dict[hex(m.arbitration_id)] = str(m)
-                        message_dict[frame.name] = signal_dict
-                        parsed_dict[m.timestamp] = message_dict
-                    except Exception as ex:
-                        message_dict[hex(m.arbitration_id)] = str(m)
-                        if m.is_error_frame:
-                            message_dict["Error Frame"] = f"{m.timestamp} | can error | Error Frame"
-                        elif m.arbitration_id == 1:
-                            logger.warning(f"Unable to parse message:{m}")
-                        elif isinstance(ex, (KeyError, bitstruct.Error)):
-                            logger.error(f"Unable to parse message:{m} \npossible mismatch between "
-                                         f"type of can channel {m.channel} in the log: {log_file} and dbc: {db_path}")
-                        else:
-                            logger.exception(ex)
-                        parsed_dict[m.timestamp] = message_dict
-                output.write(json.dumps(parsed_dict, indent=4, sort_keys=True, ensure_ascii=False))
+                if jobs > 1:
+                    parse_logs_parallel(log_files, db_path, writer, output_format, jobs)
+                    return
+                db = load_file(db_path)
+                db.enable_compiled_codecs()
+                readers = [LogReader(file) for file in log_files]
+                messages = heapq.merge(*readers, key=attrgetter("timestamp")) if len(readers) > 1 else readers[0]
+                for m in messages:
+                    writer.write(m.timestamp, parse_message(m, db, log_file, db_path))
+                for reader in readers:
+                    reader.stop()
             except KeyboardInterrupt:
                 sys.exit(1)
 
+    @staticmethod
+    def log_export(log_file, db_path, dest_dir, signal_names: typing.Optional[typing.Iterable[str]] = None) -> int:
+        """
+        功能说明：将log按信号导出为列式时间序列，每个信号一列时间戳和一列物理值，枚举值保存在索引文件中，
+                  导出过程中分块追加写入，内存占用与log文件大小无关
+        参数说明：
+            :param log_file: 需要导出的log文件，文件格式为*.blf, *.asc等格式
+            :param db_path: dbc文件路径
+            :param dest_dir: 导出目录，使用load_series加载
+            :param signal_names: 需要导出的信号名，None表示全部信号
+        异常说明：无
+        返回值：导出的帧数
+        """
+        logger.info("Start exporting log file.")
+        return export_signal_series(log_file, db_path, dest_dir, signal_names)
+
+    @staticmethod
+    def load_series(path: typing.Union[pathlib.Path, str]) -> SignalSeriesStore:
+        """
+        功能说明：加载log_export导出的时间序列，数据文件以只读方式内存映射，安装了numpy时为numpy数组
+        参数说明：
+            :param path: 导出目录
+        异常说明：
+            :exception ValueError: 不支持的格式版本
+        返回值：SignalSeriesStore，store["报文名.信号名"]返回SignalSeries(name, timestamps, values, unit, choices)
+        """
+        return load_signal_series(path)
+
 
 class CanTools(object):
     """
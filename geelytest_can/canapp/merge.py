@@ -0,0 +1,119 @@
+import heapq
+import typing
+import logging
+import pathlib
+from can import Logger
+from can import LogReader
+from can import Message as RawMessage
+from .logindex import read_log_window
+
+
+logger = logging.getLogger(__name__)
+
+# 合并时识别为log文件的后缀，*.idx等索引文件不参与合并
+LOG_SUFFIXES = (".blf", ".asc", ".csv", ".log", ".trc", ".mf4", ".db")
+
+PathType = typing.Union[pathlib.Path, str]
+SourcesType = typing.Union[PathType, typing.Sequence[PathType], typing.Mapping[str, typing.Union[
+    PathType, typing.Sequence[PathType]]]]
+
+
+def collect_log_sources(sources: SourcesType) -> typing.Dict[str, typing.List[pathlib.Path]]:
+    """
+    功能说明：整理需要合并的log文件，按总线名称分组
+    参数说明：
+        :param sources: 以下几种形式之一：
+                        {总线名称: log文件或log文件列表}；
+                        CanTools.recording_message录制的某一天的目录，例如/can_bus_log/<day>，每个子目录为一路总线；
+                        log文件或总线目录的列表，log文件以所在目录名作为总线名称
+    异常说明：
+        :exception FileNotFoundError: 文件或目录不存在
+    返回值：{总线名称: [log文件]}
+    """
+    if isinstance(sources, typing.Mapping):
+        return {bus_name: [pathlib.Path(file) for file in ([files] if isinstance(files, (str, pathlib.PurePath))
+                                                           else files)]
+                for bus_name, files in sources.items()}
+    paths = [sources] if isinstance(sources, (str, pathlib.PurePath)) else sources
+    result: typing.Dict[str, typing.List[pathlib.Path]] = dict()
+    for path in map(pathlib.Path, paths):
+        if path.is_file():
+            result.setdefault(path.resolve().parent.name, list()).append(path)
+        elif path.is_dir():
+            files = sorted(file for file in path.iterdir() if file.is_file() and file.suffix.lower() in LOG_SUFFIXES)
+            if files:
+                result.setdefault(path.name, list()).extend(files)
+            for bus_dir in sorted(file for file in path.iterdir() if file.is_dir()):
+                files = sorted(file for file in bus_dir.iterdir()
+                               if file.is_file() and file.suffix.lower() in LOG_SUFFIXES)
+                if files:
+                    result.setdefault(bus_dir.name, list()).extend(files)
+        else:
+            raise FileNotFoundError(f"No such file or directory: {path}")
+    return result
+
+
+def _tagged(bus_name: str, messages: typing.Iterable[RawMessage]
+            ) -> typing.Iterator[typing.Tuple[str, RawMessage]]:
+    for message in messages:
+        yield bus_name, message
+
+
+def _message_timestamp(item: typing.Tuple[str, RawMessage]) -> float:
+    return item[1].timestamp
+
+
+def merge_logs(sources: SourcesType,
+               start: typing.Optional[float] = None,
+               stop: typing.Optional[float] = None,
+               frame_ids: typing.Optional[typing.Iterable[int]] = None
+               ) -> typing.Iterator[typing.Tuple[str, RawMessage]]:
+    """
+    功能说明：按时间戳合并多个log文件，每个文件按需逐帧读取，内存占用只与文件数量有关
+    参数说明：
+        :param sources: 需要合并的log文件，格式见collect_log_sources
+        :param start: 只合并该时间戳之后的报文，有索引时直接定位，None表示从头开始
+        :param stop: 只合并该时间戳之前的报文，None表示到文件结束
+        :param frame_ids: 只合并这些帧id的报文，None表示全部帧
+    异常说明：
+        :exception FileNotFoundError: 文件或目录不存在
+    返回值：按时间戳排列的(总线名称, 报文)，时间戳相同时按文件顺序排列
+    """
+    streams = list()
+    for bus_name, files in collect_log_sources(sources).items():
+        for file in files:
+            if start is None and stop is None and frame_ids is None:
+                messages = LogReader(file)
+            else:
+                messages = read_log_window(file, start, stop, frame_ids)
+            streams.append(_tagged(bus_name, messages))
+    logger.info(f"Merging {len(streams)} log files.")
+    return heapq.merge(*streams, key=_message_timestamp)
+
+
+def write_merged_log(sources: SourcesType,
+                     dest_file: PathType,
+                     start: typing.Optional[float] = None,
+                     stop: typing.Optional[float] = None,
+                     frame_ids: typing.Optional[typing.Iterable[int]] = None
+                     ) -> typing.Dict[str, int]:
+    """
+    功能说明：按时间戳合并多个log文件并写入一个文件，每路总线的报文写入不同的通道
+    参数说明：
+        :param sources: 需要合并的log文件，格式见collect_log_sources
+        :param dest_file: 合并后的文件名，文件格式为*.blf, *.asc等格式
+        :param start: 只合并该时间戳之后的报文，None表示从头开始
+        :param stop: 只合并该时间戳之前的报文，None表示到文件结束
+        :param frame_ids: 只合并这些帧id的报文，None表示全部帧
+    异常说明：
+        :exception FileNotFoundError: 文件或目录不存在
+    返回值：{总线名称: 合并后的文件中的通道号}，通道号按总线名称的顺序从0开始
+    """
+    sources = collect_log_sources(sources)
+    channels = {bus_name: channel for channel, bus_name in enumerate(sources)}
+    with Logger(dest_file) as writer:
+        for bus_name, message in merge_logs(sources, start, stop, frame_ids):
+            message.channel = channels[bus_name]
+            writer.on_message_received(message)
+    logger.info(f"Merged log files into {dest_file}, channels: {channels}")
+    return channels
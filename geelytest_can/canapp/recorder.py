@@ -0,0 +1,139 @@
+import time
+import logging
+import threading
+import typing
+from can import Listener
+from can import Message as RawMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+class RecorderStatistics(typing.NamedTuple):
+    received: int
+    written: int
+    dropped: int
+    capacity: int
+    high_water_mark: int
+    write_time: float
+    write_rate: float
+
+
+class BufferedRecorder(Listener):
+    """
+    录制监听器，接收线程只把报文放入预分配的环形缓冲区，由独立的写线程批量写入，
+    blf压缩、磁盘写入和文件切分都在写线程中进行，不会阻塞Notifier的接收线程
+    缓冲区满时丢弃新收到的报文并计数
+    """
+
+    def __init__(self, writer: Listener, capacity: int = 1 << 16, batch_size: int = 1024) -> None:
+        """
+        功能说明：初始化对象并启动写线程
+        参数说明：
+            :param writer: 实际写文件的监听器，例如SizedRotatingLogger
+            :param capacity: 环形缓冲区能保存的报文数
+            :param batch_size: 写线程每次从缓冲区取出的最大报文数
+        异常说明：
+            :exception ValueError: capacity或batch_size小于等于0
+        返回值：None
+        """
+        if capacity <= 0 or batch_size <= 0:
+            raise ValueError(f"Capacity and batch size must be greater than 0, but got {capacity} and {batch_size}.")
+        self.writer = writer
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.__buffer: typing.List[typing.Optional[RawMessage]] = [None] * capacity
+        self.__head = 0
+        self.__size = 0
+        self.__lock = threading.Lock()
+        self.__event = threading.Event()
+        self.__received = 0
+        self.__written = 0
+        self.__dropped = 0
+        self.__high_water_mark = 0
+        self.__write_time = 0.0
+        self.__start_time = time.monotonic()
+        self.__stopped = False
+        self.__thread = threading.Thread(target=self.__run, name="buffered-recorder", daemon=True)
+        self.__thread.start()
+
+    @property
+    def statistics(self) -> RecorderStatistics:
+        """
+        功能说明：获取录制统计，包括收到、写入和丢弃的帧数，缓冲区的最高水位，
+                  写线程实际写入花费的时间(s)和平均写入速率(帧/s)
+        参数说明：无
+        异常说明：无
+        返回值：RecorderStatistics
+        """
+        elapsed = time.monotonic() - self.__start_time
+        return RecorderStatistics(received=self.__received,
+                                  written=self.__written,
+                                  dropped=self.__dropped,
+                                  capacity=self.capacity,
+                                  high_water_mark=self.__high_water_mark,
+                                  write_time=self.__write_time,
+                                  write_rate=self.__written / elapsed if elapsed > 0 else 0.0)
+
+    def on_message_received(self, msg: RawMessage) -> None:
+        with self.__lock:
+            self.__received += 1
+            size = self.__size
+            if size >= self.capacity or self.__stopped:
+                self.__dropped += 1
+                return
+            self.__buffer[(self.__head + size) % self.capacity] = msg
+            self.__size = size + 1
+            if size >= self.__high_water_mark:
+                self.__high_water_mark = size + 1
+        if not size:
+            self.__event.set()
+
+    def __take(self) -> typing.List[RawMessage]:
+        with self.__lock:
+            count = min(self.__size, self.batch_size)
+            head = self.__head
+            end = head + count
+            if end <= self.capacity:
+                batch = self.__buffer[head:end]
+                self.__buffer[head:end] = [None] * count
+            else:
+                end -= self.capacity
+                batch = self.__buffer[head:] + self.__buffer[:end]
+                self.__buffer[head:] = [None] * (self.capacity - head)
+                self.__buffer[:end] = [None] * end
+            self.__head = end % self.capacity
+            self.__size -= count
+            if not self.__size:
+                self.__event.clear()
+        return batch
+
+    def __run(self) -> None:
+        while True:
+            self.__event.wait(0.1)
+            batch = self.__take()
+            if not batch:
+                if self.__stopped:
+                    break
+                continue
+            start_time = time.perf_counter()
+            for msg in batch:
+                try:
+                    self.writer.on_message_received(msg)
+                except Exception as ex:
+                    logger.error(f"Because {ex}, record message {msg} failed.")
+            self.__write_time += time.perf_counter() - start_time
+            self.__written += len(batch)
+
+    def stop(self) -> None:
+        """
+        功能说明：停止接收，等待缓冲区中的报文全部写入后关闭writer
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        with self.__lock:
+            self.__stopped = True
+        self.__event.set()
+        self.__thread.join()
+        self.writer.stop()
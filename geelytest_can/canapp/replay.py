@@ -0,0 +1,230 @@
+import math
+import time
+import queue
+import logging
+import threading
+import typing
+from can import BusABC
+from can import LogReader
+from can import Message as RawMessage
+from can.util import channel2int
+from .scheduler import SPIN_THRESHOLD
+
+
+logger = logging.getLogger(__name__)
+
+# 预读线程每次放入队列的报文数
+PREFETCH_BATCH = 256
+# 延迟直方图的分辨率和范围，超出范围的延迟计入最后一个桶，单位为s
+LATENESS_RESOLUTION = 1e-6
+LATENESS_BUCKETS = 100000
+# 默认跳过的空闲时长，与can.MessageSync一致，单位为s
+DEFAULT_SKIP = 60.0
+
+
+class ReplayStatistics(typing.NamedTuple):
+    sent: int
+    skipped: int
+    errors: int
+    duration: float
+    mean_lateness: float
+    p99_lateness: float
+    max_lateness: float
+
+
+class ReplayEngine(object):
+    """
+    按log中的时间间隔回放报文
+    通道到总线的路由表在初始化时计算，预读线程将报文读入有界队列，
+    发送时刻基于time.perf_counter计算，距离发送时刻较远时睡眠，接近时自旋等待
+    """
+
+    def __init__(self,
+                 buses: typing.Iterable[BusABC],
+                 speed: typing.Optional[float] = 1.0,
+                 prefetch: int = 64,
+                 skip: typing.Optional[float] = DEFAULT_SKIP
+                 ) -> None:
+        """
+        功能说明：初始化对象
+        参数说明：
+            :param buses: 回放使用的总线，log中的通道号与总线的通道号一致时在该总线上发送
+            :param speed: 回放速度倍数，例如0.5为慢放一倍，2为快放一倍，None、0或inf表示不等待，尽快发送
+            :param prefetch: 预读队列的容量，单位为PREFETCH_BATCH帧
+            :param skip: 回放时等待超过该时长(单位为s)的空闲时段缩短为该时长，None或0表示不跳过
+        异常说明：
+            :exception ValueError: 回放速度或跳过时长小于0
+        返回值：None
+        """
+        if speed is not None and speed < 0:
+            raise ValueError(f"Replay speed must not be negative, but got {speed}.")
+        if skip is not None and skip < 0:
+            raise ValueError(f"Replay skip must not be negative, but got {skip}.")
+        self.buses = list(buses)
+        self.skip = skip or None
+        self.speed = None if not speed or math.isinf(speed) else speed
+        self.prefetch = prefetch
+        self.__routes: typing.Dict[int, typing.List[BusABC]] = dict()
+        for bus in self.buses:
+            self.__routes.setdefault(channel2int(bus.channel_info), list()).append(bus)
+        # log中的通道值到总线列表的缓存，每个不同的通道值只计算一次channel2int
+        self.__channel_cache: typing.Dict[typing.Any, typing.Tuple[BusABC, ...]] = dict()
+        self.__stop_event = threading.Event()
+        self.__histogram = [0] * (LATENESS_BUCKETS + 1)
+
+    def route(self, channel: typing.Any) -> typing.Tuple[BusABC, ...]:
+        """
+        功能说明：获取log中的通道对应的总线
+        参数说明：
+            :param channel: log中报文的通道
+        异常说明：无
+        返回值：总线元组，没有对应的总线时为空
+        """
+        buses = self.__channel_cache.get(channel)
+        if buses is None:
+            buses = tuple(self.__routes.get(channel2int(channel), ()))
+            self.__channel_cache[channel] = buses
+        return buses
+
+    def stop(self) -> None:
+        """
+        功能说明：停止正在进行的回放
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        self.__stop_event.set()
+
+    def replay_file(self, file) -> ReplayStatistics:
+        """
+        功能说明：回放log文件
+        参数说明：
+            :param file: 需要回放的log文件，文件格式为*.blf, *.asc, *.csv等格式
+        异常说明：无
+        返回值：ReplayStatistics
+        """
+        with LogReader(file) as reader:
+            return self.replay(reader)
+
+    def replay(self, messages: typing.Iterable[RawMessage]) -> ReplayStatistics:
+        """
+        功能说明：回放报文，阻塞到全部发送完成或者调用stop
+        参数说明：
+            :param messages: 按时间顺序排列的报文，错误帧和没有对应总线的报文会被跳过
+        异常说明：无
+        返回值：ReplayStatistics，延迟为实际发送时刻晚于计划时刻的时间，单位为s
+        """
+        self.__stop_event.clear()
+        self.__histogram = [0] * (LATENESS_BUCKETS + 1)
+        batches: "queue.Queue[typing.Optional[typing.List[RawMessage]]]" = queue.Queue(self.prefetch)
+        reader = threading.Thread(target=self.__prefetch, args=(messages, batches), name="replay-prefetch",
+                                  daemon=True)
+        reader.start()
+        sent = skipped = errors = 0
+        total_lateness = max_lateness = 0.0
+        histogram = self.__histogram
+        speed = self.speed
+        skip = self.skip
+        stop_event = self.__stop_event
+        route = self.route
+        perf_counter = time.perf_counter
+        sleep = time.sleep
+        start = first_timestamp = replay_start = None
+        try:
+            while not stop_event.is_set():
+                try:
+                    batch = batches.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if batch is None:
+                    break
+                for message in batch:
+                    buses = route(message.channel) if not message.is_error_frame else ()
+                    if not buses:
+                        skipped += 1
+                        continue
+                    if start is None:
+                        start, first_timestamp = perf_counter(), message.timestamp
+                        replay_start = start
+                    if speed is not None:
+                        due = start + (message.timestamp - first_timestamp) / speed
+                        delay = due - perf_counter()
+                        if skip is not None and delay > skip:
+                            # 跳过空闲时段，之后的报文按新的起点计算发送时刻
+                            start -= delay - skip
+                            due -= delay - skip
+                            delay = skip
+                        if delay > SPIN_THRESHOLD:
+                            sleep(delay - SPIN_THRESHOLD)
+                        while perf_counter() < due:
+                            sleep(0)
+                        lateness = perf_counter() - due
+                        total_lateness += lateness
+                        max_lateness = max(max_lateness, lateness)
+                        histogram[min(int(lateness / LATENESS_RESOLUTION), LATENESS_BUCKETS)] += 1
+                    for bus in buses:
+                        message.channel = bus.channel_info
+                        try:
+                            bus.send(message)
+                        except Exception as ex:
+                            errors += 1
+                            logger.error(f"Because {ex}, replay message {message} failed.")
+                        else:
+                            sent += 1
+                    if stop_event.is_set():
+                        break
+        finally:
+            self.__stop_event.set()
+            # 取出队列中剩余的数据，让预读线程能够退出
+            while reader.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        paced = sum(histogram)
+        return ReplayStatistics(sent=sent,
+                                skipped=skipped,
+                                errors=errors,
+                                duration=perf_counter() - replay_start if replay_start is not None else 0.0,
+                                mean_lateness=total_lateness / paced if paced else 0.0,
+                                p99_lateness=self.__percentile(0.99),
+                                max_lateness=max_lateness)
+
+    def __prefetch(self, messages: typing.Iterable[RawMessage],
+                   batches: "queue.Queue[typing.Optional[typing.List[RawMessage]]]") -> None:
+        batch = list()
+        try:
+            for message in messages:
+                batch.append(message)
+                if len(batch) >= PREFETCH_BATCH:
+                    if not self.__put(batches, batch):
+                        return
+                    batch = list()
+            if batch:
+                self.__put(batches, batch)
+        except Exception as ex:
+            logger.exception(ex)
+        finally:
+            self.__put(batches, None)
+
+    def __put(self, batches: queue.Queue, batch: typing.Optional[typing.List[RawMessage]]) -> bool:
+        # 队列已满时等待，回放停止后放弃
+        while not self.__stop_event.is_set():
+            try:
+                batches.put(batch, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __percentile(self, fraction: float) -> float:
+        total = sum(self.__histogram)
+        if not total:
+            return 0.0
+        rank = math.ceil(total * fraction)
+        count = 0
+        for bucket, value in enumerate(self.__histogram):
+            count += value
+            if count >= rank:
+                return (bucket + 1) * LATENESS_RESOLUTION
+        return LATENESS_BUCKETS * LATENESS_RESOLUTION
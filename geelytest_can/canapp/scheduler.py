@@ -0,0 +1,254 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+import typing
+from can import BusABC
+from can import Message as RawMessage
+
+
+logger = logging.getLogger(__name__)
+
+# 距离发送时刻小于该值时不再等待条件变量，改为让出GIL的自旋等待，单位为s
+SPIN_THRESHOLD = 0.001
+
+
+class CyclicTaskStatistics(typing.NamedTuple):
+    arbitration_id: int
+    period: float
+    sent: int
+    errors: int
+    overruns: int
+    max_jitter: float
+    mean_jitter: float
+
+
+class CyclicTask(object):
+    """
+    由CyclicScheduler调度的周期发送任务，接口与python-can的send_periodic返回的任务保持一致
+    """
+
+    def __init__(self,
+                 scheduler: "CyclicScheduler",
+                 bus: BusABC,
+                 messages: typing.Union[RawMessage, typing.Sequence[RawMessage]],
+                 period: float
+                 ) -> None:
+        """
+        功能说明：初始化对象
+        参数说明：
+            :param scheduler: 所属的调度器
+            :param bus: 发送报文的总线
+            :param messages: 周期发送的报文，多个报文时每个周期依次发送其中一帧
+            :param period: 发送周期，单位为s
+        异常说明：
+            :exception ValueError: 报文为空、报文id不一致或者周期小于等于0
+        返回值：None
+        """
+        if period <= 0:
+            raise ValueError(f"Period must be greater than 0, but got {period}.")
+        self.__scheduler = scheduler
+        self.__messages = self.__check_messages(messages)
+        self.__index = 0
+        self.bus = bus
+        self.period = period
+        self.arbitration_id = self.__messages[0].arbitration_id
+        self.is_stopped = True
+        self.__sent = 0
+        self.__errors = 0
+        self.__overruns = 0
+        self.__max_jitter = 0.0
+        self.__total_jitter = 0.0
+
+    @property
+    def messages(self) -> typing.Tuple[RawMessage, ...]:
+        return self.__messages
+
+    @property
+    def statistics(self) -> CyclicTaskStatistics:
+        return CyclicTaskStatistics(arbitration_id=self.arbitration_id,
+                                    period=self.period,
+                                    sent=self.__sent,
+                                    errors=self.__errors,
+                                    overruns=self.__overruns,
+                                    max_jitter=self.__max_jitter,
+                                    mean_jitter=self.__total_jitter / self.__sent if self.__sent else 0.0)
+
+    def start(self) -> None:
+        if self.is_stopped:
+            self.is_stopped = False
+            self.__scheduler.schedule(self)
+
+    def stop(self) -> None:
+        self.is_stopped = True
+        self.__scheduler.discard(self)
+
+    def modify_data(self, messages: typing.Union[RawMessage, typing.Sequence[RawMessage]]) -> None:
+        """
+        功能说明：替换周期发送的报文，不停止任务，下一个周期生效
+        参数说明：
+            :param messages: 新的报文，报文id必须与原报文一致
+        异常说明：
+            :exception ValueError: 报文为空或者报文id不一致
+        返回值：None
+        """
+        messages = self.__check_messages(messages)
+        if messages[0].arbitration_id != self.arbitration_id:
+            raise ValueError(f"The arbitration ID of new messages {hex(messages[0].arbitration_id)} "
+                             f"must be the same as the original {hex(self.arbitration_id)}.")
+        if len(messages) != len(self.__messages):
+            self.__index = 0
+        self.__messages = messages
+
+    def _send(self, due: float) -> float:
+        """
+        功能说明：发送当前周期的报文并更新统计信息，仅由调度线程调用
+        参数说明：
+            :param due: 本次发送的计划时刻(time.monotonic)
+        异常说明：无
+        返回值：下一次发送的计划时刻
+        """
+        messages = self.__messages
+        message = messages[self.__index % len(messages)]
+        self.__index = (self.__index + 1) % len(messages)
+        jitter = time.monotonic() - due
+        try:
+            self.bus.send(message)
+        except Exception as ex:
+            self.__errors += 1
+            logger.error(f"Because {ex}, send periodic message {message} failed.")
+        else:
+            self.__sent += 1
+            self.__total_jitter += jitter
+            self.__max_jitter = max(self.__max_jitter, jitter)
+        next_due = due + self.period
+        missed = int((time.monotonic() - next_due) // self.period) + 1
+        if missed > 0:
+            self.__overruns += missed
+            next_due += missed * self.period
+        return next_due
+
+    @staticmethod
+    def __check_messages(messages: typing.Union[RawMessage, typing.Sequence[RawMessage]]
+                         ) -> typing.Tuple[RawMessage, ...]:
+        messages = (messages,) if isinstance(messages, RawMessage) else tuple(messages)
+        if not messages:
+            raise ValueError("At least one message should be passed in.")
+        if any(message.arbitration_id != messages[0].arbitration_id for message in messages):
+            raise ValueError("All messages of a cyclic task must have the same arbitration ID.")
+        return messages
+
+
+class CyclicScheduler(object):
+    """
+    进程内所有CanController共享的周期发送调度器，用一个线程按最小堆顺序发送所有到期的报文
+    """
+
+    __default: "CyclicScheduler" = None
+    __default_lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self.__condition = threading.Condition()
+        self.__heap: typing.List[typing.Tuple[float, int, CyclicTask]] = list()
+        self.__sequence = itertools.count()
+        # 任务和其在堆中的有效序号，停止后重新启动的任务在堆中的旧条目会被忽略
+        self.__tasks: typing.Dict[CyclicTask, int] = dict()
+        self.__thread: threading.Thread = None
+
+    @classmethod
+    def default(cls) -> "CyclicScheduler":
+        """
+        功能说明：获取进程内共享的调度器
+        参数说明：无
+        异常说明：无
+        返回值：CyclicScheduler对象
+        """
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls()
+            return cls.__default
+
+    @property
+    def tasks(self) -> typing.List[CyclicTask]:
+        with self.__condition:
+            return list(self.__tasks)
+
+    def send_periodic(self,
+                      bus: BusABC,
+                      messages: typing.Union[RawMessage, typing.Sequence[RawMessage]],
+                      period: float
+                      ) -> CyclicTask:
+        """
+        功能说明：添加一个周期发送任务并立即开始发送
+        参数说明：
+            :param bus: 发送报文的总线
+            :param messages: 周期发送的报文，多个报文时每个周期依次发送其中一帧
+            :param period: 发送周期，单位为s
+        异常说明：
+            :exception ValueError: 报文为空、报文id不一致或者周期小于等于0
+        返回值：CyclicTask对象
+        """
+        task = CyclicTask(self, bus, messages, period)
+        task.start()
+        return task
+
+    def schedule(self, task: CyclicTask) -> None:
+        with self.__condition:
+            sequence = next(self.__sequence)
+            self.__tasks[task] = sequence
+            heapq.heappush(self.__heap, (time.monotonic(), sequence, task))
+            if self.__thread is None:
+                self.__thread = threading.Thread(name="canapp.scheduler.CyclicScheduler",
+                                                 target=self.__run,
+                                                 daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+
+    def discard(self, task: CyclicTask) -> None:
+        with self.__condition:
+            self.__tasks.pop(task, None)
+
+    def stop_tasks(self, bus: BusABC = None) -> None:
+        """
+        功能说明：停止总线上的所有周期发送任务
+        参数说明：
+            :param bus: 总线，None则停止所有任务
+        异常说明：无
+        返回值：None
+        """
+        for task in self.tasks:
+            if bus is None or task.bus is bus:
+                task.stop()
+
+    def statistics(self) -> typing.List[CyclicTaskStatistics]:
+        """
+        功能说明：获取所有任务的发送统计，包括发送次数、发送失败次数、错过的周期数和发送抖动(s)
+        参数说明：无
+        异常说明：无
+        返回值：CyclicTaskStatistics列表
+        """
+        return [task.statistics for task in self.tasks]
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__heap:
+                    self.__condition.wait()
+                due, sequence, task = self.__heap[0]
+                if self.__tasks.get(task) != sequence:
+                    heapq.heappop(self.__heap)
+                    continue
+                delay = due - time.monotonic()
+                if delay > SPIN_THRESHOLD:
+                    self.__condition.wait(delay - SPIN_THRESHOLD)
+                    continue
+                heapq.heappop(self.__heap)
+            while time.monotonic() < due:
+                time.sleep(0)
+            next_due = task._send(due)
+            with self.__condition:
+                if self.__tasks.get(task) == sequence:
+                    sequence = next(self.__sequence)
+                    self.__tasks[task] = sequence
+                    heapq.heappush(self.__heap, (next_due, sequence, task))
@@ -0,0 +1,367 @@
+import sys
+import time
+import struct
+import logging
+import multiprocessing
+import typing
+from multiprocessing import shared_memory
+from can import Bus as CanBus
+from can import Listener
+from can import Notifier
+from can import Message as RawMessage
+from .controller import CanController
+from .framepack import pack_flags
+from .framepack import unpack_flags
+from .framepack import FLAG_REMOTE
+
+
+logger = logging.getLogger(__name__)
+
+RING_MAGIC = b"CANR"
+RING_VERSION = 1
+# 头部：magic、版本、槽大小、槽数量、关闭标志，写入的帧数，通道名
+_HEADER = struct.Struct("<4sHHII")
+_HEAD = struct.Struct("<Q")
+_CHANNEL = struct.Struct("<64s")
+HEAD_OFFSET = 16
+CHANNEL_OFFSET = 24
+HEADER_SIZE = 128
+# 槽：序号戳，时间戳、帧id、标志位、数据长度、数据
+_STAMP = struct.Struct("<Q")
+_PAYLOAD = struct.Struct("<dIHBx64s")
+SLOT_SIZE = _STAMP.size + _PAYLOAD.size
+# 读者没有新数据时的轮询间隔，单位为s
+POLL_INTERVAL = 0.0005
+
+# 当前进程创建的共享内存名称
+_created: typing.Set[str] = set()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # 只有创建者负责删除共享内存，独立启动的进程附加时不能注册到自己的resource_tracker，否则进程退出时会删除共享内存
+    # multiprocessing创建的子进程与父进程共用resource_tracker，在创建者进程中附加时也不需要处理
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    memory = shared_memory.SharedMemory(name)
+    if multiprocessing.parent_process() is not None or memory.name in _created:
+        return memory
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, "shared_memory")
+    except Exception as ex:
+        logger.debug(f"Unable to unregister shared memory {name} from resource tracker: {ex}")
+    return memory
+
+
+class SharedFrameWriter(Listener):
+    """
+    共享内存环形缓冲区的写入者，每个槽固定大小，保存一帧报文，一个缓冲区只能有一个写入者
+    每个槽带有序号戳，写入前置为奇数，写完后置为偶数，读者通过前后两次读取序号戳判断数据是否完整，
+    写入者不等待读者，读者跟不上时旧的报文被覆盖
+    """
+
+    def __init__(self,
+                 name: typing.Optional[str] = None,
+                 capacity: int = 1 << 16,
+                 channel: typing.Any = None,
+                 create: bool = True
+                 ) -> None:
+        """
+        功能说明：初始化对象，创建或附加共享内存
+        参数说明：
+            :param name: 共享内存名称，None表示自动生成，create为False时必须指定
+            :param capacity: 槽数量，即缓冲区能保存的最多帧数
+            :param channel: 读者收到的报文的通道
+            :param create: True表示创建共享内存，False表示附加到已创建的共享内存，例如在接收进程中写入
+        异常说明：
+            :exception ValueError: capacity小于等于0或者共享内存不是报文缓冲区
+            :exception FileExistsError: 创建时同名的共享内存已存在
+            :exception FileNotFoundError: 附加时共享内存不存在
+        返回值：None
+        """
+        if create:
+            if capacity <= 0:
+                raise ValueError(f"Capacity must be greater than 0, but got {capacity}.")
+            self.__memory = shared_memory.SharedMemory(name, create=True, size=HEADER_SIZE + capacity * SLOT_SIZE)
+            _created.add(self.__memory.name)
+            _HEADER.pack_into(self.__memory.buf, 0, RING_MAGIC, RING_VERSION, SLOT_SIZE, capacity, 0)
+            _HEAD.pack_into(self.__memory.buf, HEAD_OFFSET, 0)
+            _CHANNEL.pack_into(self.__memory.buf, CHANNEL_OFFSET, str(channel if channel is not None else "")
+                               .encode("utf-8")[:64])
+        else:
+            self.__memory = _attach(name)
+            magic, version, slot_size, capacity, _ = _HEADER.unpack_from(self.__memory.buf, 0)
+            if magic != RING_MAGIC or version != RING_VERSION or slot_size != SLOT_SIZE:
+                self.__memory.close()
+                raise ValueError(f"Shared memory {name} is not a frame ring buffer.")
+        self.owner = create
+        self.capacity = capacity
+        self.__buffer = self.__memory.buf
+        self.__head = _HEAD.unpack_from(self.__buffer, HEAD_OFFSET)[0]
+
+    @property
+    def name(self) -> str:
+        return self.__memory.name
+
+    @property
+    def head(self) -> int:
+        """
+        功能说明：获取已写入的总帧数
+        参数说明：无
+        异常说明：无
+        返回值：帧数
+        """
+        return self.__head
+
+    def on_message_received(self, msg: RawMessage) -> None:
+        seq = self.__head
+        buffer = self.__buffer
+        offset = HEADER_SIZE + (seq % self.capacity) * SLOT_SIZE
+        flags = pack_flags(msg)
+        data = msg.data
+        length = len(data) if data is not None else 0
+        _STAMP.pack_into(buffer, offset, 2 * seq + 1)
+        _PAYLOAD.pack_into(buffer, offset + _STAMP.size, msg.timestamp, msg.arbitration_id, flags,
+                           length if not msg.is_remote_frame else msg.dlc, bytes(data or b""))
+        _STAMP.pack_into(buffer, offset, 2 * seq + 2)
+        self.__head = seq + 1
+        _HEAD.pack_into(buffer, HEAD_OFFSET, seq + 1)
+
+    def stop(self) -> None:
+        """
+        功能说明：停止写入，设置关闭标志，读者读完剩余的报文后结束
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        if self.__buffer is None:
+            return
+        _HEADER.pack_into(self.__buffer, 0, RING_MAGIC, RING_VERSION, SLOT_SIZE, self.capacity, 1)
+        self.__buffer = None
+        self.__memory.close()
+
+    def unlink(self) -> None:
+        """
+        功能说明：删除共享内存，只由创建者在所有进程使用完后调用
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        self.stop()
+        if self.owner:
+            self.__memory.unlink()
+            _created.discard(self.__memory.name)
+
+
+class SharedFrameReader(object):
+    """
+    共享内存环形缓冲区的读者，每个读者有自己的读取位置，任意数量的进程可以同时读取，
+    直接从共享内存解包报文，不需要逐帧序列化，读取速度跟不上写入时跳过被覆盖的报文并计入lost
+    """
+
+    def __init__(self, name: str, from_start: bool = False) -> None:
+        """
+        功能说明：初始化对象，附加到共享内存
+        参数说明：
+            :param name: 共享内存名称
+            :param from_start: True表示从缓冲区中最旧的报文开始读取，False表示只读取之后写入的报文
+        异常说明：
+            :exception ValueError: 共享内存不是报文缓冲区
+            :exception FileNotFoundError: 共享内存不存在
+        返回值：None
+        """
+        self.__memory = _attach(name)
+        buffer = self.__memory.buf
+        magic, version, slot_size, capacity, _ = _HEADER.unpack_from(buffer, 0)
+        if magic != RING_MAGIC or version != RING_VERSION or slot_size != SLOT_SIZE:
+            self.__memory.close()
+            raise ValueError(f"Shared memory {name} is not a frame ring buffer.")
+        self.name = name
+        self.capacity = capacity
+        channel = _CHANNEL.unpack_from(buffer, CHANNEL_OFFSET)[0].rstrip(b"\x00").decode("utf-8")
+        self.channel: typing.Any = int(channel) if channel.isdigit() else (channel or None)
+        self.lost = 0
+        self.__buffer = buffer
+        head = self.__read_head()
+        self.cursor = max(head - capacity, 0) if from_start else head
+
+    def __read_head(self) -> int:
+        return _HEAD.unpack_from(self.__buffer, HEAD_OFFSET)[0]
+
+    @property
+    def closed(self) -> bool:
+        """
+        功能说明：写入者是否已经停止
+        参数说明：无
+        异常说明：无
+        返回值：True/False
+        """
+        return bool(_HEADER.unpack_from(self.__buffer, 0)[4])
+
+    def __skip(self, head: int) -> None:
+        # 被覆盖后跳到缓冲区较新的位置，留出余量避免马上再次被覆盖
+        cursor = max(head - self.capacity * 3 // 4, self.cursor)
+        self.lost += cursor - self.cursor
+        logger.debug(f"Reader of {self.name} overrun, {cursor - self.cursor} frames lost.")
+        self.cursor = cursor
+
+    def read(self, max_frames: int = 1024, timeout: typing.Optional[float] = 0.0) -> typing.List[RawMessage]:
+        """
+        功能说明：读取报文
+        参数说明：
+            :param max_frames: 最多读取的帧数
+            :param timeout: 没有报文时等待的时间，单位为s，None表示一直等待到有报文或者写入者停止
+        异常说明：无
+        返回值：报文列表，超时或者写入者停止后没有报文时为空
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # 先读关闭标志再读报文，关闭前写入的报文都能读到
+            closed = self.closed
+            messages = self.__read(max_frames)
+            if messages or closed or (deadline is not None and time.monotonic() >= deadline):
+                return messages
+            time.sleep(POLL_INTERVAL)
+
+    def __read(self, max_frames: int) -> typing.List[RawMessage]:
+        buffer = self.__buffer
+        capacity = self.capacity
+        channel = self.channel
+        messages: typing.List[RawMessage] = list()
+        head = self.__read_head()
+        if head - self.cursor > capacity:
+            self.__skip(head)
+        while len(messages) < max_frames and self.cursor < head:
+            seq = self.cursor
+            offset = HEADER_SIZE + (seq % capacity) * SLOT_SIZE
+            expected = 2 * seq + 2
+            stamp = _STAMP.unpack_from(buffer, offset)[0]
+            if stamp == expected:
+                timestamp, arbitration_id, flags, length, data = _PAYLOAD.unpack_from(buffer, offset + _STAMP.size)
+                if _STAMP.unpack_from(buffer, offset)[0] == expected:
+                    messages.append(RawMessage(timestamp=timestamp,
+                                               arbitration_id=arbitration_id,
+                                               channel=channel,
+                                               dlc=length,
+                                               data=None if flags & FLAG_REMOTE else data[:length],
+                                               **unpack_flags(flags)))
+                    self.cursor = seq + 1
+                    continue
+            if stamp < expected:
+                # 写入者已经更新了帧数但该槽还没有写完，下次再读
+                break
+            # 读取过程中被覆盖
+            head = self.__read_head()
+            self.__skip(max(head, seq + capacity + 1))
+        return messages
+
+    def recv(self, timeout: typing.Optional[float] = None) -> typing.Optional[RawMessage]:
+        """
+        功能说明：读取一帧报文，与BusABC.recv的用法相同
+        参数说明：
+            :param timeout: 没有报文时等待的时间，单位为s，None表示一直等待到有报文或者写入者停止
+        异常说明：无
+        返回值：报文，超时时为None
+        """
+        messages = self.read(1, timeout)
+        return messages[0] if messages else None
+
+    def __iter__(self) -> typing.Iterator[RawMessage]:
+        while True:
+            messages = self.read(timeout=None)
+            if not messages:
+                return
+            yield from messages
+
+    def close(self) -> None:
+        """
+        功能说明：断开共享内存
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        self.__buffer = None
+        self.__memory.close()
+
+
+def _publish_bus(bus: typing.Union[typing.Dict[str, typing.Any], CanController], name: str,
+                 stop_event: multiprocessing.Event) -> None:
+    writer = SharedFrameWriter(name, create=False)
+    notifier = None
+    try:
+        if isinstance(bus, CanController):
+            bus.connect()
+            bus.notifier.add_listener(writer)
+        else:
+            bus = CanBus(**bus)
+            notifier = Notifier(bus, [writer])
+        logger.info(f"Publishing {bus} to shared memory {name}.")
+        stop_event.wait()
+    except Exception as ex:
+        logger.error(f"Because {ex}, publish bus to shared memory {name} failed.")
+    finally:
+        if notifier:
+            notifier.stop()
+            bus.shutdown()
+        elif isinstance(bus, CanController):
+            bus.disconnect()
+        writer.stop()
+
+
+class BusPublisher(object):
+    """
+    总线发布进程，在独立的进程中接收一路总线的报文并写入共享内存环形缓冲区，
+    录制、实时解析和测试断言等进程通过SharedFrameReader读取同一份报文
+    """
+
+    def __init__(self,
+                 bus: typing.Union[typing.Dict[str, typing.Any], CanController],
+                 name: typing.Optional[str] = None,
+                 capacity: int = 1 << 16
+                 ) -> None:
+        """
+        功能说明：创建共享内存并启动接收进程
+        参数说明：
+            :param bus: can.Bus的参数，例如{"interface": "pcan", "channel": "PCAN_USBBUS1", "bitrate": 500000}，
+                        或者未连接的CanController对象，在接收进程中连接
+            :param name: 共享内存名称，None表示自动生成
+            :param capacity: 环形缓冲区的槽数量
+        异常说明：
+            :exception FileExistsError: 同名的共享内存已存在
+        返回值：None
+        """
+        channel = bus.channel if isinstance(bus, CanController) else bus.get("channel")
+        self.ring = SharedFrameWriter(name, capacity, channel)
+        self.__stop_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=_publish_bus, args=(bus, self.ring.name, self.__stop_event),
+                                               name=f"bus-publisher-{self.ring.name}", daemon=True)
+        self.process.start()
+
+    @property
+    def name(self) -> str:
+        return self.ring.name
+
+    def reader(self, from_start: bool = False) -> SharedFrameReader:
+        """
+        功能说明：创建当前进程中的读者，其他进程使用SharedFrameReader(name)
+        参数说明：
+            :param from_start: True表示从缓冲区中最旧的报文开始读取
+        异常说明：无
+        返回值：SharedFrameReader
+        """
+        return SharedFrameReader(self.name, from_start)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        功能说明：停止接收进程并删除共享内存，已附加的读者在断开前仍然可以读取剩余的报文
+        参数说明：
+            :param timeout: 等待接收进程退出的时间，单位为s
+        异常说明：无
+        返回值：None
+        """
+        self.__stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning(f"Publisher process {self.process.name} did not exit, terminate it.")
+            self.process.terminate()
+        self.ring.unlink()
@@ -0,0 +1,231 @@
+import struct
+import logging
+import typing
+from geelytest_can.cantools import Message
+from geelytest_can.cantools import Signal
+from geelytest_can.cantools.database import EncodeError
+from geelytest_can.cantools.database import NamedSignalValue
+from geelytest_can.cantools.database import start_bit
+
+
+logger = logging.getLogger(__name__)
+
+SignalValue = typing.Union[int, float, str, NamedSignalValue]
+
+
+class E2EGroup(typing.NamedTuple):
+    checksum: str
+    counter: str
+    data_id: typing.Optional[str]
+    signal_names: typing.Tuple[str, ...]
+    # 参与校验和计算的信号名和长度，按信号名排序，不包括计数器和校验和
+    values: typing.Tuple[typing.Tuple[str, int], ...]
+
+
+class _Field(object):
+
+    __slots__ = ("signal", "mask", "shift", "clear_mask", "is_little_endian")
+
+    def __init__(self, signal: Signal, length: int) -> None:
+        self.signal = signal
+        self.mask = (1 << signal.length) - 1
+        self.is_little_endian = signal.byte_order == "little_endian"
+        if self.is_little_endian:
+            self.shift = signal.start
+            self.clear_mask = int.from_bytes((self.mask << self.shift).to_bytes(length, "little"), "big")
+        else:
+            self.shift = 8 * length - start_bit(signal) - signal.length
+            self.clear_mask = self.mask << self.shift
+
+
+class FrameTemplate(object):
+    """
+    预编译的报文模板，默认负载只计算一次，之后只修改变化信号对应的位，不支持复用报文和容器报文
+    """
+
+    def __init__(self, message: Message) -> None:
+        """
+        功能说明：初始化对象，根据信号初始值和更新位(_UB信号置1)计算默认负载
+        参数说明：
+            :param message: 从CAN数据库中解析到的CAN Frame对象
+        异常说明：
+            :exception ValueError: 报文是复用报文或容器报文
+        返回值：None
+        """
+        if message.is_container or message.is_multiplexed():
+            raise ValueError(f"Message {message.name} is multiplexed or a container, "
+                             f"it can't be encoded by frame template.")
+        self.__message = message
+        self.__length = message.length
+        self.__fields: typing.Dict[str, _Field] = {
+            signal.name: _Field(signal, message.length) for signal in message.signals
+        }
+        payload = 0
+        for signal in message.signals:
+            payload = self.__patch(payload, self.__fields[signal.name], self.default_raw(signal))
+        self.__payload = payload
+        self.__e2e_groups = self.__parse_e2e_groups(message)
+
+    @property
+    def message(self) -> Message:
+        return self.__message
+
+    @property
+    def e2e_groups(self) -> typing.Tuple[E2EGroup, ...]:
+        return self.__e2e_groups
+
+    @property
+    def payload(self) -> int:
+        return self.__payload
+
+    @property
+    def data(self) -> bytes:
+        return self.to_bytes(self.__payload)
+
+    def has_signal(self, name: str) -> bool:
+        return name in self.__fields
+
+    def encode(self, values: typing.Dict[str, SignalValue], payload: int = None, physical: bool = False) -> int:
+        """
+        功能说明：把信号值写入负载对应的位，只校验传入的信号
+        参数说明：
+            :param values: 信号名和信号值或者枚举名组成的字典
+            :param payload: 需要修改的负载，None则使用默认负载
+            :param physical: False表示信号值为原始值(未经过精度和偏移量换算)，与send_signals一致；
+                             True表示信号值为物理值，与Message.encode一致
+        异常说明：
+            :exception KeyError: 信号不在该报文中
+            :exception EncodeError: 信号值超出范围
+        返回值：修改后的负载
+        """
+        if payload is None:
+            payload = self.__payload
+        for name, value in values.items():
+            field = self.__fields[name]
+            if physical and isinstance(value, (int, float)):
+                value = (value - field.signal.offset) / field.signal.scale
+            payload = self.__patch(payload, field, self.to_raw(field.signal, value))
+        return payload
+
+    def set_raw(self, payload: int, name: str, raw: int) -> int:
+        """
+        功能说明：把不经过校验的原始值写入负载，用于计数器、校验和等信号
+        参数说明：
+            :param payload: 需要修改的负载
+            :param name: 信号名
+            :param raw: 信号原始值
+        异常说明：无
+        返回值：修改后的负载
+        """
+        return self.__patch(payload, self.__fields[name], raw)
+
+    def get_raw(self, payload: int, name: str) -> int:
+        """
+        功能说明：从负载中读取信号的原始位值（无符号）
+        参数说明：
+            :param payload: 负载
+            :param name: 信号名
+        异常说明：无
+        返回值：信号原始值
+        """
+        field = self.__fields[name]
+        if field.is_little_endian:
+            payload = int.from_bytes(payload.to_bytes(self.__length, "big"), "little")
+        return (payload >> field.shift) & field.mask
+
+    def to_bytes(self, payload: int) -> bytes:
+        return payload.to_bytes(self.__length, "big")
+
+    def from_bytes(self, data: typing.Union[bytes, bytearray]) -> int:
+        return int.from_bytes(bytes(data[:self.__length]).ljust(self.__length, b"\x00"), "big")
+
+    def to_raw(self, signal: Signal, value: SignalValue) -> typing.Union[int, float]:
+        """
+        功能说明：把传入的信号值转换为原始值并校验范围
+        参数说明：
+            :param signal: 信号对象
+            :param value: 信号原始值或者枚举名
+        异常说明：
+            :exception EncodeError: 信号值超出范围
+        返回值：信号原始值
+        """
+        if isinstance(value, (str, NamedSignalValue)):
+            try:
+                return signal.choice_string_to_number(str(value))
+            except (KeyError, ValueError):
+                raise EncodeError(f'Invalid value specified for signal '
+                                  f'"{signal.name}": "{value}"') from None
+        raw = float(value) if signal.is_float else round(value)
+        physical = signal.scale * raw + signal.offset
+        if signal.minimum is not None and physical < signal.minimum - signal.scale * 1e-6:
+            raise EncodeError(f'Expected signal "{signal.name}" value greater than or equal to '
+                              f'{signal.minimum} in message "{self.__message.name}", but got {physical}.')
+        if signal.maximum is not None and physical > signal.maximum + signal.scale * 1e-6:
+            raise EncodeError(f'Expected signal "{signal.name}" value less than or equal to '
+                              f'{signal.maximum} in message "{self.__message.name}", but got {physical}.')
+        if not self.__fits(signal, raw):
+            raise EncodeError(f'Signal "{signal.name}" value {raw} does not fit in {signal.length} bits '
+                              f'in message "{self.__message.name}".')
+        return raw
+
+    def __patch(self, payload: int, field: _Field, raw: typing.Union[int, float]) -> int:
+        signal = field.signal
+        if signal.is_float:
+            raw = int.from_bytes(struct.pack(">f" if signal.length == 32 else ">d", raw), "big")
+        bits = (int(raw) & field.mask) << field.shift
+        if field.is_little_endian:
+            bits = int.from_bytes(bits.to_bytes(self.__length, "little"), "big")
+        return (payload & ~field.clear_mask) | bits
+
+    @staticmethod
+    def __parse_e2e_groups(message: Message) -> typing.Tuple[E2EGroup, ...]:
+        e2e_groups = list()
+        for signal in message.signals:
+            if not signal.name.endswith("Chks"):
+                continue
+            signal_group = message.get_signal_group_by_signal_name(signal.name)
+            if not signal_group:
+                logger.error(f"Signal:{signal.name} not found signal group in message {message.name}.")
+                continue
+            counter = signal.name[:-4] + "Cntr"
+            if counter not in (sgn.name for sgn in message.signals):
+                logger.error(f"{message.name} not have {counter} signal, please check and try again.")
+                continue
+            values = tuple((name, message.get_signal_by_name(name).length)
+                           for name in sorted(signal_group.signal_names)
+                           if not (name.endswith("Chks") or name.endswith("Cntr")))
+            e2e_groups.append(E2EGroup(checksum=signal.name,
+                                       counter=counter,
+                                       data_id=signal.data_id,
+                                       signal_names=tuple(signal_group.signal_names),
+                                       values=values))
+        return tuple(e2e_groups)
+
+    @classmethod
+    def default_raw(cls, signal: Signal) -> typing.Union[int, float]:
+        """
+        功能说明：获取没有指定值的信号的默认原始值，更新位(_UB信号)为1，其他信号为数据库中的初始值，
+                  没有初始值时为物理值0对应的原始值，超出信号长度时为0
+        参数说明：
+            :param signal: 信号
+        异常说明：无
+        返回值：原始值
+        """
+        if signal.name.endswith("_UB"):
+            return 1
+        raw = signal.initial if signal.initial is not None else cls.__physical_to_raw(signal, 0)
+        return raw if cls.__fits(signal, raw) else 0
+
+    @staticmethod
+    def __physical_to_raw(signal: Signal, physical: float) -> int:
+        if signal.is_float:
+            return physical
+        return round((physical - signal.offset) / signal.scale)
+
+    @staticmethod
+    def __fits(signal: Signal, raw: typing.Union[int, float]) -> bool:
+        if signal.is_float:
+            return True
+        if signal.is_signed:
+            return -(1 << (signal.length - 1)) <= raw < (1 << (signal.length - 1))
+        return 0 <= raw < (1 << signal.length)
@@ -11,6 +11,7 @@ from can import Bus as CanBus
 from can import BusABC
 from geelytest_can.canapp import CanController
 from geelytest_can.canapp import CanLogManager
+from geelytest_can.canapp.shmring import BusPublisher
 from can import CanFDBitTiming
 '''
 概述: 主要用于管理多路PCAN设备的录制总线报文使用和提供CanController对象.
@@ -19,6 +20,7 @@ from can import CanFDBitTiming
 1)主进程启动多个线程去录制数据(一个pcan通道一个线程),建议不超过5个,线程通道容易奔溃
 2)启动多个进程进行录制can总线(缺点多进程是无法共享CanController对象,导致无法调用通道进行数据的收发)
 3)实例化两个CanTools对象,需要收发的通道一组，只需要录制报文的另外一组
+4)启动发布进程(一个通道一个进程)把总线报文写入共享内存,录制、解析、测试断言的进程通过SharedFrameReader读取同一份报文
 优点: 
 1)通过配置一个总线字典,通过暴露CanController对象,进行接收发送函数等等一些操作
 注意事项: 如果总线配置字典没有DB文件, 对于CanController对象来说带有signals信号函数操作是不能使用,只能使用带有message函数,切记切记！！！
@@ -57,6 +59,7 @@ class CanTools():
         self.__recording_can_bus: Dict[str, BusABC] = {}  
 
         self.__process_list: List[multiprocessing.Process] = []
+        self.__publishers: Dict[str, BusPublisher] = {}
         self.__pcan_status_threading: threading.Thread = None
         self.process_count = multiprocessing.RawValue('i',0) 
         self.process_flag = multiprocessing.RawValue('i',0)
@@ -164,15 +167,40 @@ class CanTools():
             logger.info(f'进程开始第： {count}个,进程信息: {process}; :::进程中pcan通道总线数据 {data.keys()}')
         logger.info(f'总共启动进程个数:{len(self.__process_list)},进程详细信息::: {self.__process_list}')
 
+    def create_process_publishing_message(self, capacity: int = 1 << 16) -> Dict[str, str]:
+        """
+        功能说明: 每个总线通道创建一个接收进程,把报文写入共享内存环形缓冲区,任意数量的进程可以通过SharedFrameReader读取.
+        参数说明:
+            :param capacity: 每个环形缓冲区能保存的帧数
+        异常说明：无
+        返回值: Dict{总线名称:共享内存名称}, 其他进程使用SharedFrameReader(共享内存名称)读取
+        """
+        controller_data = self.__new_cancontrolle()
+        for bus_name in controller_data:
+            try:
+                publisher = BusPublisher(controller_data[bus_name], capacity=capacity)
+            except Exception as e:
+                logger.error(f'总线: {bus_name},启动发布进程失败: {e}')
+                continue
+            self.__publishers.update({bus_name:publisher})
+            logger.info(f'总线: {bus_name},发布进程: {publisher.process}, 共享内存: {publisher.name}')
+        return {bus_name: publisher.name for bus_name, publisher in self.__publishers.items()}
+
     def close_process(self):
         """
-        功能说明: 关闭进程,设置标志位self.process_flag = 1
+        功能说明: 关闭进程,设置标志位self.process_flag = 1,并关闭发布进程
         参数说明:
             :param : 无
         异常说明：无
         返回值: None
         """
         self.process_flag.value = 1
+        self.__stop_publishers()
+
+    def __stop_publishers(self) -> None:
+        for bus_name in self.__publishers:
+            self.__publishers[bus_name].stop()
+        self.__publishers.clear()
 
     def disconnect(self) -> None:
         """
@@ -181,6 +209,7 @@ class CanTools():
             2)如果录制报文存在,停止报文录制.
             3)如果设备初始化,断开设备.
             3)如果开启了进程,关闭进程.
+            4)如果开启了发布进程,关闭发布进程并删除共享内存.
         参数说明：
             :param : 无
         异常说明：无
@@ -206,6 +235,8 @@ class CanTools():
             for process in self.__process_list:
                 process.terminate()
 
+        self.__stop_publishers()
+
     def loop_listen_pcan_status(self):
         """
         功能说明: 每隔1S,循环去读取总线的状态,当失败后重新连接录制报文,退出条件当self.process_flag.value = 1时退出
@@ -0,0 +1,205 @@
+import time
+import pathlib
+import logging
+import threading
+import typing
+from can import Listener
+from can import Logger
+from can import Message as RawMessage
+from geelytest_can.cantools import Message
+from .buffer import CaptureBuffer
+
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureRecord(typing.NamedTuple):
+    file: pathlib.Path
+    reason: str
+    trigger_timestamp: float
+    frames: int
+
+
+class TriggerCapture(Listener):
+    """
+    触发录制监听器，在内存中按列保存最近一段时间(或帧数)的报文(CaptureBuffer环形缓存，不保存报文对象)，
+    触发后继续收集触发后的一段报文，再把触发前后的报文写入blf/asc文件
+    触发源可以是帧id、信号条件或者调用trigger方法，未触发时每帧只有一次入队和一次集合查找
+    """
+
+    def __init__(self,
+                 file: typing.Union[pathlib.Path, str],
+                 pre_time: typing.Optional[float] = 10.0,
+                 post_time: typing.Optional[float] = 5.0,
+                 pre_frames: typing.Optional[int] = None,
+                 post_frames: typing.Optional[int] = None,
+                 trigger_ids: typing.Optional[typing.Iterable[int]] = None,
+                 max_frames: int = 1 << 20
+                 ) -> None:
+        """
+        功能说明：初始化对象
+        参数说明：
+            :param file: 录制文件名，每次触发生成一个文件，文件名后加序号，例如fault.blf保存为fault_001.blf
+            :param pre_time: 保留的触发前的时间，单位为s，None表示不按时间限制
+            :param post_time: 触发后继续收集的时间，单位为s，总线上没有报文时到时也会结束，None表示不按时间限制
+            :param pre_frames: 保留的触发前的帧数，None表示不按帧数限制
+            :param post_frames: 触发后继续收集的帧数，None表示不按帧数限制
+            :param trigger_ids: 收到这些帧id时触发
+            :param max_frames: 内存中最多保留的帧数，用于限制内存占用
+        异常说明：
+            :exception ValueError: 触发前后的窗口都没有限制
+        返回值：None
+        """
+        if pre_time is None and pre_frames is None:
+            raise ValueError("Either pre_time or pre_frames must be given.")
+        if post_time is None and post_frames is None:
+            raise ValueError("Either post_time or post_frames must be given.")
+        self.file = pathlib.Path(file)
+        self.pre_time = pre_time
+        self.post_time = post_time
+        self.post_frames = post_frames
+        self.trigger_ids: typing.Set[int] = set(trigger_ids or ())
+        self.captures: typing.List[CaptureRecord] = list()
+        self.__max_frames = min(pre_frames, max_frames) if pre_frames is not None else max_frames
+        self.__ring = CaptureBuffer(maxlen=self.__max_frames) if self.__max_frames else None
+        self.__signal_triggers: typing.Dict[int, typing.List[tuple]] = dict()
+        self.__lock = threading.Lock()
+        self.__post: typing.Optional[typing.List[RawMessage]] = None
+        self.__post_deadline = float("inf")
+        self.__post_timer: typing.Optional[threading.Timer] = None
+        self.__trigger: typing.Tuple[str, float] = ("", 0.0)
+        # 最近一帧的时间戳和收到时的time.monotonic()，用于把手动触发换算到报文的时间基准
+        self.__last_received: typing.Optional[typing.Tuple[float, float]] = None
+        self.__writers: typing.List[threading.Thread] = list()
+
+    def add_signal_trigger(self, message: Message, signal_name: str,
+                           predicate: typing.Callable[[typing.Any], bool]) -> None:
+        """
+        功能说明：添加信号条件触发，只有该报文的帧会解析这一个信号
+        参数说明：
+            :param message: 信号所在的报文对象
+            :param signal_name: 信号名
+            :param predicate: 信号值(物理值或枚举名)满足时返回True，例如lambda value: value > 100
+        异常说明：
+            :exception KeyError: 报文中没有该信号
+        返回值：None
+        """
+        message.get_signal_by_name(signal_name)
+        with self.__lock:
+            self.__signal_triggers.setdefault(message.frame_id, list()).append((message, signal_name, predicate))
+
+    def trigger(self, reason: str = "manual") -> None:
+        """
+        功能说明：从测试代码中触发录制，触发时刻为最近收到的报文的时间戳加上此后经过的时间，没有收到过报文时为当前时间
+        参数说明：
+            :param reason: 触发原因，记录在captures中
+        异常说明：无
+        返回值：None
+        """
+        with self.__lock:
+            if self.__last_received is not None:
+                last_timestamp, received = self.__last_received
+                timestamp = last_timestamp + time.monotonic() - received
+            else:
+                timestamp = time.time()
+            self.__start_post(reason, timestamp)
+
+    def on_message_received(self, msg: RawMessage) -> None:
+        with self.__lock:
+            self.__last_received = (msg.timestamp, time.monotonic())
+            if self.__post is not None:
+                self.__post.append(msg)
+                if msg.timestamp >= self.__post_deadline or \
+                        (self.post_frames is not None and len(self.__post) >= self.post_frames):
+                    self.__finish()
+                return
+            ring = self.__ring
+            if ring is not None:
+                ring.append(msg)
+                if self.pre_time is not None:
+                    ring.discard_before(msg.timestamp - self.pre_time)
+            frame_id = msg.arbitration_id
+            if frame_id in self.trigger_ids:
+                self.__start_post(f"frame id {hex(frame_id)}", msg.timestamp)
+            elif frame_id in self.__signal_triggers:
+                self.__check_signals(msg)
+
+    def __check_signals(self, msg: RawMessage) -> None:
+        for message, signal_name, predicate in self.__signal_triggers[msg.arbitration_id]:
+            try:
+                value = message.decode(msg.data, signals=[signal_name])[signal_name]
+                triggered = predicate(value)
+            except Exception as ex:
+                logger.debug(f"Unable to check signal trigger {signal_name} on message {msg}: {ex}")
+                continue
+            if triggered:
+                self.__start_post(f"signal {signal_name}={value}", msg.timestamp)
+                return
+
+    def __start_post(self, reason: str, timestamp: float) -> None:
+        # 收集触发后报文的过程中再次触发时忽略
+        if self.__post is not None:
+            logger.debug(f"Capture already triggered, ignore trigger: {reason}")
+            return
+        logger.info(f"Capture triggered by {reason} at {timestamp}.")
+        self.__trigger = (reason, timestamp)
+        self.__post = list()
+        self.__post_deadline = timestamp + self.post_time if self.post_time is not None else float("inf")
+        if self.post_frames == 0 or self.post_time == 0:
+            self.__finish()
+        elif self.post_time is not None:
+            # 触发后总线可能不再有报文，收集时间到达后由定时器结束录制
+            self.__post_timer = threading.Timer(self.post_time, self.__on_post_timeout, args=(len(self.captures),))
+            self.__post_timer.daemon = True
+            self.__post_timer.start()
+
+    def __on_post_timeout(self, capture_index: int) -> None:
+        with self.__lock:
+            if self.__post is not None and len(self.captures) == capture_index:
+                self.__finish()
+
+    def __finish(self) -> None:
+        if self.__post_timer is not None:
+            self.__post_timer.cancel()
+            self.__post_timer = None
+        # 触发前的缓存整体交给写线程，在写线程中才构造报文对象
+        ring, post = self.__ring, self.__post
+        if ring is not None:
+            self.__ring = CaptureBuffer(maxlen=self.__max_frames)
+        self.__post = None
+        reason, timestamp = self.__trigger
+        file = self.file.with_name(f"{self.file.stem}_{len(self.captures) + 1:03}{self.file.suffix}")
+        frames = (len(ring) if ring is not None else 0) + len(post)
+        self.captures.append(CaptureRecord(file, reason, timestamp, frames))
+        # 写文件在独立线程中进行，不阻塞接收线程
+        writer = threading.Thread(target=self.__write, args=(file, ring, post), name=f"trigger-capture-{file.name}",
+                                  daemon=True)
+        self.__writers = [thread for thread in self.__writers if thread.is_alive()] + [writer]
+        writer.start()
+
+    @staticmethod
+    def __write(file: pathlib.Path, ring: typing.Optional[CaptureBuffer], post: typing.List[RawMessage]) -> None:
+        try:
+            with Logger(file) as writer:
+                if ring is not None:
+                    for msg in ring.messages():
+                        writer.on_message_received(msg)
+                for msg in post:
+                    writer.on_message_received(msg)
+            logger.info(f"Saved {(len(ring) if ring is not None else 0) + len(post)} frames to {file}.")
+        except Exception as ex:
+            logger.error(f"Because {ex}, save captured frames to {file} failed.")
+
+    def stop(self) -> None:
+        """
+        功能说明：停止触发录制，正在收集触发后报文的录制立即写入文件，并等待所有文件写入完成
+        参数说明：无
+        异常说明：无
+        返回值：None
+        """
+        with self.__lock:
+            if self.__post is not None:
+                self.__finish()
+        for writer in self.__writers:
+            writer.join()
+        self.__writers.clear()
@@ -0,0 +1,107 @@
+# Code generated decoders.
+
+import struct
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import TYPE_CHECKING
+
+from .utils import start_bit
+from ..tools.typechecking import SignalDictType
+if TYPE_CHECKING:
+    from ..database import Signal
+
+
+DecoderType = Callable[[bytes, bool, bool], SignalDictType]
+
+_FLOAT_FORMATS = {16: '>e', 32: '>f', 64: '>d'}
+
+
+def _float_unpacker(length: int) -> Callable[[int], float]:
+    unpack = struct.Struct(_FLOAT_FORMATS[length]).unpack
+    number_of_bytes = length // 8
+
+    def unpack_float(value: int) -> float:
+        return unpack(value.to_bytes(number_of_bytes, 'big'))[0]
+
+    return unpack_float
+
+
+def _is_identity(signal: "Signal") -> bool:
+    # ``1 * value + 0`` returns ``value`` unchanged only if both
+    # constants are integers, otherwise the result type changes.
+    return (type(signal.scale) is int and signal.scale == 1
+            and type(signal.offset) is int and signal.offset == 0)
+
+
+def create_decoder(fields: Sequence["Signal"], length: int) -> DecoderType:
+    """Generate a decoder function for given signals of a frame of
+    `length` bytes.
+
+    The returned function takes ``(data, decode_choices, scaling)``
+    and returns the same dictionary as
+    :func:`~cantools.database.utils.decode_data` for `data` of
+    exactly `length` bytes. Every signal is extracted from a single
+    integer with one shift and one mask, and the scale, offset and
+    choices of each signal are bound as constants.
+
+    """
+
+    namespace: Dict[str, Any] = {}
+    lines: List[str] = ['def decode(data, decode_choices, scaling):']
+
+    if any(field.byte_order == 'big_endian' for field in fields):
+        lines.append("    big = int.from_bytes(data, 'big')")
+
+    if any(field.byte_order == 'little_endian' for field in fields):
+        lines.append("    little = int.from_bytes(data, 'little')")
+
+    for i, field in enumerate(fields):
+        if field.byte_order == 'big_endian':
+            source = 'big'
+            shift = 8 * length - start_bit(field) - field.length
+        else:
+            source = 'little'
+            shift = field.start
+
+        mask = (1 << field.length) - 1
+        value = f'v{i}'
+
+        if shift:
+            lines.append(f'    {value} = ({source} >> {shift}) & {mask:#x}')
+        else:
+            lines.append(f'    {value} = {source} & {mask:#x}')
+
+        if field.is_float:
+            namespace[f'float{i}'] = _float_unpacker(field.length)
+            lines.append(f'    {value} = float{i}({value})')
+        elif field.is_signed:
+            lines.append(f'    if {value} & {1 << (field.length - 1):#x}:')
+            lines.append(f'        {value} -= {1 << field.length:#x}')
+
+        if _is_identity(field):
+            scaled = value
+        else:
+            namespace[f'scale{i}'] = field.scale
+            namespace[f'offset{i}'] = field.offset
+            scaled = f'scale{i} * {value} + offset{i}'
+
+        if field.choices:
+            namespace[f'choices{i}'] = field.choices
+            lines.append(f'    if decode_choices and {value} in choices{i}:')
+            lines.append(f'        {value} = choices{i}[{value}]')
+            if scaled != value:
+                lines.append('    elif scaling:')
+                lines.append(f'        {value} = {scaled}')
+        elif scaled != value:
+            lines.append('    if scaling:')
+            lines.append(f'        {value} = {scaled}')
+
+    items = ', '.join(f'{field.name!r}: v{i}' for i, field in enumerate(fields))
+    lines.append(f'    return {{{items}}}')
+
+    exec(compile('\n'.join(lines), '<cantools-decoder>', 'exec'), namespace)
+
+    return namespace['decode']
@@ -2,13 +2,14 @@
 
 import logging
 from copy import deepcopy
-from typing import List, Optional, Union, Dict, TYPE_CHECKING, Set, Tuple, cast
+from typing import Any, FrozenSet, List, Optional, Sequence, Union, Dict, TYPE_CHECKING, Set, Tuple, cast
 
 from .signal import NamedSignalValue, Signal
 from .signal_group import SignalGroup
 from .utils import format_or, start_bit
 from .utils import encode_data, decode_data
 from .utils import create_encode_decode_formats
+from .codegen import create_decoder, DecoderType
 from .utils import type_sort_signals
 from .utils import sort_signals_by_start_bit
 from .utils import SORT_SIGNALS_DEFAULT
@@ -119,6 +120,9 @@ class Message(object):
         self._bus_name = bus_name
         self._signal_groups = signal_groups
         self._codecs: Optional[Codec] = None
+        self._compiled_codec = False
+        self._compiled_decoder: Optional[DecoderType] = None
+        self._subset_decoders: Dict[FrozenSet[str], Optional[DecoderType]] = {}
         self._signal_tree: Optional[List[Union[str, List[str]]]] = None
         self._strict = strict
         self._protocol = protocol
@@ -1073,7 +1077,8 @@ class Message(object):
                decode_choices: bool = True,
                scaling: bool = True,
                decode_containers: bool = False,
-               allow_truncated: bool = False
+               allow_truncated: bool = False,
+               signals: Optional[Sequence[str]] = None
                ) -> DecodeResultType:
         """Decode given data as a message of this type.
 
@@ -1103,6 +1108,14 @@ class Message(object):
         ``False``, `DecodeError` will be raised when trying to decode
         incomplete messages.
 
+        If `signals` is given, only the signals with these names are
+        decoded. The extraction plan of each set of signal names is
+        generated once and cached, so the cost does not depend on the
+        total number of signals in the message.
+
+        >>> foo.decode(b'\\x01\\x45\\x23\\x00\\x11', signals=['Fum'])
+        {'Fum': 5.0}
+
         """
 
         if decode_containers and self.is_container:
@@ -1114,13 +1127,15 @@ class Message(object):
         return self.decode_simple(data,
                                   decode_choices,
                                   scaling,
-                                  allow_truncated)
+                                  allow_truncated,
+                                  signals)
 
     def decode_simple(self,
                       data: bytes,
                       decode_choices: bool = True,
                       scaling: bool = True,
-                      allow_truncated: bool = False
+                      allow_truncated: bool = False,
+                      signals: Optional[Sequence[str]] = None
                       ) -> SignalDictType:
         """Decode given data as a container message.
 
@@ -1136,12 +1151,96 @@ class Message(object):
 
         data = data[:self._length]
 
+        if signals is not None:
+            return self._decode_signals(data,
+                                        frozenset(signals),
+                                        decode_choices,
+                                        scaling,
+                                        allow_truncated)
+
+        if self._compiled_codec and len(data) == self._length:
+            decoder = self._compiled_decoder
+
+            if decoder is None:
+                decoder = self._compile_decoder()
+
+            if decoder is not None:
+                return decoder(data, decode_choices, scaling)
+
         return self._decode(self._codecs,
                             data,
                             decode_choices,
                             scaling,
                             allow_truncated)
 
+    @property
+    def compiled_codec(self) -> bool:
+        """``True`` if :meth:`decode()` uses a code generated decoder for
+        non-multiplexed messages.
+
+        """
+
+        return self._compiled_codec
+
+    def enable_compiled_codec(self, enabled: bool = True) -> None:
+        """Enable or disable the compiled codec of this message.
+
+        When enabled, :meth:`decode()` decodes complete frames of
+        non-multiplexed messages with a Python function generated for
+        this message on first use. The result is identical to the
+        default bitstruct based decoding, which is still used for
+        multiplexed messages and truncated frames.
+
+        """
+
+        self._compiled_codec = enabled
+
+    def _decode_signals(self,
+                        data: bytes,
+                        names: FrozenSet[str],
+                        decode_choices: bool,
+                        scaling: bool,
+                        allow_truncated: bool) -> SignalDictType:
+        try:
+            decoder = self._subset_decoders[names]
+        except KeyError:
+            decoder = self._compile_subset_decoder(names)
+
+        if decoder is not None and len(data) == self._length:
+            return decoder(data, decode_choices, scaling)
+
+        decoded = self._decode(self._codecs,  # type: ignore[arg-type]
+                               data,
+                               decode_choices,
+                               scaling,
+                               allow_truncated)
+
+        return {name: value for name, value in decoded.items() if name in names}
+
+    def _compile_subset_decoder(self, names: FrozenSet[str]) -> Optional[DecoderType]:
+        for name in names:
+            if name not in self._signal_dict:
+                raise KeyError(f'Signal "{name}" not found in message "{self.name}".')
+
+        if self._codecs is None or self._codecs['multiplexers']:
+            decoder = None
+        else:
+            fields = [signal for signal in self._codecs['signals'] if signal.name in names]
+            decoder = create_decoder(fields, self._length)
+
+        self._subset_decoders[names] = decoder
+
+        return decoder
+
+    def _compile_decoder(self) -> Optional[DecoderType]:
+        if self._codecs is None or self._codecs['multiplexers']:
+            return None
+
+        self._compiled_decoder = create_decoder(self._codecs['signals'],
+                                                self._length)
+
+        return self._compiled_decoder
+
     def decode_container(self,
                          data: bytes,
                          decode_choices: bool = True,
@@ -1324,6 +1423,8 @@ class Message(object):
 
         self._check_signal_lengths()
         self._codecs = self._create_codec()
+        self._compiled_decoder = None
+        self._subset_decoders = {}
         self._signal_tree = self._create_signal_tree(self._codecs)
         self._signal_dict = {signal.name: signal for signal in self._signals}
 
@@ -1334,6 +1435,15 @@ class Message(object):
             message_bits = 8 * self.length * [None]
             self._check_signal_tree(message_bits, self.signal_tree)
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # Generated decoders can't be pickled, they are recreated on
+        # first use.
+        state = self.__dict__.copy()
+        state['_compiled_decoder'] = None
+        state['_subset_decoders'] = {}
+
+        return state
+
     def __repr__(self) -> str:
         return \
             f'message(' \
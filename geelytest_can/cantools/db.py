@@ -2,6 +2,8 @@ import logging
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import Set
 from typing import TextIO
 from typing import Union
 
@@ -66,6 +68,10 @@ class Database(object):
         self._buses = buses or []
         self._name_to_message: Dict[str, Message] = {}
         self._frame_id_to_message: Dict[int, Message] = {}
+        self._name_to_signal: Dict[str, Signal] = {}
+        self._casefold_name_to_signal: Dict[str, Signal] = {}
+        self._name_to_signal_messages: Dict[str, List[Message]] = {}
+        self._signal_to_message: Dict[Signal, Message] = {}
         self._version = version
         self._dbc = dbc_specifics
         self._autosar = autosar_specifics
@@ -76,6 +82,7 @@ class Database(object):
         self._frame_id_mask = frame_id_mask
         self._strict = strict
         self._sort_signals = sort_signals
+        self._compiled_codecs = False
         self.refresh()
 
     @property
@@ -91,11 +98,16 @@ class Database(object):
         return self._messages
 
     @property
-    def signals(self) -> List[Signal]:
-        _signals = set()
-        for message in self.messages:
-            _signals.update(message.signals)
-        return _signals
+    def signals(self) -> Set[Signal]:
+        """A set of all signals of all messages in the database.
+
+        Use :meth:`.get_signal_by_name()` or
+        :meth:`.get_message_by_signal()` to find a signal or its
+        message by name.
+
+        """
+
+        return set(self._signal_to_message)
 
     @property
     def nodes(self) -> List[Node]:
@@ -329,6 +341,15 @@ class Database(object):
         self._name_to_message[message.name] = message
         self._frame_id_to_message[masked_frame_id] = message
 
+        if self._compiled_codecs:
+            message.enable_compiled_codec()
+
+        for signal in message.signals:
+            self._signal_to_message[signal] = message
+            self._name_to_signal.setdefault(signal.name, signal)
+            self._casefold_name_to_signal.setdefault(signal.name.casefold(), signal)
+            self._name_to_signal_messages.setdefault(signal.name, []).append(message)
+
     def as_dbc_string(self, *, sort_signals: type_sort_signals = SORT_SIGNALS_DEFAULT) -> str:
         """Return the database as a string formatted as a DBC file.
 
@@ -392,13 +413,43 @@ class Database(object):
         return self._frame_id_to_message[frame_id & self._frame_id_mask]
 
     def get_message_by_signal(self, sgn: Union[str, Signal]) -> Message:
-        if isinstance(sgn, str):
-            sgn = self.get_signal_by_name(sgn)
-        for message in self.messages:
-            if sgn in message.signals:
-                return message
+        """Find the message object containing given signal `sgn`, which
+        is either a signal name or a signal object.
+
+        If several messages contain a signal with the given name, a
+        warning listing all of them is logged and the first one (in
+        database order) is returned. Use
+        :meth:`.get_messages_by_signal()` to get all of them.
+
+        """
+
+        if not isinstance(sgn, str):
+            try:
+                return self._signal_to_message[sgn]
+            except KeyError:
+                raise KeyError(sgn) from None
+
+        messages = self.get_messages_by_signal(sgn)
+
+        if len(messages) > 1:
+            logger.warning(f"The signal name:{sgn} is ambiguous, it is contained in the messages:"
+                           f"{[message.name for message in messages]} in the database {self.version}, "
+                           f"the message:{messages[0].name} is used")
+
+        return messages[0]
+
+    def get_messages_by_signal(self, name: str) -> List[Message]:
+        """Find all message objects containing a signal named `name`.
+
+        """
+
+        messages = self._name_to_signal_messages.get(name)
 
-        raise KeyError(sgn)
+        if messages is None:
+            # raises a KeyError, warning about a case mismatch if any
+            self.get_signal_by_name(name)
+
+        return list(messages)
 
     def get_node_by_name(self, name: str) -> Node:
         """Find the node object for given name `name`.
@@ -429,10 +480,15 @@ class Database(object):
         raise KeyError(name)
 
     def get_signal_by_name(self, name: str) -> Signal:
-        for signal in self.signals:
-            if name == signal.name:
-                return signal
-            elif name.lower() == signal.name.lower():
+        """Find the signal object for given name `name`.
+
+        """
+
+        try:
+            return self._name_to_signal[name]
+        except KeyError:
+            signal = self._casefold_name_to_signal.get(name.casefold())
+            if signal is not None:
                 logger.warning(f"The expected signal name:{name} differs in case "
                                f"from the signal name:{signal.name} in the database {self.version}")
 
@@ -480,7 +536,8 @@ class Database(object):
                        decode_choices: bool = True,
                        scaling: bool = True,
                        decode_containers: bool = False,
-                       allow_truncated: bool = False
+                       allow_truncated: bool = False,
+                       signals: Optional[Sequence[str]] = None
                        ) -> DecodeResultType:
 
         """Decode given signal data `data` as a message of given frame id or
@@ -504,6 +561,12 @@ class Database(object):
         expect this to misbehave. Trying to decode a container message
         with `decode_containers` set to ``False`` will raise a
         `DecodeError`.
+
+        If `signals` is given, only the signals with these names are
+        decoded, see :meth:`Message.decode()`.
+
+        >>> db.decode_message('Foo', b'\\x01\\x45\\x23\\x00\\x11', signals=['Fum'])
+        {'Fum': 5.0}
         """
 
         if isinstance(frame_id_or_name, int):
@@ -528,7 +591,20 @@ class Database(object):
         return message.decode(data,
                               decode_choices,
                               scaling,
-                              allow_truncated=allow_truncated)
+                              allow_truncated=allow_truncated,
+                              signals=signals)
+
+    def enable_compiled_codecs(self, enabled: bool = True) -> None:
+        """Enable or disable the compiled codec of all messages in the
+        database, including messages added later. See
+        :meth:`Message.enable_compiled_codec()`.
+
+        """
+
+        self._compiled_codecs = enabled
+
+        for message in self._messages:
+            message.enable_compiled_codec(enabled)
 
     def refresh(self) -> None:
         """Refresh the internal database state.
@@ -541,6 +617,10 @@ class Database(object):
 
         self._name_to_message = {}
         self._frame_id_to_message = {}
+        self._name_to_signal = {}
+        self._casefold_name_to_signal = {}
+        self._name_to_signal_messages = {}
+        self._signal_to_message = {}
 
         for message in self._messages:
             message.refresh(self._strict)
@@ -1,15 +1,69 @@
-from crccheck.crc import Crc8GsmA as Crc
-from typing import Union, List, Tuple
+from functools import lru_cache
+from typing import Union, List, Tuple, Iterable
 
 
-def e2e_crc_data(data_id: int, counter: int, sig_value_length: Union[Tuple[int, int], List[Tuple[int, int]]]) -> int:
-    crc_data = bytearray(b'')
-    crc_data += data_id.to_bytes(2, 'little')
-    crc_data += counter.to_bytes(1, 'little')
+# CRC-8/GSM-A: poly=0x1D, init=0x00, refin=False, refout=False, xorout=0x00
+CRC8_POLY = 0x1D
+
+
+def _crc8_table(poly: int) -> Tuple[int, ...]:
+    table = list()
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return tuple(table)
+
+
+CRC8_TABLE = _crc8_table(CRC8_POLY)
+
+
+def crc8(data: Union[bytes, bytearray, Iterable[int]], crc: int = 0) -> int:
+    table = CRC8_TABLE
+    for byte in data:
+        crc = table[crc ^ byte]
+    return crc
+
+
+@lru_cache(maxsize=None)
+def data_id_crc(data_id: int) -> int:
+    """
+    功能说明：计算data id前缀(2字节，小端)的CRC中间值，按data id缓存
+    参数说明：
+        :param data_id: E2E的data id
+    异常说明：无
+    返回值：CRC中间值
+    """
+    return crc8(data_id.to_bytes(2, 'little'))
+
+
+def e2e_signal_bytes(sig_value_length: Union[Tuple[int, int], List[Tuple[int, int]]]) -> bytes:
     value_length_list = [sig_value_length] if isinstance(sig_value_length, tuple) else sig_value_length
-    for value, length in value_length_list:
-        crc_data += value.to_bytes(((length - 1) // 8) + 1, 'little')
-    return Crc.calc(crc_data)
+    return b''.join(value.to_bytes(((length - 1) // 8) + 1, 'little') for value, length in value_length_list)
+
+
+def e2e_crc_batch(data_id: int,
+                  sig_value_length: Union[Tuple[int, int], List[Tuple[int, int]]],
+                  counters: Iterable[int] = range(15)
+                  ) -> List[int]:
+    """
+    功能说明：信号值不变时，一次计算多个计数器值对应的E2E校验和
+    参数说明：
+        :param data_id: E2E的data id
+        :param sig_value_length: 信号组中除计数器和校验和外的信号原始值和信号长度，格式为[(value, length), ...]
+        :param counters: 计数器值，默认为0~14
+    异常说明：无
+    返回值：与counters一一对应的校验和列表
+    """
+    table = CRC8_TABLE
+    prefix = data_id_crc(data_id)
+    data = e2e_signal_bytes(sig_value_length)
+    return [crc8(data, table[prefix ^ counter]) for counter in counters]
+
+
+def e2e_crc_data(data_id: int, counter: int, sig_value_length: Union[Tuple[int, int], List[Tuple[int, int]]]) -> int:
+    return crc8(e2e_signal_bytes(sig_value_length), CRC8_TABLE[data_id_crc(data_id) ^ counter])
 
 
 if __name__ == '__main__':
@@ -19,3 +73,4 @@ if __name__ == '__main__':
     result = e2e_crc_data(data_id, counter, sig_value_length)
     print(result)
     print(hex(result))
+    print(e2e_crc_batch(data_id, sig_value_length))
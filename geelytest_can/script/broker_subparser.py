@@ -0,0 +1,41 @@
+import logging
+import argparse
+from jidutest_can.script.__main__ import MainParser
+from jidutest_can.canapp.broker import BusBroker
+from jidutest_can.canapp.broker import DEFAULT_BROKER_PATH
+from jidutest_can.can import PCANFD_500000_2000000
+from jidutest_can.script.tools import set_log
+from jidutest_can.script.tools import create_bus
+
+
+logger = logging.getLogger(__name__)
+
+
+@MainParser.RegisterSubparser("bus-broker", [
+    {"arg_name": "buses", "type": str, "help": "Buses served by the broker, bus name=interface:channel[:fd], "
+                                              "eg: BodyCAN=pcan:1 ChassisCAN=pcan:2:1", "nargs": "+"},
+    {"arg_name": "--bitrate", "type": int, "help": "CAN bitrate, unit: kbps", "default": 500},
+    {"arg_name": "--path", "type": str, "help": "Unix domain socket path of the broker",
+     "default": DEFAULT_BROKER_PATH},
+    {"arg_name": "--debug", "type": int, "help": "Enable or disable debug level", "default": 0, "choices": [0, 1]},
+], "Own CAN channels and share them with several processes through a local broker.")
+def bus_broker(args: argparse.Namespace) -> None:
+    set_log(args.debug)
+    buses = dict()
+    for bus in args.buses:
+        bus_name, _, device = bus.partition("=")
+        interface, channel, *fd = device.split(":")
+        bus_params = dict()
+        if fd and int(fd[0]):
+            bus_params.update({"fd": True})
+            bus_params.update(PCANFD_500000_2000000)
+        else:
+            bus_params.update({"bitrate": args.bitrate * 1000})
+        buses[bus_name] = create_bus(interface=interface, channel=int(channel) if channel.isdigit() else channel,
+                                     **bus_params)
+    try:
+        BusBroker(buses, args.path).serve_forever()
+    finally:
+        for bus in buses.values():
+            bus.shutdown()
+    logger.info(f"Broker completion.")
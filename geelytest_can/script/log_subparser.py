@@ -1,10 +1,13 @@
+import os
 import sys
+import glob
 import time
 import signal
 import logging
 import argparse
 from jidutest_can.script.__main__ import MainParser
 from jidutest_can.canapp import CanLogManager
+from jidutest_can.canapp.merge import collect_log_sources
 from jidutest_can.script.tools import set_log
 from jidutest_can.script.tools import is_valid_can_id
 from jidutest_can.can import PCANFD_500000_2000000
@@ -95,6 +98,10 @@ def start_logging(args: argparse.Namespace) -> None:
     {"arg_name": "filename", "type": str, "help": "The name/path of file to log data."},
     {"arg_name": "--fd", "type": int, "help": "CAN channel type, 0: CAN, 1: CANFD", "default": 0, "choices": [0, 1]},
     {"arg_name": "--bitrate", "type": int, "help": "CAN bitrate, unit: kbps", "default": 500},
+    {"arg_name": "--speed", "type": float, "help": "Replay speed multiplier, eg: 0.5, 2, 0: as fast as possible",
+     "default": 1.0},
+    {"arg_name": "--skip", "type": float, "help": "Shorten idle periods longer than this to this, unit: s, "
+                                                 "0: replay every gap in real time", "default": 60.0},
     {"arg_name": "--debug", "type": int, "help": "Enable or disable debug level", "default": 0, "choices": [0, 1]},
 ], "Replay CAN messages from a file")
 def replay_data(args: argparse.Namespace) -> None:
@@ -107,7 +114,7 @@ def replay_data(args: argparse.Namespace) -> None:
         bus_params.update({"bitrate": args.bitrate * 1000})
     bus = create_bus(interface=args.interface, channel=args.channel, **bus_params)
     manager = CanLogManager(bus)
-    manager.replay_data(args.filename)
+    manager.replay_data(args.filename, args.speed, args.skip)
 
     def stop_replaying(signum, frame) -> None:
         logger.warning(f"Receive signal 'Ctrl + C', end the application\n")
@@ -117,20 +124,30 @@ def replay_data(args: argparse.Namespace) -> None:
 
 
 @MainParser.RegisterSubparser("log-convert", [
-    {"arg_name": "source_file", "type": str, "help": "Source file path that need to be converted, eg: xxx.blf"},
-    {"arg_name": "dest_file", "type": str, "help": "Destination file path after conversion, eg: xxx.asc"},
+    {"arg_name": "source_file", "type": str, "help": "Source file path that need to be converted, or a directory / "
+                                                    "glob pattern to convert many files, eg: xxx.blf or '/logs/*.blf'"},
+    {"arg_name": "dest_file", "type": str, "help": "Destination file path after conversion, or the destination "
+                                                  "directory when converting many files, eg: xxx.asc"},
     {"arg_name": "--size", "type": int, "help": "Destination file slice size after conversion, unit:KB", "default": 0},
+    {"arg_name": "--suffix", "type": str, "help": "Destination file format when converting many files",
+     "default": ".asc"},
+    {"arg_name": "--jobs", "type": int, "help": "Number of converting processes, 0: all cpus", "default": 1},
     {"arg_name": "--debug", "type": int, "help": "Enable or disable debug level", "default": 0, "choices": [0, 1]},
 ], "Convert log file format to another file format")
 def log_convert(args: argparse.Namespace) -> None:
     set_log(args.debug)
-    if args.dest_file.endswith(".blf"):
+    batch = os.path.isdir(args.source_file) or glob.has_magic(args.source_file)
+    suffix = "." + args.suffix.lstrip(".") if batch else os.path.splitext(args.dest_file)[1]
+    if suffix == ".blf":
         # 由于blf文件在切片时获取的文件大小和实际有偏差，在此做简单的倍数放大
         size = args.size * 1024 * 12.8
     else:
         size = args.size * 1024
     try:
-        CanLogManager.log_convert(args.source_file, args.dest_file, size)
+        if batch:
+            CanLogManager.log_convert_files(args.source_file, args.dest_file, suffix, size, args.jobs)
+        else:
+            CanLogManager.log_convert(args.source_file, args.dest_file, size)
     except KeyboardInterrupt:
         logger.warning(f"Receive signal 'Ctrl + C', end the application\n")
         sys.exit(1)
@@ -139,30 +156,129 @@ def log_convert(args: argparse.Namespace) -> None:
 
 @MainParser.RegisterSubparser("read-log", [
     {"arg_name": "log_file", "type": str, "help": "Log file path that need to be read, eg: xxx.blf"},
+    {"arg_name": "--start", "type": float, "help": "Only read messages after this timestamp, unit: s", "default": None},
+    {"arg_name": "--stop", "type": float, "help": "Only read messages before this timestamp, unit: s", "default": None},
+    {"arg_name": "--ids", "type": str, "help": "Only read these CAN ids, eg: 0x123 0x234", "nargs": "*",
+     "default": None},
     {"arg_name": "--debug", "type": int, "help": "Enable or disable debug level", "default": 0, "choices": [0, 1]},
 ], "Read and display log file.")
 def read_log(args: argparse.Namespace) -> None:
     set_log(args.debug)
     try:
-        CanLogManager.read_log(args.log_file)
+        frame_ids = None if args.ids is None else [int(frame_id, 16) for frame_id in args.ids]
+        CanLogManager.read_log(args.log_file, args.start, args.stop, frame_ids)
     except KeyboardInterrupt:
         logger.warning(f"Receive signal 'Ctrl + C', end the application\n")
         sys.exit(1)
     logger.info(f"Read completion.")
 
 
+@MainParser.RegisterSubparser("log-index", [
+    {"arg_name": "log_file", "type": str, "help": "Log file paths that need to be indexed, eg: xxx.blf", "nargs": "+"},
+    {"arg_name": "--debug", "type": int, "help": "Enable or disable debug level", "default": 0, "choices": [0, 1]},
+], "Build sidecar index files for time range and CAN id seeks.")
+def log_index(args: argparse.Namespace) -> None:
+    set_log(args.debug)
+    try:
+        for log_file in args.log_file:
+            index = CanLogManager.build_index(log_file)
+            logger.info(f"{index.path}: {len(index.checkpoints)} checkpoints, {len(index.frame_ids)} CAN ids, "
+                        f"time range: {index.start_time} - {index.stop_time}")
+    except KeyboardInterrupt:
+        logger.warning(f"Receive signal 'Ctrl + C', end the application\n")
+        sys.exit(1)
+    logger.info(f"Index completion.")
+
+
+@MainParser.RegisterSubparser("log-merge", [
+    {"arg_name": "sources", "type": str, "help": "Log files or directories to merge, a directory recorded by "
+                                                "recording_message contains one sub directory per bus, "
+                                                "eg: /can_bus_log/2024-01-01 or BodyCAN=xxx.blf", "nargs": "+"},
+    {"arg_name": "--dest_file", "type": str, "help": "Destination file path after merged, eg: xxx.blf",
+     "default": "merged.blf"},
+    {"arg_name": "--start", "type": float, "help": "Only merge messages after this timestamp, unit: s", "default": None},
+    {"arg_name": "--stop", "type": float, "help": "Only merge messages before this timestamp, unit: s", "default": None},
+    {"arg_name": "--debug", "type": int, "help": "Enable or disable debug level", "default": 0, "choices": [0, 1]},
+], "Merge per-bus log files into one time-ordered file.")
+def log_merge(args: argparse.Namespace) -> None:
+    set_log(args.debug)
+    sources = dict()
+    for source in args.sources:
+        bus_name, _, path = source.rpartition("=")
+        if bus_name:
+            sources.setdefault(bus_name, list()).append(path)
+        else:
+            sources.update(collect_log_sources(path))
+    try:
+        channels = CanLogManager.log_merge(sources, args.dest_file, args.start, args.stop)
+    except KeyboardInterrupt:
+        logger.warning(f"Receive signal 'Ctrl + C', end the application\n")
+        sys.exit(1)
+    for bus_name, channel in channels.items():
+        logger.info(f"Bus {bus_name}: channel {channel}")
+    logger.info(f"Merge completion.")
+
+
+@MainParser.RegisterSubparser("log-stats", [
+    {"arg_name": "log_file", "type": str, "help": "Log file path that need to be analyzed, eg: xxx.blf"},
+    {"arg_name": "--db_path", "type": str, "help": "CAN database file path for names and cycle times, eg: XXX.dbc",
+     "default": None},
+    {"arg_name": "--bitrate", "type": int, "help": "Nominal bitrate, unit: bit/s", "default": 500000},
+    {"arg_name": "--data_bitrate", "type": int, "help": "CAN FD data phase bitrate, unit: bit/s", "default": 2000000},
+    {"arg_name": "--tolerance", "type": float, "help": "Allowed deviation from the cycle time, as a fraction of it",
+     "default": 0.1},
+    {"arg_name": "--debug", "type": int, "help": "Enable or disable debug level", "default": 0, "choices": [0, 1]},
+], "Report per CAN id rate, cycle jitter and bus load of a log file.")
+def log_stats(args: argparse.Namespace) -> None:
+    set_log(args.debug)
+    try:
+        report = CanLogManager.log_stats(args.log_file, args.db_path, args.bitrate, args.data_bitrate,
+                                         args.tolerance)
+    except KeyboardInterrupt:
+        logger.warning(f"Receive signal 'Ctrl + C', end the application\n")
+        sys.exit(1)
+    for line in report.format().splitlines():
+        logger.info(line)
+    logger.info(f"Statistics completion.")
+
+
 @MainParser.RegisterSubparser("log-parse", [
-    {"arg_name": "log_file", "type": str, "help": "Log file path that need to be parse, eg: xxx.blf"},
+    {"arg_name": "log_file", "type": str, "help": "Log file paths that need to be parse, "
+                                                 "multiple files are merged by timestamp, eg: xxx.blf",
+     "nargs": "+"},
     {"arg_name": "db_path", "type": str, "help": "CAN database file path, eg: XXX.dbc"},
     {"arg_name": "--dest_file", "type": str, "help": "Destination file path after parsed, eg: xxx.json", "default": None},
+    {"arg_name": "--format", "type": str, "help": "Destination file format, json: one JSON object keyed by timestamp, "
+                                                  "ndjson: one JSON record per line", "default": "json",
+     "choices": ["json", "ndjson"]},
+    {"arg_name": "--jobs", "type": int, "help": "Number of parsing processes, 0: all cpus", "default": 1},
     {"arg_name": "--debug", "type": int, "help": "Enable or disable debug level", "default": 0, "choices": [0, 1]},
 ], "Log file parsed by dbc.")
 def log_parse(args: argparse.Namespace) -> None:
     set_log(args.debug)
     try:
-        dest_file = args.dest_file or args.log_file.split(".")[0] + ".json"
-        CanLogManager.log_parse(args.log_file, args.db_path, dest_file)
+        dest_file = args.dest_file or args.log_file[0].split(".")[0] + "." + args.format
+        CanLogManager.log_parse(args.log_file, args.db_path, dest_file, args.format, args.jobs)
     except KeyboardInterrupt:
         logger.warning(f"Receive signal 'Ctrl + C', end the application\n")
         sys.exit(1)
     logger.info(f"Read completion.")
+
+
+@MainParser.RegisterSubparser("log-export", [
+    {"arg_name": "log_file", "type": str, "help": "Log file path that need to be exported, eg: xxx.blf"},
+    {"arg_name": "db_path", "type": str, "help": "CAN database file path, eg: XXX.dbc"},
+    {"arg_name": "--dest_dir", "type": str, "help": "Destination directory of the signal time series", "default": None},
+    {"arg_name": "--signals", "type": str, "help": "Signal names to export, default: all signals", "nargs": "*",
+     "default": None},
+    {"arg_name": "--debug", "type": int, "help": "Enable or disable debug level", "default": 0, "choices": [0, 1]},
+], "Export log file to one time series per signal.")
+def log_export(args: argparse.Namespace) -> None:
+    set_log(args.debug)
+    try:
+        dest_dir = args.dest_dir or args.log_file.split(".")[0] + "_series"
+        frames = CanLogManager.log_export(args.log_file, args.db_path, dest_dir, args.signals)
+    except KeyboardInterrupt:
+        logger.warning(f"Receive signal 'Ctrl + C', end the application\n")
+        sys.exit(1)
+    logger.info(f"Export completion, {frames} frames.")
@@ -0,0 +1,48 @@
+import os
+import time
+import logging
+import tempfile
+from pathlib import Path
+from can import LogReader
+from can import Message
+from can import SizedRotatingLogger
+from geelytest_can.canapp.recorder import BufferedRecorder
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+# 模拟接收线程调用监听器，统计每帧的平均耗时和最长阻塞时间
+def receive(listener, messages):
+    max_stall = 0.0
+    start_time = time.perf_counter()
+    for message in messages:
+        call_time = time.perf_counter()
+        listener.on_message_received(message)
+        max_stall = max(max_stall, time.perf_counter() - call_time)
+    return (time.perf_counter() - start_time) / len(messages), max_stall
+
+
+# 直接写文件与缓冲录制对接收线程的阻塞对比，写入的帧数必须一致 (仅供参考)
+def benchmark_buffered_recorder(frames_num: int = 100000, max_bytes: int = 1 << 20):
+    messages = [Message(timestamp=i * 0.0001, arbitration_id=0x100 + i % 64, data=os.urandom(64), is_fd=True,
+                        channel=1) for i in range(frames_num)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for buffered in (False, True):
+            log_dir = Path(tmp_dir) / ("buffered" if buffered else "direct")
+            log_dir.mkdir()
+            listener = SizedRotatingLogger(log_dir / "benchmark.blf", max_bytes)
+            if buffered:
+                listener = BufferedRecorder(listener, capacity=frames_num)
+            per_frame, max_stall = receive(listener, messages)
+            listener.stop()
+            written = sum(1 for file in log_dir.glob("*.blf") for _ in LogReader(file))
+            assert written == frames_num, written
+            logger.info(f"{'buffered' if buffered else 'direct'}: {per_frame * 1e6:.1f} us/frame in receive thread, "
+                        f"max stall {max_stall * 1000:.2f} ms")
+            if buffered:
+                logger.info(f"{listener.statistics}")
+
+
+if __name__ == "__main__":
+    benchmark_buffered_recorder()
@@ -0,0 +1,79 @@
+import time
+import logging
+import statistics
+import threading
+import multiprocessing
+from can import Bus
+from can import Message
+from geelytest_can.canapp.broker import BusBroker
+from geelytest_can.canapp.broker import BrokerBus
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+BROKER_PATH = "/tmp/benchmark_bus_broker.sock"
+
+
+# 模拟总线上的ECU，收到请求后立即回复
+def echo(bus, stop_event):
+    while not stop_event.is_set():
+        message = bus.recv(0.1)
+        if message is not None and message.arbitration_id == 0x100:
+            bus.send(Message(arbitration_id=0x101, data=message.data, is_extended_id=False))
+    bus.shutdown()
+
+
+def round_trips(bus, rounds):
+    latencies = list()
+    for i in range(rounds):
+        start_time = time.perf_counter()
+        bus.send(Message(arbitration_id=0x100, data=i.to_bytes(4, "little"), is_extended_id=False))
+        while True:
+            message = bus.recv(1.0)
+            assert message is not None, "No response"
+            if message.arbitration_id == 0x101 and bytes(message.data) == i.to_bytes(4, "little"):
+                break
+        latencies.append(time.perf_counter() - start_time)
+    latencies.sort()
+    return statistics.mean(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+# broker进程独占virtual总线并运行ECU，客户端进程通过broker收发
+def serve(ready, stop_event):
+    echo_thread = threading.Thread(target=echo, args=(Bus(interface="virtual", channel="broker"), stop_event))
+    echo_thread.start()
+    bus = Bus(interface="virtual", channel="broker")
+    with BusBroker({"BenchCAN": bus}, BROKER_PATH):
+        ready.set()
+        stop_event.wait()
+    echo_thread.join()
+    bus.shutdown()
+
+
+# 直接使用总线与通过broker多一跳的请求-响应往返时间对比 (仅供参考)
+def benchmark_bus_broker(rounds: int = 2000):
+    stop_event = threading.Event()
+    echo_thread = threading.Thread(target=echo, args=(Bus(interface="virtual", channel="direct"), stop_event))
+    echo_thread.start()
+    bus = Bus(interface="virtual", channel="direct")
+    mean, p99 = round_trips(bus, rounds)
+    bus.shutdown()
+    stop_event.set()
+    echo_thread.join()
+    logger.info(f"direct: mean {mean * 1e6:.1f} us, p99 {p99 * 1e6:.1f} us")
+
+    ready, process_stop = multiprocessing.Event(), multiprocessing.Event()
+    process = multiprocessing.Process(target=serve, args=(ready, process_stop))
+    process.start()
+    ready.wait(10)
+    bus = BrokerBus("BenchCAN", path=BROKER_PATH)
+    broker_mean, broker_p99 = round_trips(bus, rounds)
+    bus.shutdown()
+    process_stop.set()
+    process.join()
+    logger.info(f"broker: mean {broker_mean * 1e6:.1f} us, p99 {broker_p99 * 1e6:.1f} us, "
+                f"extra hop: {(broker_mean - mean) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    benchmark_bus_broker()
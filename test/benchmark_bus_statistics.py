@@ -0,0 +1,45 @@
+import time
+import random
+import logging
+import statistics
+from can import Message
+from geelytest_can.canapp.busstats import BusStatistics
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def make_messages(ids_num, frames_num):
+    # 周期随帧id数量增加，总线负载保持不变
+    cycle_time = ids_num * 0.001
+    timestamps = {0x100 + i: random.random() * cycle_time for i in range(ids_num)}
+    messages = list()
+    for _ in range(frames_num // ids_num):
+        for frame_id in timestamps:
+            timestamps[frame_id] += random.gauss(cycle_time, cycle_time * 0.05)
+            messages.append(Message(timestamp=timestamps[frame_id], arbitration_id=frame_id, data=bytes(8),
+                                    channel=1))
+    messages.sort(key=lambda m: m.timestamp)
+    return messages
+
+
+# 不同帧id数量下每帧的统计耗时应基本不变，平均间隔和抖动与全量计算一致 (仅供参考)
+def benchmark_bus_statistics(frames_num: int = 200000):
+    for ids_num in (16, 256, 2048):
+        messages = make_messages(ids_num, frames_num)
+        bus_statistics = BusStatistics()
+        start_time = time.perf_counter()
+        bus_statistics.consume(messages)
+        elapsed = time.perf_counter() - start_time
+        report = bus_statistics.report()
+        frame = report.frames[0]
+        timestamps = [m.timestamp for m in messages if m.arbitration_id == frame.arbitration_id]
+        intervals = [b - a for a, b in zip(timestamps, timestamps[1:])]
+        assert abs(frame.mean_interval - statistics.mean(intervals)) < 1e-9
+        assert abs(frame.jitter - statistics.pstdev(intervals)) < 1e-9
+        logger.info(f"{ids_num} ids: {elapsed / len(messages) * 1e6:.2f} us/frame, "
+                    f"bus load: {report.channels[0].bus_load * 100:.1f} %")
+
+
+if __name__ == "__main__":
+    benchmark_bus_statistics()
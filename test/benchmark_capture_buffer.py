@@ -0,0 +1,53 @@
+import time
+import random
+import logging
+from can import Message
+from geelytest_can.canapp.buffer import CaptureBuffer
+from geelytest_can.canapp.buffer import DEDUP_NONE
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def generate_frames(frames_num, ids_num):
+    frames = list()
+    for i in range(frames_num):
+        can_id = i % ids_num
+        values = {f"sgn_{can_id}_{k}": random.randint(0, 1000) for k in range(4)}
+        data = bytes(random.getrandbits(8) for _ in range(8))
+        frames.append((Message(timestamp=i * 0.0005, arbitration_id=can_id, data=data), values))
+    return frames
+
+
+# 原有列表查重方式与CaptureBuffer保存信号的耗时对比 (仅供参考)
+def benchmark_capture_buffer(frames_num: int = 20000, ids_num: int = 50):
+    frames = generate_frames(frames_num, ids_num)
+
+    start_time = time.perf_counter()
+    raw_message_list, signal_list = list(), list()
+    for raw_message, values in frames:
+        if raw_message not in raw_message_list:
+            raw_message_list.append(raw_message)
+        if values not in signal_list:
+            signal_list.append(dict(values))
+    list_time = time.perf_counter() - start_time
+    logger.info(f"list membership: {frames_num} frames in {list_time:.3f} s")
+
+    frame_signals = {can_id: [f"sgn_{can_id}_{k}" for k in range(4)] for can_id in range(ids_num)}
+    start_time = time.perf_counter()
+    buffer = CaptureBuffer(frame_signals, dedup=DEDUP_NONE)
+    for raw_message, values in frames:
+        buffer.append(raw_message, values)
+    buffer_time = time.perf_counter() - start_time
+    logger.info(f"CaptureBuffer: {frames_num} frames in {buffer_time:.3f} s, speedup: {list_time / buffer_time:.1f}x")
+
+    start_time = time.perf_counter()
+    ring = CaptureBuffer(frame_signals, maxlen=1000, dedup=DEDUP_NONE)
+    for raw_message, values in frames:
+        ring.append(raw_message, values)
+    logger.info(f"CaptureBuffer(maxlen=1000): {time.perf_counter() - start_time:.3f} s, "
+                f"kept {len(ring)}, dropped {ring.dropped}")
+
+
+if __name__ == "__main__":
+    benchmark_capture_buffer()
@@ -0,0 +1,36 @@
+import os
+import time
+import random
+import logging
+from pathlib import Path
+from geelytest_can import load_file
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+def decode_rate(db, frames, compiled):
+    db.enable_compiled_codecs(compiled)
+    start_time = time.perf_counter()
+    for message, data in frames:
+        message.decode(data)
+    return len(frames) / (time.perf_counter() - start_time)
+
+
+# 编译解码器与bitstruct解码的性能对比，结果一致性由check_compiled_codec.py检查 (仅供参考)
+def benchmark_compiled_codec(frames_num: int = 20000):
+    for db_path in sorted(RESOURCES.glob("*.dbc")):
+        db = load_file(db_path)
+        messages = [message for message in db.messages if not message.is_container]
+        frames = [(message, os.urandom(message.length)) for message in random.choices(messages, k=frames_num)]
+        bitstruct_rate = decode_rate(db, frames, False)
+        compiled_rate = decode_rate(db, frames, True)
+        logger.info(f"bitstruct: {bitstruct_rate:.0f} frames/s, compiled: {compiled_rate:.0f} frames/s, "
+                    f"speedup: {compiled_rate / bitstruct_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark_compiled_codec()
@@ -0,0 +1,63 @@
+import time
+import logging
+import threading
+from collections import defaultdict
+from can import Bus as CanBus
+from can import Message as RawMessage
+from geelytest_can.canapp.scheduler import CyclicScheduler
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+# 在虚拟总线上接收报文，统计每个报文id的到达间隔与周期的偏差
+def collect_jitter(channel, periods, duration):
+    arrivals = defaultdict(list)
+    with CanBus(interface="virtual", channel=channel) as bus:
+        end_time = time.monotonic() + duration
+        while time.monotonic() < end_time:
+            msg = bus.recv(timeout=0.1)
+            if msg:
+                arrivals[msg.arbitration_id].append(time.monotonic())
+    deviations = list()
+    for can_id, times in arrivals.items():
+        deviations.extend(abs(b - a - periods[can_id]) for a, b in zip(times, times[1:]))
+    deviations.sort()
+    return deviations
+
+
+def run(backend, num, duration):
+    channel = f"benchmark_{backend}"
+    periods = {can_id: (10, 20, 50, 100)[can_id % 4] / 1000 for can_id in range(1, num + 1)}
+    result = dict()
+    receiver = threading.Thread(target=lambda: result.update(deviations=collect_jitter(channel, periods, duration)))
+    receiver.start()
+    with CanBus(interface="virtual", channel=channel) as bus:
+        tasks = list()
+        for can_id, period in periods.items():
+            msg = RawMessage(arbitration_id=can_id, data=[can_id & 0xFF] * 8, is_extended_id=False)
+            if backend == "scheduler":
+                tasks.append(CyclicScheduler.default().send_periodic(bus, [msg], period))
+            else:
+                tasks.append(bus.send_periodic(msgs=msg, period=period))
+        logger.info(f"{backend}: {num} cyclic messages, {threading.active_count()} threads")
+        receiver.join()
+        for task in tasks:
+            task.stop()
+    deviations = result["deviations"]
+    logger.info(f"{backend}: {len(deviations)} intervals, "
+                f"p50 jitter: {deviations[len(deviations) // 2] * 1000:.3f} ms, "
+                f"p99 jitter: {deviations[int(len(deviations) * 0.99)] * 1000:.3f} ms, "
+                f"max jitter: {deviations[-1] * 1000:.3f} ms")
+
+
+# 150个周期报文下，每个报文一个线程和单线程调度器的发送抖动对比 (仅供参考)
+def benchmark_cyclic_scheduler(num: int = 150, duration: float = 5):
+    run("bus", num, duration)
+    run("scheduler", num, duration)
+    overruns = sum(stat.overruns for stat in CyclicScheduler.default().statistics())
+    logger.info(f"scheduler overruns: {overruns}")
+
+
+if __name__ == "__main__":
+    benchmark_cyclic_scheduler()
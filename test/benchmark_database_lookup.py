@@ -0,0 +1,56 @@
+import time
+import logging
+from pathlib import Path
+from geelytest_can import load_file
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+# 原有的线性查找实现，仅用于对比
+def linear_get_signal_by_name(db, name):
+    _signals = set()
+    for message in db.messages:
+        _signals.update(message.signals)
+    for signal in _signals:
+        if name == signal.name:
+            return signal
+    raise KeyError(name)
+
+
+def linear_get_message_by_signal(db, name):
+    sgn = linear_get_signal_by_name(db, name)
+    for message in db.messages:
+        if sgn in message.signals:
+            return message
+    raise KeyError(sgn)
+
+
+def timeit(func, db, names, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for name in names:
+            func(db, name)
+    return (time.perf_counter() - start_time) / (repeat * len(names))
+
+
+# 信号名查找性能对比 (仅供参考)
+def benchmark_signal_lookup(repeat: int = 3, sample: int = 200):
+    for db_path in sorted(RESOURCES.glob("*.dbc")):
+        db = load_file(db_path)
+        names = sorted({sgn.name for message in db.messages for sgn in message.signals})[:sample]
+        for name in names:
+            assert linear_get_message_by_signal(db, name) is db.get_message_by_signal(name)
+
+        linear = timeit(linear_get_message_by_signal, db, names, repeat)
+        indexed = timeit(lambda _db, _name: _db.get_message_by_signal(_name), db, names, repeat * 100)
+        logger.info(f"{db_path.name}: {len(db.messages)} messages, {len(db.signals)} signals")
+        logger.info(f"get_message_by_signal linear: {linear * 1e6:.1f} us/lookup, "
+                    f"indexed: {indexed * 1e6:.3f} us/lookup, speedup: {linear / indexed:.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark_signal_lookup()
@@ -0,0 +1,57 @@
+import time
+import logging
+import threading
+from pathlib import Path
+from can import Bus
+from can import Message
+from geelytest_can import CanController
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.WARNING)
+
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+# 模拟ECU唤醒后周期发送报文，周期为cycle_time
+def send_cyclic(bus, messages, cycle_time, stop_event):
+    frames = list()
+    for message in messages:
+        data = message.encode({sgn.name: sgn.minimum or 0 for sgn in message.signals}, strict=False)
+        frames.append(Message(arbitration_id=message.frame_id, data=data, is_extended_id=message.is_extended_frame,
+                              is_fd=message.is_fd))
+    while not stop_event.is_set():
+        for frame in frames:
+            bus.send(frame)
+        time.sleep(cycle_time)
+
+
+# 30个信号依次receive_signals_once与expect_all一次等待的耗时对比 (仅供参考)
+def benchmark_expect_all(expectations_num: int = 30, cycle_time: float = 0.1):
+    db_path = sorted(RESOURCES.glob("*.dbc"))[0]
+    controller = CanController("benchmark", "virtual", "expect", db_path=db_path)
+    controller.connect()
+    messages = [message for message in controller.db.messages
+                if message.signals and not message.is_container and not message.is_multiplexed()][:expectations_num]
+    signals = {message.signals[-1].name: message.signals[-1].minimum or 0 for message in messages}
+    peer = Bus(interface="virtual", channel="expect")
+    stop_event = threading.Event()
+    sender = threading.Thread(target=send_cyclic, args=(peer, messages, cycle_time, stop_event))
+    sender.start()
+
+    start_time = time.perf_counter()
+    for name in signals:
+        controller.receive_signals_once(name, timeout=2.0)
+    logger.warning(f"{len(signals)} x receive_signals_once: {time.perf_counter() - start_time:.3f} s")
+
+    report = controller.expect_all([signals], timeout=2.0)
+    logger.warning(f"expect_all: {report.elapsed:.3f} s, satisfied: {report.satisfied}")
+
+    stop_event.set()
+    sender.join()
+    peer.shutdown()
+    controller.disconnect()
+
+
+if __name__ == "__main__":
+    benchmark_expect_all()
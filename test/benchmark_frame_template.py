@@ -0,0 +1,59 @@
+import time
+import logging
+from pathlib import Path
+from geelytest_can import load_file
+from geelytest_can.canapp.template import FrameTemplate
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+# 原有的全量编码实现，仅用于对比：每次都遍历全部信号生成默认值，再做一次严格的全量编码
+def full_encode(message, sgn_dict):
+    updated_sgn_dict = dict()
+    for sgn in message.signals:
+        if sgn.name.endswith("_UB"):
+            updated_sgn_dict[sgn.name] = 1
+        elif sgn.name in sgn_dict:
+            updated_sgn_dict[sgn.name] = sgn_dict[sgn.name] * sgn.scale + sgn.offset
+        else:
+            updated_sgn_dict[sgn.name] = 0
+    return message.encode(data=updated_sgn_dict)
+
+
+def timeit(func, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start_time) / repeat
+
+
+# 修改单个信号时全量编码和模板编码的性能对比 (仅供参考)
+def benchmark_frame_template(repeat: int = 200):
+    for db_path in sorted(RESOURCES.glob("*.dbc")):
+        db = load_file(db_path)
+        full_total, template_total, count = 0.0, 0.0, 0
+        for message in db.messages:
+            signal = next((sgn for sgn in message.signals if not sgn.name.endswith("_UB")), None)
+            if signal is None or message.is_multiplexed():
+                continue
+            try:
+                full_encode(message, {signal.name: 0})
+            except Exception as ex:
+                logger.debug(f"Skip message {message.name}, because {ex}")
+                continue
+            template = FrameTemplate(message)
+            full_total += timeit(lambda: full_encode(message, {signal.name: 0}), repeat)
+            template_total += timeit(lambda: template.to_bytes(template.encode({signal.name: 0})), repeat)
+            count += 1
+        logger.info(f"{db_path.name}: {count} messages, {sum(len(m.signals) for m in db.messages)} signals")
+        logger.info(f"full encode: {full_total / count * 1e6:.1f} us/frame, "
+                    f"frame template: {template_total / count * 1e6:.1f} us/frame, "
+                    f"speedup: {full_total / template_total:.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark_frame_template()
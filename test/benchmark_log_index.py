@@ -0,0 +1,52 @@
+import os
+import time
+import random
+import logging
+import tempfile
+from pathlib import Path
+from can import Logger
+from can import LogReader
+from can import Message
+from geelytest_can.canapp import CanLogManager
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def make_log(file, frames_num):
+    timestamp = 0.0
+    with Logger(file) as writer:
+        for _ in range(frames_num):
+            timestamp += 0.0002
+            writer(Message(timestamp=timestamp, arbitration_id=random.randrange(0x100, 0x200), data=os.urandom(8),
+                           channel=1))
+    return timestamp
+
+
+# 有索引时按时间窗口读取与从头扫描整个文件的耗时对比，结果必须一致 (仅供参考)
+def benchmark_log_index(frames_num: int = 500000, window: float = 1.0):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for suffix in (".blf", ".asc"):
+            log_file = Path(tmp_dir) / f"benchmark{suffix}"
+            duration = make_log(log_file, frames_num)
+            start_time = time.perf_counter()
+            index = CanLogManager.build_index(log_file)
+            build = time.perf_counter() - start_time
+            start, stop = duration / 2, duration / 2 + window
+
+            start_time = time.perf_counter()
+            expected = [(m.timestamp, m.arbitration_id) for m in LogReader(log_file) if start <= m.timestamp <= stop]
+            scan = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            actual = [(m.timestamp, m.arbitration_id) for m in CanLogManager.read_window(log_file, start, stop)]
+            seek = time.perf_counter() - start_time
+            assert expected == actual
+
+            logger.info(f"{log_file.name}: {frames_num} frames, {len(index.checkpoints)} checkpoints, "
+                        f"build index: {build:.2f} s")
+            logger.info(f"{window} s window ({len(actual)} frames): full scan {scan * 1000:.1f} ms, "
+                        f"indexed {seek * 1000:.1f} ms, speedup: {scan / seek:.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark_log_index()
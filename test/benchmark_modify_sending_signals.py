@@ -0,0 +1,36 @@
+import time
+import logging
+from pathlib import Path
+from geelytest_can import CanController
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.WARNING)
+
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+# 大量周期任务下modify_sending_signals的耗时 (仅供参考)
+def benchmark_modify_sending_signals(repeat: int = 200):
+    for db_path in sorted(RESOURCES.glob("*.dbc")):
+        controller = CanController("benchmark", "virtual", "benchmark", db_path=db_path)
+        controller.connect()
+        signal_names = list()
+        for message in controller.db.messages:
+            names = [sgn.name for sgn in message.signals if not sgn.name.endswith(("_UB", "Chks", "Cntr"))]
+            if names and not message.is_multiplexed():
+                controller.send_signals({names[0]: 0})
+                signal_names.append(names[0])
+        tasks = controller.periodic_tasks
+        start_time = time.perf_counter()
+        for i in range(repeat):
+            controller.modify_sending_signals({signal_names[i % len(signal_names)]: i % 2})
+        latency = (time.perf_counter() - start_time) / repeat
+        logger.warning(f"{db_path.name}: {len(tasks)} periodic tasks, "
+                       f"modify_sending_signals: {latency * 1000:.3f} ms/call")
+        controller.stop_sending()
+        controller.disconnect()
+
+
+if __name__ == "__main__":
+    benchmark_modify_sending_signals()
@@ -0,0 +1,52 @@
+import os
+import time
+import random
+import logging
+import filecmp
+import tempfile
+from pathlib import Path
+from can import Logger
+from can import Message
+from geelytest_can import load_file
+from geelytest_can.canapp import CanLogManager
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.WARNING)
+
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+def make_log(file, db, frames_num):
+    messages = [message for message in db.messages if not message.is_container]
+    timestamp = time.time()
+    with Logger(file) as writer:
+        for message in random.choices(messages, k=frames_num):
+            timestamp += 0.0002
+            writer(Message(timestamp=timestamp, arbitration_id=message.frame_id, data=os.urandom(message.length),
+                           is_extended_id=message.is_extended_frame, is_fd=message.length > 8, channel=1))
+
+
+# 多进程解析log的扩展性，不同进程数的解析结果必须完全一致 (仅供参考)
+def benchmark_parallel_log_parse(frames_num: int = 200000, output_format: str = "ndjson"):
+    db_path = sorted(RESOURCES.glob("*.dbc"))[0]
+    db = load_file(db_path)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = Path(tmp_dir) / "benchmark.blf"
+        make_log(log_file, db, frames_num)
+        jobs_list = sorted({1, 2, 4, os.cpu_count() or 1})
+        base_time = None
+        for jobs in jobs_list:
+            dest_file = Path(tmp_dir) / f"benchmark_{jobs}.{output_format}"
+            start_time = time.perf_counter()
+            CanLogManager.log_parse(log_file, db_path, dest_file, output_format, jobs)
+            elapsed = time.perf_counter() - start_time
+            base_time = base_time or elapsed
+            identical = filecmp.cmp(Path(tmp_dir) / f"benchmark_1.{output_format}", dest_file, shallow=False)
+            assert identical, jobs
+            logger.warning(f"jobs: {jobs}, {elapsed:.2f} s, {frames_num / elapsed:.0f} frames/s, "
+                           f"speedup: {base_time / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    benchmark_parallel_log_parse()
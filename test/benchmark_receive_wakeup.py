@@ -0,0 +1,65 @@
+import time
+import logging
+import statistics
+import threading
+from pathlib import Path
+from can import Bus
+from can import Message
+from geelytest_can import CanController
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.WARNING)
+
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    return f"mean {statistics.mean(latencies) * 1e3:.3f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.3f} ms"
+
+
+# virtual总线上receive_message_once的唤醒延迟、超时精度以及空闲等待的CPU占用 (仅供参考)
+def benchmark_receive_wakeup(rounds: int = 200, timeout: float = 0.02):
+    db_path = sorted(RESOURCES.glob("*.dbc"))[0]
+    controller = CanController("benchmark", "virtual", "wakeup", db_path=db_path)
+    controller.connect()
+    peer = Bus(interface="virtual", channel="wakeup")
+    sent_times = list()
+
+    def send_later(delay):
+        time.sleep(delay)
+        sent_times.append(time.perf_counter())
+        peer.send(Message(arbitration_id=0x100, data=[0], is_extended_id=False))
+
+    # 报文在等待开始后才到达，统计从发送到receive_message_once返回的时间
+    latencies = list()
+    for i in range(rounds):
+        sender = threading.Thread(target=send_later, args=(0.001 + (i % 5) * 0.001,))
+        sender.start()
+        message = controller.receive_message_once(0x100, timeout=1.0)
+        received_time = time.perf_counter()
+        sender.join()
+        assert message is not None, "No message"
+        latencies.append(received_time - sent_times[-1])
+    logger.warning(f"wake-up on frame: {latency_summary(latencies)}")
+
+    # 没有报文时，统计超时返回相对timeout的超出时间
+    overshoots = list()
+    for _ in range(rounds // 10):
+        start_time = time.perf_counter()
+        assert controller.receive_message_once(0x200, timeout=timeout) is None
+        overshoots.append(time.perf_counter() - start_time - timeout)
+    logger.warning(f"wake-up on {timeout * 1e3:.0f} ms timeout, overshoot: {latency_summary(overshoots)}")
+
+    # 空闲等待期间主线程消耗的CPU时间
+    cpu_time = time.thread_time()
+    controller.receive_message_once(0x200, timeout=1.0)
+    logger.warning(f"idle wait for 1 s: {(time.thread_time() - cpu_time) * 1e3:.3f} ms cpu")
+
+    peer.shutdown()
+    controller.disconnect()
+
+
+if __name__ == "__main__":
+    benchmark_receive_wakeup()
@@ -0,0 +1,52 @@
+import os
+import time
+import logging
+import statistics
+from can import Bus
+from can import Message
+from can import MessageSync
+from can.util import channel2int
+from geelytest_can.canapp.replay import ReplayEngine
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def make_messages(frames_num, interval):
+    return [Message(timestamp=i * interval, arbitration_id=0x100 + i % 64, data=os.urandom(64), is_fd=True,
+                    channel=1) for i in range(frames_num)]
+
+
+# 原来的MessageSync回放方式，每帧对每个总线计算channel2int
+def replay_message_sync(bus, messages):
+    lateness = list()
+    start = time.perf_counter()
+    for message in MessageSync(messages):
+        if channel2int(bus.channel_info) == channel2int(message.channel):
+            lateness.append(time.perf_counter() - start - message.timestamp)
+            bus.send(message)
+    return lateness
+
+
+# 密集CAN-FD报文的回放时刻误差对比 (仅供参考)
+def benchmark_replay(frames_num: int = 20000, interval: float = 0.0001):
+    bus = Bus("1", interface="virtual", receive_own_messages=False)
+    lateness = sorted(replay_message_sync(bus, make_messages(frames_num, interval)))
+    logger.info(f"MessageSync: mean lateness {statistics.mean(lateness) * 1e6:.0f} us, "
+                f"p99 lateness {lateness[int(len(lateness) * 0.99)] * 1e6:.0f} us, "
+                f"max lateness {lateness[-1] * 1e6:.0f} us")
+
+    engine = ReplayEngine([bus])
+    result = engine.replay(make_messages(frames_num, interval))
+    logger.info(f"ReplayEngine: mean lateness {result.mean_lateness * 1e6:.0f} us, "
+                f"p99 lateness {result.p99_lateness * 1e6:.0f} us, max lateness {result.max_lateness * 1e6:.0f} us")
+
+    for speed in (0.5, 2, None):
+        result = ReplayEngine([bus], speed).replay(make_messages(frames_num, interval))
+        logger.info(f"speed {speed}: {result.sent} frames in {result.duration:.3f} s, "
+                    f"p99 lateness {result.p99_lateness * 1e6:.0f} us")
+    bus.shutdown()
+
+
+if __name__ == "__main__":
+    benchmark_replay()
@@ -0,0 +1,38 @@
+import os
+import time
+import logging
+from pathlib import Path
+from geelytest_can import load_file
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+def timeit(func, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start_time) / repeat
+
+
+# 只解析一个信号和解析整个报文的耗时对比，取信号最多的报文 (仅供参考)
+def benchmark_selective_decode(repeat: int = 2000):
+    for db_path in sorted(RESOURCES.glob("*.dbc")):
+        db = load_file(db_path)
+        message = max(db.messages, key=lambda msg: len(msg.signals))
+        data = os.urandom(message.length)
+        signals = [message.signals[len(message.signals) // 2].name]
+        assert message.decode(data, signals=signals) == {signals[0]: message.decode(data)[signals[0]]}
+
+        full = timeit(lambda: message.decode(data), repeat)
+        selective = timeit(lambda: message.decode(data, signals=signals), repeat)
+        logger.info(f"{db_path.name}: message {message.name} with {len(message.signals)} signals")
+        logger.info(f"full decode: {full * 1e6:.1f} us/frame, one signal: {selective * 1e6:.2f} us/frame, "
+                    f"speedup: {full / selective:.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark_selective_decode()
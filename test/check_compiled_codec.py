@@ -0,0 +1,60 @@
+import sys
+import random
+import logging
+from pathlib import Path
+from geelytest_can import load_file
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+def test_frames(message, rng, num):
+    frames = [bytes(message.length), b"\xff" * message.length]
+    frames.extend(bytes(rng.getrandbits(8) for _ in range(message.length)) for _ in range(num))
+    return frames
+
+
+def decode(message, data, compiled, decode_choices, scaling):
+    message.enable_compiled_codec(compiled)
+    try:
+        return list(message.decode(data, decode_choices, scaling).items())
+    except Exception as ex:
+        return repr(ex)
+
+
+# 差分测试：每个测试dbc的全部报文，编译解码器与bitstruct解码的结果(包括值、类型和信号顺序)必须完全一致，不一致时返回非0
+def check_compiled_codec(num: int = 50, seed: int = 0) -> int:
+    rng = random.Random(seed)
+    mismatches = 0
+    for db_path in sorted(RESOURCES.glob("*.dbc")):
+        db = load_file(db_path)
+        count = 0
+        for message in db.messages:
+            # 容器报文不使用编译解码器
+            if message.is_container:
+                continue
+            for data in test_frames(message, rng, num):
+                for decode_choices in (True, False):
+                    for scaling in (True, False):
+                        expected = decode(message, data, False, decode_choices, scaling)
+                        actual = decode(message, data, True, decode_choices, scaling)
+                        count += 1
+                        if expected != actual or (isinstance(expected, list) and
+                                                  [type(v) for _, v in expected] != [type(v) for _, v in actual]):
+                            mismatches += 1
+                            logger.error(f"{db_path.name} {message.name} data={data.hex()} "
+                                         f"decode_choices={decode_choices} scaling={scaling}:\n"
+                                         f"  bitstruct: {expected}\n  compiled:  {actual}")
+        logger.info(f"{db_path.name}: {count} decodes compared")
+    if mismatches:
+        logger.error(f"{mismatches} mismatches between compiled and bitstruct decoding")
+        return 1
+    logger.info("Compiled and bitstruct decoding are identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(check_compiled_codec())